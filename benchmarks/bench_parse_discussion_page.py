@@ -0,0 +1,49 @@
+"""
+Throughput of parse_discussion_page (targeted extraction of the data-props) against parse_discussion_page_soup (full
+BeautifulSoup parse) on the generated corpus of discussion pages (see tests/fixtures.py), or on the HTML files of a
+directory (e.g., saved discussion pages).
+Usage: python -m benchmarks.bench_parse_discussion_page [--pages-dir <dir>] [--size <number of generated pages>]
+"""
+import argparse
+import time
+from pathlib import Path
+
+from scripts.bot.bot_utils import parse_discussion_page
+from scripts.bot.bot_utils import parse_discussion_page_soup
+from tests.fixtures import discussion_corpus
+
+
+def benchmark(parse, corpus: list, repeat: int = 3) -> float:
+    """
+    Measure the throughput of a parser.
+    :param parse: the parser.
+    :param corpus: the pages.
+    :param repeat: how many times the corpus is parsed (the best time is used).
+    :return: the number of pages parsed per second.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in corpus:
+            parse(page)
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) / best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the extraction of the discussion metadata.")
+    parser.add_argument("--pages-dir", default=None, help="Directory with HTML pages (default: generated pages)")
+    parser.add_argument("--size", type=int, default=500, help="Number of generated pages (default: 500)")
+    args = parser.parse_args()
+
+    if args.pages_dir:
+        corpus = [p.read_text(encoding="utf8") for p in sorted(Path(args.pages_dir).glob("*.html"))]
+    else:
+        corpus = discussion_corpus(args.size)
+    assert all(parse_discussion_page(page) == parse_discussion_page_soup(page) for page in corpus)
+
+    size = sum(len(page) for page in corpus) / 1e6
+    print(f"{len(corpus)} pages ({size:.1f} MB)")
+    for parse in [parse_discussion_page_soup, parse_discussion_page]:
+        pages_per_second = benchmark(parse, corpus)
+        print(f"{parse.__name__}: {pages_per_second:.0f} pages/s ({pages_per_second * size / len(corpus):.1f} MB/s)")
@@ -1,5 +1,8 @@
 #!/bin/bash
 
+# the collectors import shared modules from this directory (e.g., http_cache.py)
+export PYTHONPATH="$PWD${PYTHONPATH:+:$PYTHONPATH}"
+
 output_file='../data/GH_data_safetensor.json'
 
 # Execute GH_collect_safetensor.py
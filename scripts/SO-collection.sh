@@ -1,7 +1,11 @@
 #!/bin/bash
 
+# the collectors import shared modules from this directory (e.g., http_cache.py)
+export PYTHONPATH="$PWD${PYTHONPATH:+:$PYTHONPATH}"
 
-output_file='../data/SO_data_safetensor.json'
+
+# the items are written as NDJSON (one item per line)
+output_file='../data/SO_data_safetensor.ndjson'
 
 # Execute parse-SO.py
 echo "Running parse-SO.py..."
@@ -13,15 +17,7 @@ if [ $? -ne 0 ]; then
   exit 1
 fi
 
-# Execute dupcheck-json.py
-echo "Running dupcheck-json.py..."
-python3 stackoverflow/dupcheck-json.py $output_file
-
-# Check if dupcheck-json.py was successful
-if [ $? -ne 0 ]; then
-  echo "Error: dupcheck-json.py did not run successfully."
-  exit 1
-fi
+# parse-SO.py removes the duplicates as the items arrive (dupcheck-json.py is only needed for legacy JSON files)
 
 # Execute count-json.py
 echo "Running count-json.py..."
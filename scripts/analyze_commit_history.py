@@ -5,10 +5,12 @@ import sys
 from pathlib import Path
 
 import pandas as pd
-from analyticaml import MODEL_FILE_EXTENSIONS, check_ssh_connection
+from analyticaml import check_ssh_connection
 from analyticaml.model_parser import detect_serialization_format
 from tqdm import tqdm
 
+from commit_logs import iter_repository_commits
+from model_files import contains_model_file, is_model_file
 from utils import DATA_DIR, RESULTS_DIR
 from utils import delete_folder, clone
 
@@ -35,25 +37,13 @@ def parse_args():
     return parser.parse_args()
 
 
-def filter_by_extension(changed_files: str):
+def touches_model_files(df_commits: pd.DataFrame) -> pd.Series:
     """
-    Implement a filter to check if the list of changed files in a commit has model files.
-    A model file is a file that has one of the extensions in MODEL_FILE_EXTENSIONS.
-    :param changed_files: a string with the list of changed files in a commit (separated by ";").
-    :return: True if there is a model file in the list, False otherwise.
+    Row filter for the commit logs: it selects the commits that touch at least one model file.
+    :param df_commits: a chunk of the commit log.
+    :return: a boolean mask of the commits whose changed files include at least one model file.
     """
-    changed_files = changed_files.split(";")
-    file_extensions = [Path(f).suffix[1:] for f in changed_files]
-    return any([ext in MODEL_FILE_EXTENSIONS for ext in file_extensions])
-
-
-def is_model_file(file_path: str):
-    """
-    Check if the file is a model file
-    :param file_path: the file path
-    :return: True if the file is a model file, False otherwise.
-    """
-    return Path(file_path).suffix[1:] in MODEL_FILE_EXTENSIONS
+    return contains_model_file(df_commits["changed_files"])
 
 
 def cleanup():
@@ -91,14 +81,9 @@ if __name__ == '__main__':
         print("If you are running this script to retry, make sure to run hotfix/compute_failed_recent_history.py")
         sys.exit(1)
 
-    print(f"Loading the commit history data from {input_file}...")
-    df_commits = pd.read_csv(input_file).fillna("")
-    print("Total number of commits:", len(df_commits))
-
-    # identify the commits that have at least one model file
-    df_commits = df_commits[df_commits["changed_files"].apply(lambda x: filter_by_extension(x))]
-    df_commits.reset_index(drop=True, inplace=True)
-    print("Number of commits touching at least one model file:", len(df_commits))
+    print(f"Streaming the commit history data from {input_file}...")
+    # commits are read in chunks and grouped by repository, keeping only those that have at least one model file
+    repository_commits = iter_repository_commits(input_file, row_filter=touches_model_files)
 
     # this is the last repository URL and object, used to avoid cloning the same repository multiple times
     last_repo_url, last_repo_obj, last_clone_path = None, None, None
@@ -109,60 +94,66 @@ if __name__ == '__main__':
     df_errors = pd.DataFrame(columns=["repo_url", "commit_hash", "error"])
 
     # Analysis configuration
-    print(f"Start processing (range = {0}-{len(df_commits)}) for group {group_type}...")
+    print(f"Start processing for group {group_type}...")
     save_at, out_filename = 1000, f"repositories_evolution_{group_type}_commits{suffix}.csv"
 
-    # iterate over the range of commits
-    for index, row in tqdm(df_commits.iterrows(), total=len(df_commits), unit="commit"):
-        all_model_files = [f for f in row["all_files_in_tree"].split(";") if is_model_file(f)]
-        changed_files = [x.split()[1] for x in row["changed_files"].split(";")]
-        try:
-            # checkout repository at that commit hash
-            commit_hash = row["commit_hash"]
-            repo_url = row["repo_url"]
-            clone_path = temp_folder / repo_url.replace("/", "+")
-
-            if last_repo_url != repo_url:
-                # close the last repository and delete the folder
-                if last_repo_obj:
-                    last_repo_obj.close()
-                    delete_folder(last_clone_path)
-                # clone the repository
-                repo = clone(repo_url, clone_path, single_branch=True, no_tags=True)
-                # update the last repository URL and object
-                last_repo_url, last_repo_obj, last_clone_path = repo_url, repo, clone_path
-
-            # checkout the commit hash
-            last_repo_obj.git.checkout(commit_hash, force=True)
-
-            # iterate over the files touched in the commit (modified, added, or deleted)
-            for file_path in all_model_files:
-                full_file_path = os.path.join(clone_path, file_path)
-                # check if it is a symbolic file pointing to nowhere
-                if os.path.islink(full_file_path) and not os.path.exists(full_file_path):
-                    serialization_format = "UNDETERMINED (symbolic link)"
-                else:
-                    serialization_format = detect_serialization_format(full_file_path)
-                # add to df_output
-                df_output.loc[len(df_output)] = {
-                    "repo_url": repo_url,
-                    "commit_hash": commit_hash,
-                    "model_file_path": os.path.join(repo_url, file_path),
-                    "serialization_format": serialization_format,
-                    "message": row["message"],
-                    "author": row["author"],
-                    "date": row["date"],
-                    "is_in_commit": file_path in changed_files,
-                }
-                # print(f"File: {file_path}, Format: {serialization_format}")
-        except Exception as e:
-            print(f"Error processing {commit_hash}: {e}")
-            df_errors.loc[len(df_errors)] = {"repo_url": repo_url, "commit_hash": commit_hash, "error": e}
-
-        # SAVES THE DATAFRAME EVERY save_at ITERATIONS
-        if index != 0 and index % save_at == 0:
-            df_output.to_csv(DATA_DIR / out_filename, index=False)
-            df_errors.to_csv(DATA_DIR / out_filename.replace("commits", "errors"), index=False)
+    # iterate over the commits, one repository at a time
+    progress_bar = tqdm(unit="commit")
+    for _, df_repo_commits in repository_commits:
+        for _, row in df_repo_commits.iterrows():
+            all_model_files = [f for f in row["all_files_in_tree"].split(";") if is_model_file(f)]
+            changed_files = [x.split()[1] for x in row["changed_files"].split(";")]
+            try:
+                # checkout repository at that commit hash
+                commit_hash = row["commit_hash"]
+                repo_url = row["repo_url"]
+                clone_path = temp_folder / repo_url.replace("/", "+")
+
+                if last_repo_url != repo_url:
+                    # close the last repository and delete the folder
+                    if last_repo_obj:
+                        last_repo_obj.close()
+                        delete_folder(last_clone_path)
+                    # clone the repository
+                    repo = clone(repo_url, clone_path, single_branch=True, no_tags=True)
+                    # update the last repository URL and object
+                    last_repo_url, last_repo_obj, last_clone_path = repo_url, repo, clone_path
+
+                # checkout the commit hash
+                last_repo_obj.git.checkout(commit_hash, force=True)
+
+                # iterate over the files touched in the commit (modified, added, or deleted)
+                for file_path in all_model_files:
+                    full_file_path = os.path.join(clone_path, file_path)
+                    # check if it is a symbolic file pointing to nowhere
+                    if os.path.islink(full_file_path) and not os.path.exists(full_file_path):
+                        serialization_format = "UNDETERMINED (symbolic link)"
+                    else:
+                        serialization_format = detect_serialization_format(full_file_path)
+                    # add to df_output
+                    df_output.loc[len(df_output)] = {
+                        "repo_url": repo_url,
+                        "commit_hash": commit_hash,
+                        "model_file_path": os.path.join(repo_url, file_path),
+                        "serialization_format": serialization_format,
+                        "message": row["message"],
+                        "author": row["author"],
+                        "date": row["date"],
+                        "is_in_commit": file_path in changed_files,
+                    }
+                    # print(f"File: {file_path}, Format: {serialization_format}")
+            except Exception as e:
+                print(f"Error processing {commit_hash}: {e}")
+                df_errors.loc[len(df_errors)] = {"repo_url": repo_url, "commit_hash": commit_hash, "error": e}
+
+            # SAVES THE DATAFRAME EVERY save_at ITERATIONS
+            if progress_bar.n != 0 and progress_bar.n % save_at == 0:
+                df_output.to_csv(DATA_DIR / out_filename, index=False)
+                df_errors.to_csv(DATA_DIR / out_filename.replace("commits", "errors"), index=False)
+            progress_bar.update()
+
+    progress_bar.close()
+    print("Number of commits touching at least one model file:", progress_bar.n)
 
     # after all is said and done, how many unique [repo_url,commit_hash] we have in total?
     print(f"Unique commits: {len(df_output[['repo_url', 'commit_hash']].drop_duplicates())}")
@@ -8,9 +8,7 @@ This is saved to a CSV file with the following columns:
 - all_files_in_tree: a string with all the files in the repo, separated by a semicolon.
 @Author: Joanna C. S. Santos
 """
-import json
 import os
-import zipfile
 from collections import OrderedDict
 from pathlib import Path
 
@@ -18,6 +16,9 @@ import pandas as pd
 from huggingface_hub import model_info
 from tqdm import tqdm
 
+from bot.pr_headers import load_pr_table
+from http_cache import configure_hf_cache
+
 DATA_DIR = Path('../data')
 RESULTS_DIR = Path('../results')
 
@@ -27,26 +28,15 @@ def find_merged_repos() -> set:
     Find the repositories that had PRs merged.
     :return: a set of the repositories that had PRs merged (their URLs).
     """
-    # Extracted results, load to frame and delete the large CSV
-    with zipfile.ZipFile(DATA_DIR / 'sfconvertbot_pr_metadata.csv.zip', 'r') as zip_ref:
-        zip_ref.extractall(DATA_DIR)
-    df = pd.read_csv(DATA_DIR / 'sfconvertbot_pr_metadata.csv')
-    os.remove(DATA_DIR / 'sfconvertbot_pr_metadata.csv')
+    # only the model IDs and the PR statuses are read (the headers are parsed once, see bot/pr_headers.py)
+    df = load_pr_table(DATA_DIR / 'sfconvertbot_pr_metadata.csv.zip', columns=['model_id', 'header_status'])
     # Python lacks ordered sets, so we need to use an ordered dictionary
-    merged_repos = OrderedDict()
-    # iterate over frame
-    for index, row in tqdm(df.iterrows(), total=len(df), unit="PR"):
-        header = row['header_metadata']
-        if not header or not header.startswith("{"):
-            continue
-        header = json.loads(row['header_metadata'])
-        status = header['discussion']['status']
-        if status == 'merged':
-            merged_repos[row['model_id']] = ""
+    merged_repos = OrderedDict.fromkeys(df.loc[df['header_status'] == 'merged', 'model_id'], "")
     return merged_repos.keys()
 
 
 if __name__ == '__main__':
+    configure_hf_cache()  # the model_info calls are answered from the response cache when possible
 
     columns = ["model_id", "created_at", "last_modified", "all_files_in_tree"]
     merged_repos = find_merged_repos()
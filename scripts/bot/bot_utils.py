@@ -1,10 +1,37 @@
+import asyncio
+import bisect
 import os
+import queue
+import re
+import threading
+import time
+from html import unescape
 from pathlib import Path
+from typing import AsyncIterator, Iterable, Iterator
+from urllib.parse import urlsplit
 
+import aiohttp
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 
+from http_cache import ResponseCache, cache_key, conditional_headers, default_cache, get_session
+
+# data-target of the elements whose data-props hold the discussion metadata
+DISCUSSION_TARGETS = ['DiscussionEvents', 'DiscussionHeader']
+# an occurrence of the data-target attribute of those elements
+_TARGET_PATTERN = re.compile(r'(?i:data-target)\s*=\s*["\']?(DiscussionEvents|DiscussionHeader)(?=["\'\s>/])')
+# the start of the parts of a page that are not parsed as markup (comments, raw text elements and CDATA sections)
+_RAW_TEXT_START = re.compile(r'<!--|<(script|style)(?=[\s/>])|<!\[CDATA\[', re.IGNORECASE)
+# their end (the tags of raw text elements end as in html.parser; other endings are left to BeautifulSoup)
+_RAW_TEXT_END = {'script': re.compile(r'</script(\s*>)?', re.IGNORECASE),
+                 'style': re.compile(r'</style(\s*>)?', re.IGNORECASE)}
+_COMMENT_END = re.compile(r'--!?\s*>')
+# a start tag (quoted attribute values may contain ">") and its attributes
+_TAG_PATTERN = re.compile(r'<([a-zA-Z][^\s/>]*)(\s(?:[^>"\']|"[^"]*"|\'[^\']*\')*)?/?>')
+# the message of a failed request (see extract_discussion_metadata)
+_HTTP_ERROR_PATTERN = re.compile(r'HTTP Error \(status code: (\d+)\)')
+_ATTRIBUTE_PATTERN = re.compile(r'([^\s"\'>/=]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+
 
 def extract_discussion_metadata(pr_url: str) -> tuple:
     """
@@ -12,16 +39,119 @@ def extract_discussion_metadata(pr_url: str) -> tuple:
     :param pr_url: the URL of the PR.
     :return: a string with the discussion metadata (in JSON format).
     """
-    # Send an HTTP GET request to the URL
-    response = requests.get(pr_url)
+    # Send an HTTP GET request to the URL (answered from the response cache when possible)
+    response = get_session().get(pr_url)
 
     # Check if the request was successful
     if response.status_code != 200:
         msg = f"HTTP Error (status code: {response.status_code})"
         return msg, msg
 
+    return parse_discussion_page(response.text)
+
+
+def is_fetch_error(metadata) -> bool:
+    """
+    Checks whether the metadata returned by extract_discussion_metadata (or iter_discussions_metadata) is the message
+    of a request that failed temporarily, i.e., that is worth sending again: rate limits (429), server errors (5xx) and
+    connection errors. Other HTTP errors (e.g., 404 or 410 for deleted PRs) are permanent.
+    :param metadata: the events or header metadata.
+    :return: True if the request failed temporarily.
+    """
+    if not isinstance(metadata, str):
+        return False
+    match = _HTTP_ERROR_PATTERN.fullmatch(metadata)
+    if match is not None:
+        status = int(match.group(1))
+        return status == 429 or status >= 500
+    return metadata.startswith("Connection Error (")
+
+
+def parse_discussion_page(html: str) -> tuple:
+    """
+    Extracts the discussion metadata from the HTML of a discussion page.
+    Only the start tags of the DiscussionEvents and DiscussionHeader elements are parsed: each occurrence of their
+    data-target is traced back to the enclosing tag, whose attributes are then tokenized (and unescaped as in
+    html.parser); occurrences in text, comments, scripts or other elements are skipped. Pages where an occurrence
+    cannot be traced back to a tag, or whose comments and scripts cannot be delimited unambiguously (see
+    _raw_text_spans), are parsed with BeautifulSoup instead.
+    :param html: the page content.
+    :return: a tuple with the data-props of the DiscussionEvents and DiscussionHeader elements (None if missing).
+    """
+    props, spans = dict.fromkeys(DISCUSSION_TARGETS), None
+    for match in _TARGET_PATTERN.finditer(html):
+        target = match.group(1)
+        if props[target] is not None:
+            continue
+        # skip the occurrences in comments, scripts and styles (which are not parsed as markup)
+        if spans is None:
+            spans = _raw_text_spans(html)
+            if spans is None:
+                return parse_discussion_page_soup(html)
+            span_starts = [span_start for span_start, _ in spans]
+        i = bisect.bisect_right(span_starts, match.start()) - 1
+        if i >= 0 and match.start() < spans[i][1]:
+            continue
+        start = html.rfind('<', 0, match.start())
+        tag = _TAG_PATTERN.match(html, start)
+        if tag is None:  # e.g., inside a declaration
+            return parse_discussion_page_soup(html)
+        if tag.end() <= match.start() or tag.group(1).lower() != 'div':  # text or another element
+            continue
+        attributes = {}
+        for attribute in _ATTRIBUTE_PATTERN.finditer(tag.group(2) or ''):
+            name, value = attribute.group(1).lower(), attribute.group(2) or attribute.group(3) or attribute.group(4)
+            attributes[name] = unescape(value) if value is not None else ''
+        if attributes.get('data-target') != target:
+            return parse_discussion_page_soup(html)
+        if ' '.join(attributes.get('class', '').split()) == 'SVELTE_HYDRATER contents':
+            props[target] = attributes.get('data-props')
+    return props['DiscussionEvents'], props['DiscussionHeader']
+
+
+def _raw_text_spans(html: str) -> list | None:
+    """
+    Finds the comments, scripts and styles of a page (the parts that are not parsed as markup) in one forward scan, so
+    that a delimiter inside one of them (e.g., "<script" in a comment) does not start another one.
+    :param html: the page content.
+    :return: the sorted (start, end) positions of those parts, or None if the scan is ambiguous: a delimiter that may
+    be inside a tag (e.g., "<!--" in an attribute value), a CDATA section, or a comment or raw text element that is
+    not closed the way html.parser closes it.
+    """
+    spans, position = [], 0
+    while (match := _RAW_TEXT_START.search(html, position)) is not None:
+        start = match.start()
+        # the delimiter must follow a complete tag (or text)
+        last = html.rfind('<', position, start)
+        if last >= 0:
+            tag = _TAG_PATTERN.match(html, last)
+            inside_tag = tag.end() > start if tag is not None else html.find('>', last, start) < 0
+            if inside_tag:
+                return None
+        name = match.group(1)
+        if name is not None:
+            end = _RAW_TEXT_END[name.lower()].search(html, match.end())
+            if end is None or end.group(1) is None:
+                return None
+        elif match.group().startswith('<!--'):
+            end = _COMMENT_END.search(html, match.end())
+            if html.startswith(('<!-->', '<!--->'), start) or end is None or end.group() != '-->':
+                return None
+        else:  # a CDATA section
+            return None
+        spans.append((start, end.end()))
+        position = end.end()
+    return spans
+
+
+def parse_discussion_page_soup(html: str) -> tuple:
+    """
+    Extracts the discussion metadata from the HTML of a discussion page by parsing the whole page with BeautifulSoup.
+    :param html: the page content.
+    :return: a tuple with the data-props of the DiscussionEvents and DiscussionHeader elements (None if missing).
+    """
     # Parse the page content
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = BeautifulSoup(html, 'html.parser')
 
     # Find all divs with class "SVELTE_HYDRATER contents" and data-target="DiscussionEvents"
     discussion_events = soup.find_all('div', class_='SVELTE_HYDRATER contents',
@@ -37,6 +167,160 @@ def extract_discussion_metadata(pr_url: str) -> tuple:
     return events, header
 
 
+class HostRateLimiter:
+    """
+    Spaces out the requests made to each host, so that at most `rate` requests per second start for any host.
+    """
+
+    def __init__(self, rate: float = None):
+        """
+        :param rate: the maximum number of requests per second per host (None for no limit).
+        """
+        self.interval = 1 / rate if rate else 0
+        self.next_start = {}  # host -> earliest time at which the next request may start
+
+    async def wait(self, host: str) -> None:
+        """
+        Waits until a request to the host may start (and books that slot).
+        :param host: the host name.
+        """
+        now = asyncio.get_running_loop().time()
+        start = max(now, self.next_start.get(host, now))
+        self.next_start[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def _fetch_discussion_metadata(session: aiohttp.ClientSession, rate_limiter: HostRateLimiter,
+                                     cache: ResponseCache, pr_url: str, max_retries: int, backoff: float) -> tuple:
+    """
+    Fetches a discussion page, retrying (with exponential backoff) on rate limits, server and connection errors.
+    Pages in the response cache are served locally while fresh, and revalidated with a conditional request otherwise.
+    :param session: the HTTP session.
+    :param rate_limiter: the per-host rate limiter.
+    :param cache: the response cache.
+    :param pr_url: the URL of the PR.
+    :param max_retries: how many times a request is retried.
+    :param backoff: the delay before the first retry (in seconds), doubled at every retry; a Retry-After header
+    (in seconds) takes precedence.
+    :return: a tuple (pr_url, events, header), as in extract_discussion_metadata.
+    """
+    ttl, key, cached = cache.ttl(pr_url), cache_key(pr_url), None
+    if ttl is not None:
+        cached = cache.get(key)
+        if cached is not None and time.time() - cached.stored_at < ttl:
+            return (pr_url,) + parse_discussion_page(cached.text())
+    headers = conditional_headers(cached) if cached is not None else {}
+    host = urlsplit(pr_url).hostname
+    for attempt in range(max_retries + 1):
+        await rate_limiter.wait(host)
+        delay = backoff * 2 ** attempt
+        try:
+            async with session.get(pr_url, headers=headers) as response:
+                if response.status == 304 and cached is not None:
+                    cached = cache.refresh(key, cached, response.headers)
+                    return (pr_url,) + parse_discussion_page(cached.text())
+                if response.status == 200:
+                    body = await response.read()
+                    if ttl is not None:
+                        cache.put(key, str(response.url), response.status, response.headers, body)
+                    return (pr_url,) + parse_discussion_page(body.decode(response.get_encoding(), 'replace'))
+                msg = f"HTTP Error (status code: {response.status})"
+                if response.status != 429 and response.status < 500:
+                    return pr_url, msg, msg
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else delay
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            msg = f"Connection Error ({type(e).__name__}: {e})"
+        if attempt < max_retries:
+            await asyncio.sleep(delay)
+    return pr_url, msg, msg
+
+
+async def fetch_discussions_metadata(pr_urls: Iterable[str], concurrency: int = 16, rate: float = 10.0,
+                                     max_retries: int = 5, backoff: float = 1.0, timeout: float = 60.0,
+                                     cache: ResponseCache = None) -> AsyncIterator[tuple]:
+    """
+    Fetches the discussion metadata of many PRs concurrently, over a pool of keep-alive connections.
+    :param pr_urls: the URLs of the PRs (consumed lazily).
+    :param concurrency: how many requests may be in flight at the same time.
+    :param rate: the maximum number of requests per second per host (None for no limit).
+    :param max_retries: how many times a request is retried on rate limits (429), server errors (5xx) and
+    connection errors.
+    :param backoff: the delay before the first retry (in seconds), doubled at every retry.
+    :param timeout: the total timeout of each request (in seconds).
+    :param cache: the response cache (by default, the shared one; see http_cache.default_cache).
+    :return: an asynchronous iterator of (pr_url, events, header) tuples, in the order they complete. Failed requests
+    yield the error message as events and header (as extract_discussion_metadata does for HTTP errors).
+    """
+    pr_urls = iter(pr_urls)
+    results, end = asyncio.Queue(), object()
+    rate_limiter = HostRateLimiter(rate)
+    cache = cache or default_cache()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async def worker():
+        # each worker takes the next URL until there are none left
+        for pr_url in pr_urls:
+            result = await _fetch_discussion_metadata(session, rate_limiter, cache, pr_url, max_retries, backoff)
+            await results.put(result)
+
+    async def run_workers():
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            await results.put(end)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        workers = asyncio.ensure_future(run_workers())
+        try:
+            while (result := await results.get()) is not end:
+                yield result
+            await workers  # re-raises unexpected errors of the workers
+        finally:
+            workers.cancel()
+
+
+def iter_discussions_metadata(pr_urls: Iterable[str], **kwargs) -> Iterator[tuple]:
+    """
+    Synchronous version of fetch_discussions_metadata (the requests are made by an event loop in another thread).
+    :param pr_urls: the URLs of the PRs.
+    :param kwargs: the options of fetch_discussions_metadata (concurrency, rate, max_retries, backoff, timeout,
+    cache).
+    :return: an iterator of (pr_url, events, header) tuples, in the order they complete.
+    """
+    return iter_async(fetch_discussions_metadata(pr_urls, **kwargs))
+
+
+def iter_async(results: AsyncIterator) -> Iterator:
+    """
+    Iterates over an asynchronous iterator from synchronous code (it is consumed by an event loop in another thread,
+    and its items are handed over through a queue).
+    :param results: the asynchronous iterator (e.g., fetch_discussions_metadata(...)).
+    :return: an iterator over the same items.
+    """
+    items, end = queue.Queue(), object()
+
+    async def produce():
+        async for item in results:
+            items.put(item)
+
+    def run():
+        try:
+            asyncio.run(produce())
+        except BaseException as e:
+            items.put(e)
+        items.put(end)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    while (item := items.get()) is not end:
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+    thread.join()
+
+
 def save_checkpoint(df: pd.DataFrame, out_file_prefix: str, i: int, save_at: int) -> None:
     """
     Saves the dataframe to a CSV file and deletes the prior checkpoint file. Checkpoint files are saved at the data folder.
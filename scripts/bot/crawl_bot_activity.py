@@ -1,100 +1,109 @@
 """
-This script crawls the Hugging Face Community Bot activity page and saves all discussion URLs to a CSV file.
-The script uses Selenium to interact with the page and BeautifulSoup to parse the HTML content.
-The discussion URLs are saved to a CSV file named discussion_urls.csv in the data directory.
+This script crawls the Hugging Face Community Bot activity page with Selenium (see crawl_utils.py) and saves all
+discussion URLs to a CSV file.
+With `--backend api`, the PRs are listed through the Hub's JSON API (see discussions_api.py) instead, without a
+browser. The activity page has no JSON counterpart, so this listing is partial: the bot's PRs are only looked up in
+the repositories of the conversion dataset (hf_conversions.csv, if it was downloaded already) and in the ones of the
+known PRs, and all of these repositories are listed again on every run. PRs in other repositories (the ones that
+get_sfconvert_prs.py adds to the conversion dataset) are only found by the Selenium crawl.
+The discussion URLs are saved to a CSV file named <username>_pr_urls.csv in the data directory. The crawl is
+incremental: if the file already exists, only the discussions that are newer than the ones in it are loaded.
 @Author: Joanna C. S. Santos
 """
-import csv
-import json
-import math
-import time
+import argparse
 from pathlib import Path
 
-from bs4 import BeautifulSoup
+import pandas as pd
 from tqdm import tqdm
-from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException, ElementClickInterceptedException
-from selenium.webdriver.common.by import By
-
-
-def get_num_contributions():
-    page_source = driver.page_source
-    soup = BeautifulSoup(page_source, 'html.parser')
-    # find div with class = "SVELTE_HYDRATER contents" and data-target = "UserProfile"
-    user_profile = soup.find_all('div', class_='SVELTE_HYDRATER contents',
-                                 attrs={'data-target': 'UserProfile'})
-    # parse json in the attribute data-props
-    user_profile_json = json.loads(user_profile[0].get('data-props'))
-    return user_profile_json['communityScore']
-
-
-def load_more():
-    num_activities = get_num_contributions()
-    num_pages = math.ceil(num_activities / 20) + 1
-    sleep_time = 1.8
-    # num_pages = 10
-    for i in tqdm(range(num_pages)):
-        try:
-            # Locate and click the "Load More" button
-            load_more_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Load more')]")
-            load_more_button.click()
-            # Wait for new content to load
-            time.sleep(sleep_time)
-        except (NoSuchElementException, ElementClickInterceptedException):
-            print("Stopped loading more data")
-            # Break if the "Load More" button is not found or cannot be clicked
-            break
-
-
-def parse_discussions() -> None:
+
+from discussions_api import HF_URL, discussion_url, iter_repos_discussions
+from pr_headers import load_pr_table
+
+DATA_DIR = Path('../../data')
+
+
+def load_known_urls(output_file: Path) -> list:
     """
-    Parse the page source to find and save new discussion URLs to CSV
+    Load the discussion URLs saved by previous runs.
+    :param output_file: the CSV file with the discussion URLs.
+    :return: the URLs (newest first), or an empty list if the file does not exist yet.
     """
-    page_source = driver.page_source
-    soup = BeautifulSoup(page_source, 'html.parser')
-
-    # Find and save new discussion URLs to CSV
-    with open(output_file, "w", newline="", encoding="utf8") as file:
-        writer = csv.writer(file, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        writer.writerow(["pr_url"])  # Write header once at the start
-        print("Searching for URLs")
-        links = soup.find_all('a', href=True)
-        for link in tqdm(links):
-            href = link['href']
-            if '/discussions/' in href:
-                full_url = f"https://huggingface.co{href}" if href.startswith("/") else href
-                writer.writerow([full_url])
+    if not output_file.exists():
+        return []
+    return pd.read_csv(output_file)['pr_url'].drop_duplicates().tolist()
 
 
-if __name__ == '__main__':
+def list_prs_api(username: str, known_urls: list) -> list:
+    """
+    List the PRs opened by a user through the JSON API, in the repositories of the conversion dataset and in the
+    ones of the known PRs (a partial listing: PRs in other repositories are not found).
+    :param username: the user name.
+    :param known_urls: the PR URLs saved by previous runs.
+    :return: the URLs of the PRs that are not known yet (newest first).
+    """
+    conversions_file = DATA_DIR / 'hf_conversions.csv'
+    if conversions_file.exists():
+        repo_ids = load_pr_table(conversions_file, columns=['model_id'])['model_id'].dropna()
+    else:
+        print(f"WARNING: {conversions_file} not found, only the repositories of the known PRs are listed")
+        repo_ids = pd.Series([], dtype=object)
+    known_urls = pd.Series(known_urls, dtype=object)
+    known_repo_ids = known_urls.str.removeprefix(HF_URL + "/").str.split("/discussions/").str[0]
+    repo_ids = pd.concat([repo_ids, known_repo_ids]).drop_duplicates()
+    prs = [(discussion['createdAt'], discussion_url(repo_id, discussion['num']))
+           for repo_id, discussion in tqdm(iter_repos_discussions(repo_ids, author=username,
+                                                                  discussion_type="pull_request"), unit='PR')]
+    known_urls = set(known_urls.str.split("#").str[0])  # URLs crawled from the activity page may have anchors
+    return [url for _, url in sorted(prs, reverse=True) if url not in known_urls]
+
+
+def crawl_prs_selenium(username: str, known_urls: list) -> list:
+    """
+    Crawl the community activity page of a user with Selenium.
+    :param username: the user name.
+    :param known_urls: the PR URLs saved by previous runs.
+    :return: the URLs of the PRs that are not known yet (newest first).
+    """
+    from selenium import webdriver
+    from crawl_utils import crawl_new_discussions
+
     # Initialize WebDriver
     driver = webdriver.Firefox()
     try:
-        # other usernames to test the script
-        # username = "julien-c"
-        # username = "lsiddiqsunny"
-        # username = "Linaqruf"
-        username = "SFconvertbot"
-
-        # Open the URL
-        url = f"https://huggingface.co/{username}/activity/community"
-        driver.get(url)
-
-        # Load as many discussions as possible
-        load_more()
-
-        # Get the page source and parse it
-        output_file = Path(f"../../data/{username.lower()}_pr_urls.csv")
-        parse_discussions()
-
+        # Load discussions until the ones found by previous runs are reached
+        return crawl_new_discussions(driver, f"{HF_URL}/{username}/activity/community", known_urls)
     finally:
         if driver:
             # Close the browser
             driver.quit()
 
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Crawl the PRs opened by the SFconvertbot.")
+    parser.add_argument("--backend", choices=["api", "selenium"], default="selenium",
+                        help="Crawl the activity page with Selenium (default) or list the PRs through the JSON API "
+                             "(partial: only in the repositories of the conversion dataset and of the known PRs)")
+    args = parser.parse_args()
+
+    # other usernames to test the script
+    # username = "julien-c"
+    # username = "lsiddiqsunny"
+    # username = "Linaqruf"
+    username = "SFconvertbot"
+    output_file = DATA_DIR / f"{username.lower()}_pr_urls.csv"
+    known_urls = load_known_urls(output_file)
+    if args.backend == "api":
+        new_urls = list_prs_api(username, known_urls)
+    else:
+        new_urls = crawl_prs_selenium(username, known_urls)
+
+    # the new discussions go before the known ones (newest first)
+    print(f"Found {len(new_urls)} new discussions ({len(known_urls)} known)")
+    pd.DataFrame({"pr_url": new_urls + known_urls}).to_csv(output_file, index=False)
+
+
 """
-If the script gets stuck on the last step, we can do a manual workaround. We go to the Firefox instance, and run on the console:
+If the Selenium crawl gets stuck on the last step, we can do a manual workaround. We go to the Firefox instance, and run on the console:
 ```
 const discussionLinks = Array.from(document.querySelectorAll('a'))
     .filter(link => link.href.includes('/discussion'))
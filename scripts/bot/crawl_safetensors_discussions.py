@@ -1,79 +1,87 @@
+"""
+This script crawls the discussions of the safetensors' convert space (open and closed ones) and saves their metadata
+to converter_discussions.csv in the data directory. Only the metadata of the discussions that are not in the file yet
+is fetched. By default, the discussions are listed through the Hub's JSON API (see discussions_api.py); with
+`--backend selenium`, the discussion pages of the space are crawled with Selenium instead (see crawl_utils.py).
+"""
+import argparse
 import csv
-import json
-import math
-import time
 from pathlib import Path
 
-from bs4 import BeautifulSoup
-from tqdm import tqdm
-from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException, ElementClickInterceptedException
-from selenium.webdriver.common.by import By
-from scripts.bot.bot_utils import extract_discussion_metadata
+import pandas as pd
 
-def click_load_more():
-    # how long to wait in between clicks
-    sleep_time = 1.8
-    # arbitrary number of pages to load (large enough to load all activities)
-    for _ in tqdm(range(2 ** 32)):
-        try:
-            # Locate and click the "Load More" button
-            load_more_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Load more')]")
-            load_more_button.click()
-            # Wait for new content to load
-            time.sleep(sleep_time)
-        except (NoSuchElementException, ElementClickInterceptedException):
-            print("Stopped loading more data")
-            # Break if the "Load More" button is not found or cannot be clicked
-            break
+from discussions_api import HF_URL, discussion_url, iter_repos_discussions
+from scripts.bot.bot_utils import iter_discussions_metadata
 
+COLUMNS = ["discussion_url", "discussion_status", "events", "header"]
+SPACE_ID = "safetensors/convert"
 
-def find_discussions() -> []:
+
+def load_known_discussions(output_file: Path) -> pd.DataFrame:
     """
-    Parse the page source to find and save new discussion URLs to CSV
+    Load the discussions saved by previous runs.
+    :param output_file: the CSV file with the discussions.
+    :return: a data frame with the COLUMNS (empty if the file does not exist yet).
     """
-    page_source = driver.page_source
-    soup = BeautifulSoup(page_source, 'html.parser')
-    output = []
-    # Find and save new discussion URLs to CSV
-    print("Searching for URLs")
-    links = soup.find_all('a', href=True)
-    for link in tqdm(links):
-        href = link['href']
-        if '/discussions/' in href and not href.endswith("/new"):
-            full_url = f"https://huggingface.co{href}" if href.startswith("/") else href
-            output.append(full_url)
-    return output
+    if not output_file.exists():
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.read_csv(output_file, dtype=str, keep_default_na=False)
 
 
-if __name__ == '__main__':
+def list_discussions_api(status: str, known_urls: set) -> list:
+    """
+    List the discussions of the convert space with a given status through the JSON API.
+    :param status: "open" or "closed".
+    :param known_urls: the discussion URLs saved by previous runs (with the same status).
+    :return: the URLs of the discussions that are not known yet (newest first).
+    """
+    nums = [discussion['num'] for _, discussion in
+            iter_repos_discussions([SPACE_ID], repo_type="space", status=status, discussion_type="discussion")]
+    urls = [discussion_url(SPACE_ID, num, repo_type="space") for num in sorted(nums, reverse=True)]
+    return [url for url in urls if url not in known_urls]
+
+
+def crawl_discussions_selenium(status: str, known_urls: set) -> list:
+    """
+    Crawl the discussions of the convert space with a given status with Selenium.
+    :param status: "open" or "closed".
+    :param known_urls: the discussion URLs saved by previous runs (with the same status).
+    :return: the URLs of the discussions that are not known yet (newest first).
+    """
+    from selenium import webdriver
+    from crawl_utils import crawl_new_discussions
+
     # Initialize WebDriver
     driver = webdriver.Firefox()
     try:
-        discussions = []
-        for status in ["open", "closed"]:
-            url = f"https://huggingface.co/spaces/safetensors/convert/discussions?status={status}&type=discussion"
-            # Open the URL
-            driver.get(url)
-            # Load as many discussions as possible
-            click_load_more()
-            # Get the page source and parse it
-            for url in find_discussions():
-                events, header = extract_discussion_metadata(url)
-                discussions.append((url, status, events, header))
-
+        url = f"{HF_URL}/spaces/{SPACE_ID}/discussions?status={status}&type=discussion"
+        # Load discussions until the ones found by previous runs are reached
+        return crawl_new_discussions(driver, url, known_urls)
     finally:
         if driver:
             # Close the browser
             driver.quit()
 
-    output_file = Path(f"../../data/converter_discussions.csv")
-    # save the results
-    with open(output_file, "w", newline="", encoding="utf8") as file:
-        writer = csv.writer(file, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        writer.writerow(["discussion_url", "discussion_status","events", "header"])  # Write header once at the start
-        for url, status, events, header in discussions:
-            writer.writerow([url, status, events, header])
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Crawl the discussions of the safetensors' convert space.")
+    parser.add_argument("--backend", choices=["api", "selenium"], default="api",
+                        help="List the discussions through the JSON API (default) or crawl them with Selenium")
+    args = parser.parse_args()
+    list_new_discussions = list_discussions_api if args.backend == "api" else crawl_discussions_selenium
 
+    output_file = Path(f"../../data/converter_discussions.csv")
+    df_known = load_known_discussions(output_file)
+    discussions = []
+    for status in ["open", "closed"]:
+        known_urls = set(df_known.loc[df_known["discussion_status"] == status, "discussion_url"])
+        new_urls = list_new_discussions(status, known_urls)
+        print(f"Found {len(new_urls)} new {status} discussions")
+        # only the metadata of the new discussions is fetched (concurrently)
+        for url, events, header in iter_discussions_metadata(new_urls):
+            discussions.append((url, status, events, header))
 
+    # save the results (discussions that changed status since the previous run are replaced)
+    df_new = pd.DataFrame(discussions, columns=COLUMNS)
+    df_known = df_known[~df_known["discussion_url"].isin(df_new["discussion_url"])]
+    pd.concat([df_new, df_known], ignore_index=True).to_csv(output_file, index=False, quoting=csv.QUOTE_MINIMAL)
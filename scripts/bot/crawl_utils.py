@@ -0,0 +1,106 @@
+"""
+Incremental crawling of the Hugging Face pages that list discussions with a "Load more" button (e.g., the community
+activity of a user or the discussions of a space), newest first.
+Instead of loading the whole list at every run, pagination stops once the page reaches discussions that were already
+stored by a previous run, so only the new ones are returned (and only their metadata needs to be fetched). After each
+click, the crawler waits until the number of discussion links on the page grows (rather than sleeping for a fixed
+time), and stops when it does not grow anymore or the button disappears.
+"""
+from typing import Iterable
+
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support.ui import WebDriverWait
+
+LOAD_MORE_XPATH = "//button[contains(text(), 'Load more')]"
+# the links to discussions (excluding the link to open a new one)
+DISCUSSION_LINKS_SELECTOR = "a[href*='/discussions/']:not([href$='/new'])"
+# how many consecutive known discussions at the end of the list mean that the rest was crawled before (discussions
+# with recent activity may move up the list, so a single known discussion is not enough)
+KNOWN_RUN = 20
+
+
+def count_discussion_links(driver: WebDriver) -> int:
+    """
+    Counts the discussion links on the page.
+    :param driver: the web driver.
+    :return: the number of links.
+    """
+    return driver.execute_script(f"return document.querySelectorAll(\"{DISCUSSION_LINKS_SELECTOR}\").length")
+
+
+def find_discussion_urls(driver: WebDriver) -> list:
+    """
+    Finds the discussion URLs on the page.
+    :param driver: the web driver.
+    :return: the (absolute) URLs, in the order they appear, without duplicates.
+    """
+    hrefs = driver.execute_script(f"return Array.from(document.querySelectorAll(\"{DISCUSSION_LINKS_SELECTOR}\"))"
+                                  f".map(link => link.href)")
+    return list(dict.fromkeys(hrefs))
+
+
+def count_trailing_known(urls: list, known_urls: set) -> int:
+    """
+    Counts the consecutive known URLs at the end of a list.
+    :param urls: the URLs.
+    :param known_urls: the URLs stored by previous runs.
+    :return: the number of known URLs after the last new one.
+    """
+    count = 0
+    for url in reversed(urls):
+        if url not in known_urls:
+            break
+        count += 1
+    return count
+
+
+def click_load_more(driver: WebDriver, timeout: float = 30.0, poll_frequency: float = 0.1) -> bool:
+    """
+    Clicks the "Load more" button and waits until more discussions are shown.
+    :param driver: the web driver.
+    :param timeout: the maximum time to wait for new discussions (in seconds).
+    :param poll_frequency: how often the number of discussions is checked (in seconds).
+    :return: True if more discussions were loaded, False if there is no button or nothing was loaded.
+    """
+    buttons = driver.find_elements(By.XPATH, LOAD_MORE_XPATH)
+    if not buttons:
+        return False
+    num_links = count_discussion_links(driver)
+    try:
+        # clicked via JavaScript, so the button does not need to be scrolled into view (or be uncovered)
+        driver.execute_script("arguments[0].click();", buttons[0])
+    except StaleElementReferenceException:
+        return True  # the list was re-rendered in the meantime; the caller tries again
+    try:
+        WebDriverWait(driver, timeout, poll_frequency).until(lambda d: count_discussion_links(d) > num_links)
+    except TimeoutException:
+        return False
+    return True
+
+
+def crawl_new_discussions(driver: WebDriver, url: str, known_urls: Iterable[str] = (), known_run: int = KNOWN_RUN,
+                          max_pages: int = None, timeout: float = 30.0) -> list:
+    """
+    Loads a list of discussions until it reaches discussions that were already crawled (or its end).
+    :param driver: the web driver.
+    :param url: the URL of the page with the list.
+    :param known_urls: the discussion URLs stored by previous runs (empty for a full crawl).
+    :param known_run: how many consecutive known discussions end the crawl.
+    :param max_pages: (optional) the maximum number of times "Load more" is clicked.
+    :param timeout: the maximum time to wait for each page of discussions (in seconds).
+    :return: the URLs of the new discussions, in the order of the list.
+    """
+    known_urls = set(known_urls)
+    driver.get(url)
+    WebDriverWait(driver, timeout).until(lambda d: d.execute_script("return document.readyState") == "complete")
+    num_pages = 0
+    while max_pages is None or num_pages < max_pages:
+        urls = find_discussion_urls(driver)
+        if known_urls and count_trailing_known(urls, known_urls) >= min(known_run, len(known_urls)):
+            break
+        if not click_load_more(driver, timeout):
+            break
+        num_pages += 1
+    return [u for u in find_discussion_urls(driver) if u not in known_urls]
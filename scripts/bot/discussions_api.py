@@ -0,0 +1,148 @@
+"""
+Browser-free listing of the discussions of Hugging Face repositories, through the Hub's paginated JSON endpoint
+(`/api/{repo_type}s/{repo_id}/discussions?p=N`, as in huggingface_hub.HfApi.get_repo_discussions). Each response has
+a page of discussions and the total count, so once the first page of a repository is fetched, its other pages are
+fetched concurrently (along with the pages of other repositories). The base URL is configurable, so a local stand-in
+can be used instead of the Hub.
+"""
+import asyncio
+import math
+from typing import AsyncIterator, Iterable, Iterator
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from bot_utils import HostRateLimiter, iter_async
+
+HF_URL = "https://huggingface.co"
+# prefix of the repository URLs of each type
+REPO_TYPE_PREFIXES = {"model": "", "dataset": "datasets/", "space": "spaces/"}
+
+
+def discussion_url(repo_id: str, num: int, repo_type: str = "model", base_url: str = HF_URL) -> str:
+    """
+    Builds the URL of a discussion page.
+    :param repo_id: the repository (e.g., "org/model").
+    :param num: the number of the discussion.
+    :param repo_type: "model", "dataset" or "space".
+    :param base_url: the URL of the Hub.
+    :return: the URL (e.g., "https://huggingface.co/org/model/discussions/1").
+    """
+    return f"{base_url}/{REPO_TYPE_PREFIXES[repo_type]}{repo_id}/discussions/{num}"
+
+
+async def _fetch_page(session: aiohttp.ClientSession, rate_limiter: HostRateLimiter, url: str, params: dict,
+                      max_retries: int, backoff: float) -> dict | None:
+    """
+    Fetches a page of discussions, retrying (with exponential backoff) on rate limits, server and connection errors.
+    :param session: the HTTP session.
+    :param rate_limiter: the per-host rate limiter.
+    :param url: the URL of the listing.
+    :param params: the query parameters (including the page number, p).
+    :param max_retries: how many times a request is retried.
+    :param backoff: the delay before the first retry (in seconds), doubled at every retry; a Retry-After header
+    (in seconds) takes precedence.
+    :return: the response (with the discussions, count and start keys), or None if the repository was not found
+    (e.g., it was deleted) or its discussions are disabled.
+    """
+    host = urlsplit(url).hostname
+    for attempt in range(max_retries + 1):
+        await rate_limiter.wait(host)
+        delay = backoff * 2 ** attempt
+        try:
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    return await response.json()
+                if response.status in (401, 403, 404):
+                    return None
+                if response.status != 429 and response.status < 500:
+                    response.raise_for_status()
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else delay
+                error = aiohttp.ClientResponseError(response.request_info, response.history, status=response.status)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = e
+        if attempt < max_retries:
+            await asyncio.sleep(delay)
+    raise error
+
+
+async def fetch_repos_discussions(repo_ids: Iterable[str], repo_type: str = "model", status: str = None,
+                                  discussion_type: str = None, author: str = None, base_url: str = HF_URL,
+                                  concurrency: int = 16, rate: float = 10.0, max_retries: int = 5,
+                                  backoff: float = 1.0, timeout: float = 60.0) -> AsyncIterator[tuple]:
+    """
+    Lists the discussions of many repositories, fetching their pages concurrently.
+    :param repo_ids: the repositories (e.g., ["org/model"]).
+    :param repo_type: "model", "dataset" or "space".
+    :param status: (optional) only "open" or "closed" discussions.
+    :param discussion_type: (optional) only "discussion" or "pull_request".
+    :param author: (optional) only the discussions opened by this user (e.g., "SFconvertbot").
+    :param base_url: the URL of the Hub (or of a local stand-in).
+    :param concurrency: how many requests may be in flight at the same time.
+    :param rate: the maximum number of requests per second (None for no limit).
+    :param max_retries: how many times a request is retried on rate limits (429), server errors (5xx) and
+    connection errors.
+    :param backoff: the delay before the first retry (in seconds), doubled at every retry.
+    :param timeout: the total timeout of each request (in seconds).
+    :return: an asynchronous iterator of (repo_id, discussion) tuples, where the discussion is a dictionary as listed
+    by the Hub (num, title, status, isPullRequest, createdAt, author, ...), in the order the pages complete.
+    """
+    params = {key: value for key, value in (("status", status), ("type", discussion_type), ("author", author))
+              if value is not None}
+    pages, results, end = asyncio.Queue(), asyncio.Queue(), object()
+    for repo_id in repo_ids:
+        pages.put_nowait((repo_id, 0))
+    rate_limiter = HostRateLimiter(rate)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async def worker():
+        while True:
+            repo_id, page = await pages.get()
+            try:
+                url = f"{base_url}/api/{repo_type}s/{repo_id}/discussions"
+                response = await _fetch_page(session, rate_limiter, url, {**params, "p": page}, max_retries,
+                                             backoff)
+                if response is None:
+                    continue
+                discussions = response["discussions"]
+                if page == 0 and discussions:
+                    # the other pages are known from the total count and the page size
+                    for other_page in range(1, math.ceil(response["count"] / len(discussions))):
+                        pages.put_nowait((repo_id, other_page))
+                for discussion in discussions:
+                    await results.put((repo_id, discussion))
+            except Exception as e:
+                await results.put(e)
+                raise
+            finally:
+                pages.task_done()
+
+    async def run_workers():
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await pages.join()
+        finally:
+            for w in workers:
+                w.cancel()
+            await results.put(end)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        runner = asyncio.ensure_future(run_workers())
+        try:
+            while (result := await results.get()) is not end:
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+        finally:
+            runner.cancel()
+
+
+def iter_repos_discussions(repo_ids: Iterable[str], **kwargs) -> Iterator[tuple]:
+    """
+    Synchronous version of fetch_repos_discussions (the requests are made by an event loop in another thread).
+    :param repo_ids: the repositories.
+    :param kwargs: the options of fetch_repos_discussions.
+    :return: an iterator of (repo_id, discussion) tuples.
+    """
+    return iter_async(fetch_repos_discussions(repo_ids, **kwargs))
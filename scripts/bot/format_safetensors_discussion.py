@@ -4,24 +4,18 @@ The script reads the data from a CSV file, processes it, and saves it to a new C
 @Author: Joanna C. S. Santos
 """
 
-import pandas as pd
-import numpy as np
-import os
-import re
-import json
+from pr_headers import load_pr_table
+
 if __name__ == '__main__':
-    df = pd.read_csv('../../data/converter_discussions.csv')
+    df = load_pr_table('../../data/converter_discussions.csv', column='header')
     df['source'] = 'Converter Discussions'
 
-    for index, row in df.iterrows():
-        header = row['header']
-        json_header = json.loads(header)
-        df.at[index, 'title'] = json_header['discussion']['title']
-        df.at[index, 'is_true_positive'] = 1
-        df.at[index, 'comments'] = None
-        df.at[index, 'id'] = index + 8000
-        df.at[index, 'cosine_similarity'] = None
-        df.at[index, 'content'] = row['events']
+    df['title'] = df['header_title']
+    df['is_true_positive'] = 1
+    df['comments'] = None
+    df['id'] = df.index + 8000
+    df['cosine_similarity'] = None
+    df['content'] = df['events']
 
     # make is_true_positive an integer
     df['is_true_positive'] = df['is_true_positive'].astype(int)
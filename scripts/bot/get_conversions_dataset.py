@@ -8,7 +8,7 @@ from pathlib import Path
 from datasets import load_dataset
 from tqdm import tqdm
 
-from scripts.bot.bot_utils import extract_discussion_metadata, save_checkpoint
+from scripts.bot.bot_utils import iter_discussions_metadata, save_checkpoint
 
 if __name__ == '__main__':
     save_at = 500
@@ -18,11 +18,12 @@ if __name__ == '__main__':
     df = ds.to_pandas()
     df['time'].min(), df['time'].max()
     # iterate over dataframe to check whether the PRs were merged
-    for i, row in tqdm(df.iterrows(), total=len(df)):
-        pr_url = row['pr_url']
-        events, header = extract_discussion_metadata(pr_url)
-        df.loc[i, 'discussion_metadata'] = events
-        df.loc[i, 'header_metadata'] = header
+    # (the PRs are fetched concurrently and each result is stored as soon as it arrives)
+    rows_by_url = df.groupby('pr_url').groups
+    results = iter_discussions_metadata(rows_by_url.keys())
+    for i, (pr_url, events, header) in tqdm(enumerate(results), total=len(rows_by_url)):
+        df.loc[rows_by_url[pr_url], 'discussion_metadata'] = events
+        df.loc[rows_by_url[pr_url], 'header_metadata'] = header
         # saves the data frame every save_at iterations to avoid losing data
         if i != 0 and i % save_at == 0:
             save_checkpoint(df, out_file_prefix, i, save_at)
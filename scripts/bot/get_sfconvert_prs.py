@@ -3,89 +3,64 @@ This script is used to
 (1) Obtain PR metadata  for the PR URLs that were created by the sfconvertbot.
 (2) Merge it with the metadata from the conversion dataset.
 (3) Save the metadata in a CSV file.
+The fetched metadata is kept in a SQLite store (sfconvertbot_pr_metadata.sqlite3), so interrupted runs resume without
+refetching the PRs that were already processed (requests that failed temporarily, e.g., because of a rate limit or a
+server error, are stored as well, but fetched again).
 @Author: Joanna C. S. Santos
 """
-import json
-import os
 from pathlib import Path
 
 import pandas as pd
 from tqdm import tqdm
 
-from bot_utils import save_checkpoint
-from scripts.bot.bot_utils import extract_discussion_metadata
+from pr_headers import HEADER_FIELDS, format_created_at, load_pr_table, parse_header
+from result_store import RESULT_COLUMNS, ResultStore, normalize_pr_urls
+from scripts.bot.bot_utils import is_fetch_error, iter_discussions_metadata
 
 DATA_DIR = Path('../../data')
 
 
-def load_conversion_dataset():
+def load_conversion_dataset() -> pd.DataFrame:
     """
     Loads the conversion dataset.
-    :return: a cache where the key is the pr_url and the value is the row within the data frame.
+    :return: a data frame indexed by the pr_url (without the anchor) with the PRs that have a model_id.
     """
-    df = pd.read_csv(DATA_DIR / 'hf_conversions.csv').fillna("")
+    df = load_pr_table(DATA_DIR / 'hf_conversions.csv')
     # remove duplicates (we found a few [8] duplicates in this dataset!)
-    df.drop_duplicates(subset='pr_url', inplace=True)
-    cache = {}  # key is the PR URL
-    for index, row in df.iterrows():
-        pr_url = row['pr_url'].split("#")[0]
-        if row['model_id']:
-            # ensure timestamps are consistent across datasets
-            header = row['header_metadata'] if row['header_metadata'] else ""
-            json_header = json.loads(row['header_metadata']) if header.startswith('{') else None
-            row['time'] = json_header['discussion']['createdAt'] if json_header else None
-            # after ensuring timestamps are consistent, we can add to cache
-            cache[pr_url] = row
-    return cache
+    df = df.drop_duplicates(subset='pr_url')
+    # ensure timestamps are consistent across datasets (the creation date of the discussions is used)
+    df['time'] = format_created_at(df['header_created_at'])
+    df = df.drop(columns=list(HEADER_FIELDS)).fillna("")
+    df = df[df['model_id'] != ""]
+    df = df.set_index(normalize_pr_urls(df['pr_url']).rename(None))
+    # PR URLs that only differ in their anchors are the same PR (the last one is kept)
+    return df[~df.index.duplicated(keep='last')]
 
 
 if __name__ == '__main__':
     # load prior results from the conversion dataset
     cache = load_conversion_dataset()
 
-    # specify the save rate for the last 500 iterations
-    save_at = 250
-
     # load the PR URLs from the sfconvertbot
     df = pd.read_csv(DATA_DIR / 'sfconvertbot_pr_urls.csv')
     out_file_prefix = 'sfconvertbot_pr_metadata'
-    processed_prs = set()
-
-    # iterate over dataframe to check whether the PRs were merged
-    for i, row in tqdm(df.iterrows(), total=len(df), unit='PR URL'):
-        pr_url = row['pr_url'].split("#")[0]
-        processed_prs.add(pr_url)
-        if pr_url in cache:
-            row = cache[pr_url]
-            df.loc[i, 'discussion_metadata'] = row['discussion_metadata']
-            df.loc[i, 'header_metadata'] = row['header_metadata']
-            df.loc[i, 'model_id'] = row['model_id']
-            df.loc[i, 'time'] = row['time']
-            continue
-        else:
-            events, header = extract_discussion_metadata(pr_url)
-            df.loc[i, 'discussion_metadata'] = events
-            df.loc[i, 'header_metadata'] = header
-            # parse the header as JSON
-            json_header = json.loads(header) if header and header.startswith('{') else None
-            df.loc[i, 'model_id'] = json_header['discussion']['repo']['name'] if json_header else None
-            df.loc[i, 'time'] = json_header['discussion']['createdAt'] if json_header else None
-
-        # SAVES THE DATAFRAME EVERY 500 ITERATIONS
-        if i != 0 and i % save_at == 0:
-            save_checkpoint(df, out_file_prefix, i, save_at)
 
-    # add in any PRs that were not processed from the cache
-    for pr_url, row in tqdm(cache.items(), total=len(cache), unit='PR URL'):
-        if pr_url not in processed_prs:
-            df = pd.concat([df, row.to_frame().T], ignore_index=True)
-            processed_prs.add(pr_url)
+    # the results are stored as they are fetched, so an interrupted run resumes where it stopped
+    store = ResultStore(DATA_DIR / (out_file_prefix + '.sqlite3'))
+    pr_urls = normalize_pr_urls(df['pr_url'])
+    in_cache = pr_urls.isin(cache.index)
+    store.merge(cache.loc[pr_urls[in_cache].unique(), RESULT_COLUMNS])
 
-    # save the final data frame
-    df.to_csv(DATA_DIR / (out_file_prefix + '.csv'), index=False)
+    # fetch the metadata of the other PRs (concurrently, as the responses arrive)
+    to_fetch = pr_urls[~in_cache & ~pr_urls.isin(store.keys())].unique()
+    results = iter_discussions_metadata(to_fetch)
+    for pr_url, events, header in tqdm(results, total=len(to_fetch), unit='PR URL'):
+        # parse the header as JSON
+        fields = parse_header(header)
+        # failures (e.g., server errors or timeouts) are exported as before, but fetched again by the next run
+        store.put(pr_url, (events, header, fields['header_repo_name'], fields['header_created_at']),
+                  failed=is_fetch_error(events) or is_fetch_error(header))
 
-    # delete last checkpoint files
-    for i in range(save_at, len(df), save_at):
-        check_file = DATA_DIR / (out_file_prefix + f'_{i}.csv')
-        if check_file.exists():
-            os.remove(check_file)
+    # save the final data frame, with any PRs that were not processed from the cache at the end
+    store.export_csv(df, DATA_DIR / (out_file_prefix + '.csv'), extra=cache[~cache.index.isin(pr_urls)])
+    store.close()
@@ -0,0 +1,122 @@
+"""
+Extraction of the fields of the discussion headers (i.e., the `data-props` of the DiscussionHeader element, see
+bot_utils.extract_discussion_metadata) stored as JSON strings in the PR tables (e.g., the `header_metadata` column of
+hf_conversions.csv and sfconvertbot_pr_metadata.csv, or the `header` column of converter_discussions.csv).
+The headers are parsed once, in parallel chunks, and the fields used by the analyses are stored as typed columns
+(HEADER_FIELDS) next to the raw JSON in a Parquet file, so later scripts only read the columns they need.
+"""
+import json
+from pathlib import Path
+
+import pandas as pd
+from joblib import Parallel, delayed
+
+try:  # orjson is much faster, but optional
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# extracted columns and their paths in the header
+HEADER_FIELDS = {
+    "header_status": ("discussion", "status"),
+    "header_created_at": ("discussion", "createdAt"),
+    "header_repo_name": ("discussion", "repo", "name"),
+    "header_title": ("discussion", "title"),
+}
+# how many headers are parsed by each job
+CHUNK_SIZE = 20_000
+
+
+def parse_header(header) -> dict:
+    """
+    Extract the HEADER_FIELDS of a header.
+    :param header: the header (a JSON string); anything else (e.g., an HTTP error message or NaN) has no fields.
+    :return: a dictionary with the value of each field (None if it is missing).
+    """
+    fields = dict.fromkeys(HEADER_FIELDS)
+    if not isinstance(header, str) or not header.startswith("{"):
+        return fields
+    data = _loads(header)
+    for column, path in HEADER_FIELDS.items():
+        value = data
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        fields[column] = value
+    return fields
+
+
+def _parse_chunk(headers: list) -> list:
+    """
+    Extract the fields of a chunk of headers.
+    :param headers: the headers.
+    :return: a list with one tuple of field values per header.
+    """
+    return [tuple(parse_header(header).values()) for header in headers]
+
+
+def extract_header_fields(headers: pd.Series, n_jobs: int = -1, chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Extract the HEADER_FIELDS of many headers.
+    :param headers: the headers (JSON strings).
+    :param n_jobs: the number of parallel jobs (as in joblib); inputs with a single chunk are parsed in this process.
+    :param chunk_size: how many headers are parsed by each job.
+    :return: a data frame with the same index as headers and one column per field: the status is categorical, the
+    creation date is a UTC timestamp and the other fields are strings.
+    """
+    values = headers.to_numpy(dtype=object)
+    chunks = [values[i:i + chunk_size].tolist() for i in range(0, len(values), chunk_size)]
+    if len(chunks) <= 1:
+        results = [_parse_chunk(chunk) for chunk in chunks]
+    else:
+        results = Parallel(n_jobs=n_jobs)(delayed(_parse_chunk)(chunk) for chunk in chunks)
+    rows = [row for result in results for row in result]
+    df = pd.DataFrame(rows, columns=list(HEADER_FIELDS), index=headers.index, dtype=object)
+    df["header_status"] = df["header_status"].astype("category")
+    df["header_created_at"] = pd.to_datetime(df["header_created_at"], utc=True, format="ISO8601")
+    return df
+
+
+def format_created_at(created_at: pd.Series) -> pd.Series:
+    """
+    Format creation dates as in the headers (e.g., "2023-05-01T12:00:00.000Z").
+    :param created_at: the UTC timestamps.
+    :return: the formatted dates (NaN for missing ones).
+    """
+    return created_at.dt.strftime("%Y-%m-%dT%H:%M:%S.%f").str[:-3] + "Z"
+
+
+def headers_file(input_file: str | Path) -> Path:
+    """
+    Where the table with the extracted fields is stored (next to the input file, in Parquet format).
+    :param input_file: the CSV file (possibly zipped) with the headers.
+    :return: the Parquet file path.
+    """
+    input_file = Path(input_file)
+    return input_file.with_name(f"{input_file.name.split('.')[0]}_headers.parquet")
+
+
+def load_pr_table(input_file: str | Path, column: str = "header_metadata", columns: list = None) -> pd.DataFrame:
+    """
+    Load (some of the columns of) a PR table with the fields of its headers (see HEADER_FIELDS).
+    If the fields were not extracted yet (or the input file changed since then), the table is read, the fields are
+    extracted and everything is saved first.
+    :param input_file: the CSV file (possibly zipped) with the headers.
+    :param column: the column with the headers.
+    :param columns: (optional) the columns to be read (by default, all of them).
+    :return: the data frame.
+    """
+    out_file = headers_file(input_file)
+    if not out_file.exists() or out_file.stat().st_mtime < Path(input_file).stat().st_mtime:
+        df = pd.read_csv(input_file)
+        # columns with values of mixed types (e.g., error messages in numeric columns) are stored as strings
+        for c in df.columns[df.dtypes == object]:
+            is_string = df[c].dropna().map(lambda v: isinstance(v, str))
+            if not is_string.all():
+                df[c] = df[c].map(str, na_action="ignore")
+        df = pd.concat([df.drop(columns=list(HEADER_FIELDS), errors="ignore"), extract_header_fields(df[column])],
+                       axis=1)
+        df.to_parquet(out_file, index=False)
+        return df if columns is None else df[columns]
+    return pd.read_parquet(out_file, columns=columns)
@@ -0,0 +1,127 @@
+"""
+Resumable store of the PR metadata fetched by the crawlers (see get_sfconvert_prs.py), keyed by the normalized PR URL
+(i.e., without its anchor). Each result is written to a SQLite file as soon as it is fetched, so an interrupted run
+resumes where it stopped (without refetching the stored PRs), and the final CSV is exported from the store in chunks.
+Temporarily failed fetches (e.g., a server error or a timeout) are stored as well, so they are exported as before,
+but they are flagged as failed and fetched again by the next run. Permanent errors (e.g., a deleted PR) are not.
+"""
+import json
+import sqlite3
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+
+# the metadata stored for each PR
+RESULT_COLUMNS = ['discussion_metadata', 'header_metadata', 'model_id', 'time']
+# how many rows are exported at a time
+CHUNK_SIZE = 10_000
+
+
+def normalize_pr_urls(pr_urls: pd.Series) -> pd.Series:
+    """
+    Normalizes PR URLs, i.e., removes their anchors (PR URLs that only differ in their anchors are the same PR).
+    :param pr_urls: the PR URLs.
+    :return: the normalized URLs.
+    """
+    return pr_urls.str.split("#").str[0]
+
+
+class ResultStore:
+    """
+    Key-value store of the metadata of each PR (the columns), keyed by the normalized PR URL.
+    """
+
+    def __init__(self, store_file: str | Path, columns: list = None):
+        """
+        :param store_file: the SQLite file (created if it does not exist).
+        :param columns: the metadata columns (RESULT_COLUMNS by default).
+        """
+        self.columns = columns or RESULT_COLUMNS
+        self.connection = sqlite3.connect(store_file, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS results (pr_url TEXT PRIMARY KEY, "
+                                f"{', '.join(f'{c} TEXT' for c in self.columns)}, failed INTEGER NOT NULL DEFAULT 0)")
+        # stores created before failures were flagged
+        if 'failed' not in {row[1] for row in self.connection.execute("PRAGMA table_info(results)")}:
+            self.connection.execute("ALTER TABLE results ADD COLUMN failed INTEGER NOT NULL DEFAULT 0")
+
+    def keys(self) -> set:
+        """
+        :return: the PR URLs in the store whose metadata was fetched successfully (i.e., the ones not to refetch).
+        """
+        return {key for key, in self.connection.execute("SELECT pr_url FROM results WHERE NOT failed")}
+
+    def put(self, pr_url: str, values: Iterable, failed: bool = False) -> None:
+        """
+        Stores (or replaces) the metadata of a PR, committing it immediately.
+        :param pr_url: the normalized PR URL.
+        :param values: the values of the columns.
+        :param failed: whether the fetch failed (the values are the error messages), so the PR is fetched again.
+        """
+        self.put_many([(pr_url, *values)], failed)
+
+    def put_many(self, rows: Iterable[tuple], failed: bool = False) -> None:
+        """
+        Stores (or replaces) the metadata of many PRs in a single transaction.
+        :param rows: tuples with the normalized PR URL and the values of the columns.
+        :param failed: whether the fetches failed.
+        """
+        columns = ", ".join(['pr_url', *self.columns, 'failed'])
+        placeholders = ", ".join("?" * (len(self.columns) + 2))
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(f"INSERT OR REPLACE INTO results ({columns}) VALUES ({placeholders})",
+                                        ((*row, int(failed)) for row in rows))
+
+    def merge(self, df: pd.DataFrame) -> None:
+        """
+        Bulk-merges the metadata of many PRs (e.g., from the conversion dataset), replacing the stored ones.
+        :param df: a data frame indexed by the normalized PR URL with the columns.
+        """
+        values = df[self.columns].astype(object).where(df[self.columns].notna(), None)
+        self.put_many(zip(df.index, *(values[c] for c in self.columns)))
+
+    def read(self, pr_urls: Iterable[str]) -> pd.DataFrame:
+        """
+        Reads the metadata of some PRs.
+        :param pr_urls: the normalized PR URLs.
+        :return: a data frame indexed by the PR URL with the columns (PRs not in the store are missing).
+        """
+        query = (f"SELECT {', '.join(['pr_url', *self.columns])} FROM results "
+                 f"WHERE pr_url IN (SELECT value FROM json_each(?))")
+        return pd.read_sql_query(query, self.connection, params=[json.dumps(list(pr_urls))], index_col='pr_url')
+
+    def export_csv(self, df: pd.DataFrame, out_file: str | Path, extra: pd.DataFrame = None,
+                   chunk_size: int = CHUNK_SIZE) -> int:
+        """
+        Writes a CSV file with the rows of a data frame and the metadata of their PRs, chunk by chunk.
+        :param df: the rows, with a pr_url column (the stored columns are replaced by the stored metadata, or are
+        missing values for PRs that are not in the store).
+        :param out_file: the CSV file.
+        :param extra: (optional) other rows appended as they are (e.g., PRs of the conversion dataset that are not in
+        df); columns that are not in df are added to the output.
+        :param chunk_size: how many rows are written at a time.
+        :return: the number of rows written.
+        """
+        extra = extra if extra is not None else pd.DataFrame()
+        columns = list(dict.fromkeys([*df.columns, *self.columns, *extra.columns]))
+        pd.DataFrame(columns=columns).to_csv(out_file, index=False)
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size].copy()
+            pr_urls = normalize_pr_urls(chunk['pr_url'])
+            values = self.read(pr_urls.unique()).reindex(pr_urls)
+            for c in self.columns:
+                chunk[c] = values[c].to_numpy()
+            chunk.reindex(columns=columns).to_csv(out_file, mode='a', header=False, index=False)
+        for start in range(0, len(extra), chunk_size):
+            extra.iloc[start:start + chunk_size].reindex(columns=columns).to_csv(out_file, mode='a', header=False,
+                                                                                 index=False)
+        return len(df) + len(extra)
+
+    def close(self) -> None:
+        """
+        Closes the SQLite file.
+        """
+        self.connection.close()
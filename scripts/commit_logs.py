@@ -0,0 +1,211 @@
+"""
+Helpers to read the commit logs produced by get_commit_logs.py (i.e., `selected_<group>_commits<suffix>.csv`).
+These files are very large (mostly because of the `all_files_in_tree` column), so instead of loading them
+fully in memory we stream them in chunks, one repository at a time.
+They can also be normalized into integer tables (commits, paths, changes and tree) saved in Parquet format, so that
+the analyses do not need to re-parse the `changed_files` and `all_files_in_tree` strings.
+"""
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from model_files import PATHS_SEPARATOR, explode_model_files, match_model_files
+
+# columns of the commit logs (see get_commit_logs.py)
+COMMITS_COLUMNS = ["repo_url", "commit_hash", "author", "date", "message", "changed_files", "all_files_in_tree"]
+# symbols used by get_commit_logs.py for each change type (added, deleted, modified, renamed, type changed, copied)
+CHANGE_STATUSES = ["+", "-", "*", "=", ">", "<"]
+# how many rows (commits) are parsed at a time
+CHUNK_SIZE = 5_000
+
+
+def iter_commit_chunks(input_file: str | Path,
+                       row_filter: Callable[[pd.DataFrame], pd.Series] = None,
+                       chunk_size: int = CHUNK_SIZE,
+                       usecols: list = None) -> Iterator[pd.DataFrame]:
+    """
+    Read a commit log in chunks. NaN cells are set to empty strings (as in `pd.read_csv(...).fillna("")`).
+    :param input_file: the CSV file with the commit log.
+    :param row_filter: (optional) a function that takes a chunk and returns a boolean mask of the rows to keep.
+    :param chunk_size: how many rows are parsed at a time.
+    :param usecols: (optional) subset of columns to read.
+    :return: an iterator over the (filtered) chunks. Chunks with no rows left after filtering are skipped.
+    """
+    for chunk in pd.read_csv(input_file, chunksize=chunk_size, usecols=usecols):
+        chunk = chunk.fillna("")
+        if row_filter is not None:
+            chunk = chunk[row_filter(chunk)]
+        if not chunk.empty:
+            yield chunk
+
+
+def iter_repository_commits(input_file: str | Path,
+                            row_filter: Callable[[pd.DataFrame], pd.Series] = None,
+                            chunk_size: int = CHUNK_SIZE,
+                            usecols: list = None) -> Iterator[tuple[str, pd.DataFrame]]:
+    """
+    Stream a commit log one repository at a time.
+    The row filter is applied within each chunk, so only the rows that pass it are buffered.
+    Since get_commit_logs.py writes all commits of a repository consecutively, the memory needed is bounded by the
+    largest repository (after filtering) plus one chunk, rather than by the whole file.
+    If a repository is not stored contiguously (e.g., files that were concatenated by hand), it is yielded once per
+    contiguous block of rows.
+    :param input_file: the CSV file with the commit log.
+    :param row_filter: (optional) a function that takes a chunk and returns a boolean mask of the rows to keep.
+    :param chunk_size: how many rows are parsed at a time.
+    :param usecols: (optional) subset of columns to read (it must include `repo_url`).
+    :return: an iterator of (repo_url, commits) tuples, where commits is a data frame in the same order as the file.
+    """
+    pending_url, pending = None, []  # rows read so far for the repository that is not finished yet
+    for chunk in iter_commit_chunks(input_file, row_filter, chunk_size, usecols):
+        repo_urls = chunk["repo_url"]
+        # split the chunk into blocks of consecutive rows from the same repository
+        block_ids = repo_urls.ne(repo_urls.shift()).cumsum()
+        for _, block in chunk.groupby(block_ids, sort=False):
+            repo_url = block["repo_url"].iat[0]
+            if pending and repo_url != pending_url:
+                yield pending_url, pd.concat(pending, ignore_index=True)
+                pending = []
+            pending_url = repo_url
+            pending.append(block)
+
+    if pending:
+        yield pending_url, pd.concat(pending, ignore_index=True)
+
+
+class NormalizedCommitLog(NamedTuple):
+    """
+    Relational version of a commit log, where paths are interned as integer ids:
+    - commits: one row per commit (commit_id, repo_url, commit_hash, author, date, message), where commit_id is the
+      position of the commit in the log (and in this table).
+    - paths: the path dictionary (path_id, path, is_model_file), where path_id is the position of the path.
+    - changes: the files changed by each commit (commit_id, path_id, change_status).
+    - tree: the model files present in the tree of each commit (commit_id, path_id).
+    """
+    commits: pd.DataFrame
+    paths: pd.DataFrame
+    changes: pd.DataFrame
+    tree: pd.DataFrame
+
+
+def _intern(paths: pd.Series, path_ids: dict) -> np.ndarray:
+    """
+    Map paths to their integer ids, assigning new ids to paths that were not seen before.
+    :param paths: the paths to be interned.
+    :param path_ids: the path dictionary (path -> id), updated in place.
+    :return: an array with the ids of the paths.
+    """
+    codes, uniques = pd.factorize(paths)
+    ids = np.fromiter((path_ids.setdefault(p, len(path_ids)) for p in uniques), dtype=np.int32, count=len(uniques))
+    return ids[codes]
+
+
+def normalize_commit_log(input_file: str | Path, chunk_size: int = CHUNK_SIZE) -> NormalizedCommitLog:
+    """
+    Parse the free-text columns of a commit log (`changed_files` and `all_files_in_tree`) into integer tables.
+    The log is processed in chunks, so only the normalized tables are kept in memory.
+    :param input_file: the CSV file with the commit log.
+    :param chunk_size: how many rows are parsed at a time.
+    :return: the normalized commit log.
+    """
+    path_ids = {}  # path -> path_id
+    commits, changes, tree, num_commits = [], [], [], 0
+    for chunk in iter_commit_chunks(input_file, chunk_size=chunk_size):
+        chunk.index = pd.RangeIndex(num_commits, num_commits + len(chunk))
+        num_commits += len(chunk)
+        commits.append(chunk[["repo_url", "commit_hash", "author", "date", "message"]])
+
+        # changed files are stored as "<status> <path>" items separated by ";"
+        changed_files = chunk["changed_files"]
+        changed_files = changed_files[changed_files != ""].str.split(PATHS_SEPARATOR).explode()
+        changed_files = changed_files.str.split(n=1, expand=True)
+        if not changed_files.empty:
+            changed_files = changed_files.dropna()
+            changes.append(pd.DataFrame({"commit_id": changed_files.index.to_numpy(np.int32),
+                                         "path_id": _intern(changed_files[1], path_ids),
+                                         "change_status": changed_files[0].to_numpy()}))
+
+        # only the model files of the tree are kept (the full tree is an order of magnitude larger)
+        model_files = explode_model_files(chunk["all_files_in_tree"])
+        tree.append(pd.DataFrame({"commit_id": model_files.index.to_numpy(np.int32),
+                                  "path_id": _intern(model_files, path_ids)}))
+
+    df_commits = pd.concat(commits) if commits else pd.DataFrame(columns=COMMITS_COLUMNS[:5])
+    df_commits.insert(0, "commit_id", np.arange(len(df_commits), dtype=np.int32))
+    df_commits.reset_index(drop=True, inplace=True)
+    df_commits["repo_url"] = df_commits["repo_url"].astype("category")
+    df_commits["author"] = df_commits["author"].astype("category")
+    df_commits["date"] = pd.to_datetime(df_commits["date"])
+
+    df_paths = pd.DataFrame({"path_id": np.arange(len(path_ids), dtype=np.int32),
+                             "path": pd.Series(list(path_ids), dtype=object)})
+    df_paths["is_model_file"] = match_model_files(df_paths["path"])
+
+    df_changes = pd.concat(changes, ignore_index=True) if changes else pd.DataFrame(
+        {"commit_id": [], "path_id": [], "change_status": []})
+    df_changes = df_changes.astype({"commit_id": np.int32, "path_id": np.int32})
+    df_changes["change_status"] = pd.Categorical(df_changes["change_status"], categories=CHANGE_STATUSES)
+
+    df_tree = pd.concat(tree, ignore_index=True).astype(np.int32)
+    return NormalizedCommitLog(df_commits, df_paths, df_changes, df_tree)
+
+
+def normalized_files(input_file: str | Path) -> dict:
+    """
+    Where the tables of a normalized commit log are stored (next to the CSV file, in Parquet format).
+    :param input_file: the CSV file with the commit log.
+    :return: a dictionary that maps the table name to its file path.
+    """
+    input_file = Path(input_file)
+    return {table: input_file.with_name(f"{input_file.stem}_{table}.parquet") for table in NormalizedCommitLog._fields}
+
+
+def save_normalized_commit_log(log: NormalizedCommitLog, input_file: str | Path) -> None:
+    """
+    Save the tables of a normalized commit log (see `normalized_files`).
+    :param log: the normalized commit log.
+    :param input_file: the CSV file the commit log was normalized from.
+    """
+    for table, out_file in normalized_files(input_file).items():
+        getattr(log, table).to_parquet(out_file, index=False)
+
+
+def load_normalized_commit_log(input_file: str | Path) -> NormalizedCommitLog:
+    """
+    Load the normalized version of a commit log.
+    If it was not normalized yet (or the CSV file changed since then), it is normalized and saved first.
+    :param input_file: the CSV file with the commit log.
+    :return: the normalized commit log.
+    """
+    files = normalized_files(input_file)
+    is_stale = any(not f.exists() or f.stat().st_mtime < Path(input_file).stat().st_mtime for f in files.values())
+    if is_stale:
+        log = normalize_commit_log(input_file)
+        save_normalized_commit_log(log, input_file)
+        return log
+    return NormalizedCommitLog(**{table: pd.read_parquet(f) for table, f in files.items()})
+
+
+def touches_model_files(log: NormalizedCommitLog) -> np.ndarray:
+    """
+    Find the commits that added/modified/deleted at least one model file.
+    :param log: the normalized commit log.
+    :return: a boolean mask over the commits table.
+    """
+    is_model_file = log.paths["is_model_file"].to_numpy()
+    mask = np.zeros(len(log.commits), dtype=bool)
+    mask[log.changes["commit_id"].to_numpy()[is_model_file[log.changes["path_id"].to_numpy()]]] = True
+    return mask
+
+
+def has_model_files_in_tree(log: NormalizedCommitLog) -> np.ndarray:
+    """
+    Find the commits that contain at least one model file in their tree.
+    :param log: the normalized commit log.
+    :return: a boolean mask over the commits table.
+    """
+    mask = np.zeros(len(log.commits), dtype=bool)
+    mask[log.tree["commit_id"].to_numpy()] = True
+    return mask
@@ -0,0 +1,178 @@
+"""
+Run-length representation of the repositories' evolution data (i.e., repositories_evolution_<group>_commits*.csv).
+The evolution data has one row per (commit, model file), so a model file that is unchanged across N commits yields
+N near-identical rows. Here, each model file is mapped to runs of consecutive commits of its repository (in
+chronological order) in which it exists with the same serialization format. Each run is valid from the date of its
+first commit until the date of the next commit of the repository (exclusive), or indefinitely if it lasts until the
+last analyzed commit.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# columns of the evolution data (see analyze_commit_history.py)
+EVOLUTION_COLUMNS = ["repo_url", "commit_hash", "model_file_path", "serialization_format", "message", "author", "date",
+                     "is_in_commit"]
+# formats considered as pickle-based when looking for conversions to safetensors
+PICKLE_FORMATS = ("pickle",)
+
+
+class FormatTimeline(NamedTuple):
+    """
+    Run-length version of the evolution data:
+    - commits: one row per analyzed commit (commit_id, repo_url, commit_hash, message, author, date, timestamp),
+      sorted by repository and time, where commit_id is the position of the commit in this table and timestamp is the
+      date in UTC.
+    - runs: one row per run (repo_url, model_file_path, serialization_format, first_commit, last_commit, start, end),
+      sorted by model file and start, where the commits of a run are first_commit, ..., last_commit (consecutive
+      commits of the repository) and the run is valid in [start, end). The end is NaT for runs that last until the
+      last analyzed commit of the repository.
+    - touches: the model files changed by each commit (commit_id, model_file_path), i.e., the rows with is_in_commit.
+    """
+    commits: pd.DataFrame
+    runs: pd.DataFrame
+    touches: pd.DataFrame
+
+
+def to_utc(date: str | pd.Timestamp) -> pd.Timestamp:
+    """
+    Convert a date to a UTC timestamp (naive dates are assumed to be in UTC).
+    :param date: the date.
+    :return: the timestamp.
+    """
+    date = pd.Timestamp(date)
+    return date.tz_localize("UTC") if date.tzinfo is None else date.tz_convert("UTC")
+
+
+def build_format_timeline(df: pd.DataFrame) -> FormatTimeline:
+    """
+    Compress the evolution data into runs.
+    :param df: the evolution data (with the EVOLUTION_COLUMNS).
+    :return: the format timeline.
+    """
+    df = df.drop_duplicates(["repo_url", "commit_hash", "model_file_path"]).reset_index(drop=True)
+    timestamps = pd.to_datetime(df["date"], utc=True, format="ISO8601")
+
+    # commits, in chronological order within each repository
+    df_commits = df[["repo_url", "commit_hash", "message", "author", "date"]].assign(timestamp=timestamps)
+    df_commits = df_commits.drop_duplicates(["repo_url", "commit_hash"])
+    df_commits = df_commits.sort_values(["repo_url", "timestamp"], kind="stable").reset_index(drop=True)
+    df_commits.insert(0, "commit_id", np.arange(len(df_commits), dtype=np.int32))
+    commits_index = pd.MultiIndex.from_frame(df_commits[["repo_url", "commit_hash"]])
+    commit_ids = commits_index.get_indexer(pd.MultiIndex.from_frame(df[["repo_url", "commit_hash"]]))
+
+    # rows of the same model file, in commit order: a run starts when the format changes or commits are skipped
+    df_rows = pd.DataFrame({"repo_url": df["repo_url"], "model_file_path": df["model_file_path"],
+                            "serialization_format": df["serialization_format"], "commit_id": commit_ids})
+    df_rows = df_rows.sort_values(["model_file_path", "commit_id"], kind="stable").reset_index(drop=True)
+    paths, formats, ids = (df_rows[c].to_numpy() for c in ("model_file_path", "serialization_format", "commit_id"))
+    is_new_run = np.ones(len(df_rows), dtype=bool)
+    is_new_run[1:] = (paths[1:] != paths[:-1]) | (formats[1:] != formats[:-1]) | (ids[1:] != ids[:-1] + 1)
+
+    df_runs = df_rows[is_new_run].reset_index(drop=True).rename(columns={"commit_id": "first_commit"})
+    run_ends = np.append(np.flatnonzero(is_new_run)[1:] - 1, len(df_rows) - 1)
+    df_runs["first_commit"] = df_runs["first_commit"].astype(np.int32)
+    df_runs["last_commit"] = ids[run_ends].astype(np.int32)
+
+    # a run ends when the next commit of the repository starts (if any)
+    timestamps = df_commits["timestamp"]
+    next_ids = df_runs["last_commit"].to_numpy() + 1
+    has_next = next_ids < len(df_commits)
+    has_next[has_next] = df_commits["repo_url"].to_numpy()[next_ids[has_next]] == df_runs["repo_url"].to_numpy()[has_next]
+    df_runs["start"] = timestamps.take(df_runs["first_commit"]).to_numpy()
+    df_runs["end"] = timestamps.take(np.where(has_next, next_ids, 0)).where(has_next, pd.NaT).to_numpy()
+
+    is_in_commit = df["is_in_commit"].astype(str).str.lower().eq("true").to_numpy()
+    df_touches = pd.DataFrame({"commit_id": commit_ids[is_in_commit].astype(np.int32),
+                               "model_file_path": df["model_file_path"].to_numpy()[is_in_commit]})
+    df_touches = df_touches.sort_values(["commit_id", "model_file_path"]).reset_index(drop=True)
+    return FormatTimeline(df_commits, df_runs, df_touches)
+
+
+def timeline_to_evolution(timeline: FormatTimeline) -> pd.DataFrame:
+    """
+    Expand a format timeline back into the evolution data (one row per commit and model file).
+    :param timeline: the format timeline.
+    :return: a data frame with the EVOLUTION_COLUMNS, sorted by commit and model file.
+    """
+    runs = timeline.runs
+    lengths = (runs["last_commit"] - runs["first_commit"] + 1).to_numpy()
+    run_ids = np.repeat(np.arange(len(runs)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    commit_ids = runs["first_commit"].to_numpy()[run_ids] + offsets
+
+    df = timeline.commits.iloc[commit_ids][["repo_url", "commit_hash", "message", "author", "date"]]
+    df = df.reset_index(drop=True)
+    df["model_file_path"] = runs["model_file_path"].to_numpy()[run_ids]
+    df["serialization_format"] = runs["serialization_format"].to_numpy()[run_ids]
+    touches = pd.MultiIndex.from_frame(timeline.touches[["commit_id", "model_file_path"]])
+    df["is_in_commit"] = pd.MultiIndex.from_arrays([commit_ids, df["model_file_path"]]).isin(touches)
+    df["commit_id"] = commit_ids
+    df = df.sort_values(["commit_id", "model_file_path"], kind="stable").reset_index(drop=True)
+    return df[EVOLUTION_COLUMNS]
+
+
+def format_at(timeline: FormatTimeline, model_file_path: str, date: str | pd.Timestamp) -> str | None:
+    """
+    Find the serialization format of a model file at a given date.
+    :param timeline: the format timeline.
+    :param model_file_path: the model file (as in the evolution data, i.e., "<repo_url>/<file path>").
+    :param date: the date (naive dates are assumed to be in UTC).
+    :return: the serialization format, or None if the file did not exist at that date.
+    """
+    runs = timeline.runs
+    paths = runs["model_file_path"].to_numpy()
+    lo, hi = np.searchsorted(paths, model_file_path, "left"), np.searchsorted(paths, model_file_path, "right")
+    date = to_utc(date)
+    i = lo + np.searchsorted(runs["start"].iloc[lo:hi], date, "right") - 1
+    if i < lo:
+        return None
+    end = runs["end"].iat[i]
+    return runs["serialization_format"].iat[i] if pd.isna(end) or date < end else None
+
+
+def formats_at(timeline: FormatTimeline, date: str | pd.Timestamp) -> pd.DataFrame:
+    """
+    Find the serialization format of every model file at a given date.
+    :param timeline: the format timeline.
+    :param date: the date (naive dates are assumed to be in UTC).
+    :return: the runs that are valid at that date (at most one per model file).
+    """
+    date = to_utc(date)
+    runs = timeline.runs
+    return runs[(runs["start"] <= date) & (runs["end"].isna() | (date < runs["end"]))]
+
+
+def first_safetensors_per_repo(timeline: FormatTimeline) -> pd.DataFrame:
+    """
+    Find when safetensors files first appeared in each repository.
+    :param timeline: the format timeline.
+    :return: a data frame with the repo_url, the date and the commit_hash of the first commit with safetensors files.
+    """
+    runs = timeline.runs[timeline.runs["serialization_format"] == "safetensors"]
+    first_commits = runs.groupby("repo_url")["first_commit"].min()
+    df = timeline.commits.iloc[first_commits.to_numpy()][["repo_url", "timestamp", "commit_hash"]]
+    return df.rename(columns={"timestamp": "date"}).reset_index(drop=True)
+
+
+def pickle_to_safetensors_converters(timeline: FormatTimeline,
+                                     pickle_formats: tuple = PICKLE_FORMATS) -> pd.DataFrame:
+    """
+    Find the repositories that converted from pickle to safetensors, i.e., that had pickle files before their first
+    safetensors files.
+    :param timeline: the format timeline.
+    :param pickle_formats: the formats considered as pickle-based (e.g., also "torch.save").
+    :return: a data frame with the repo_url, when pickle files first appeared (pickle_since) and when safetensors
+    files first appeared (safetensors_since), and whether the repository still had pickle files at its last analyzed
+    commit (kept_pickle).
+    """
+    runs = timeline.runs
+    is_pickle = runs["serialization_format"].isin(pickle_formats)
+    pickle_since = runs[is_pickle].groupby("repo_url")["start"].min().rename("pickle_since")
+    safetensors_since = runs[runs["serialization_format"] == "safetensors"].groupby("repo_url")["start"].min()
+    kept_pickle = runs[is_pickle & runs["end"].isna()].groupby("repo_url").size().gt(0).rename("kept_pickle")
+    df = pd.concat([pickle_since, safetensors_since.rename("safetensors_since")], axis=1, join="inner")
+    df = df[df["pickle_since"] < df["safetensors_since"]]
+    df["kept_pickle"] = kept_pickle.reindex(df.index, fill_value=False).astype(bool)
+    return df.rename_axis("repo_url").reset_index()
@@ -0,0 +1,208 @@
+"""
+Concurrent fetching of the comments of the PRs found by a GitHub search, and streaming output of the collected PRs.
+The comments of each PR are fetched page by page (following the `next` links) by a pool of threads that share a
+token bucket of requests: the bucket is refilled from the X-RateLimit-Remaining / X-RateLimit-Reset headers of the
+responses, and the threads only sleep (until the reset time) when the budget is actually exhausted.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator
+
+import requests
+
+from http_cache import get_session
+
+
+class RateBudget:
+    """
+    Token bucket of the requests left in the current rate limit window, shared by several threads.
+    The budget is unknown (i.e., unlimited) until the first response with rate limit headers.
+    """
+
+    def __init__(self):
+        self.remaining = None  # requests left in the current window (None if unknown)
+        self.reset = 0.0  # when the current window ends (in seconds since the epoch)
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Take a token, waiting for the window to reset if there are none left.
+        """
+        while True:
+            with self.lock:
+                now = time.time()
+                if self.reset <= now:  # the window is over, so the budget is unknown again
+                    self.remaining = None
+                if self.remaining is None or self.remaining > 0:
+                    if self.remaining is not None:
+                        self.remaining -= 1
+                    return
+                delay = self.reset - now
+            print(f"Rate limit exhausted. Sleeping for {delay:.0f} seconds.")
+            time.sleep(delay)
+
+    def update(self, headers: dict) -> None:
+        """
+        Refill the bucket from the rate limit headers of a response. Responses of the same window may arrive out of
+        order, so the lowest remaining count of the latest window is kept (and stale headers, e.g., of cached
+        responses, are ignored).
+        :param headers: the response headers.
+        """
+        if "X-RateLimit-Remaining" not in headers or "X-RateLimit-Reset" not in headers:
+            return
+        remaining, reset = int(headers["X-RateLimit-Remaining"]), float(headers["X-RateLimit-Reset"])
+        with self.lock:
+            if reset <= time.time():
+                return
+            if reset > self.reset or self.remaining is None:
+                self.remaining, self.reset = remaining, reset
+            elif reset == self.reset:
+                self.remaining = min(self.remaining, remaining)
+
+
+class CommentsClient:
+    """
+    Client of the comment listings of the issues and PRs (e.g., the comments_url of the search results).
+    """
+
+    def __init__(self, headers: dict = None, budget: RateBudget = None, session: requests.Session = None,
+                 per_page: int = 100, max_retries: int = 5):
+        """
+        :param headers: the request headers (e.g., the Authorization token).
+        :param budget: the rate budget (shared with other clients of the same API).
+        :param session: the HTTP session (by default, the one of the response cache; see http_cache.py).
+        :param per_page: the number of comments per page.
+        :param max_retries: how many times a rate-limited request is retried.
+        """
+        self.headers = headers or {}
+        self.budget = budget or RateBudget()
+        self.session = session or get_session()
+        self.per_page = per_page
+        self.max_retries = max_retries
+
+    def _get(self, url: str, params: dict = None) -> requests.Response | None:
+        """
+        Fetch a page, waiting for a token of the budget (and retrying when rate limited).
+        :param url: the URL.
+        :param params: the query parameters.
+        :return: the response, or None if it was unauthorized or not found.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.budget.acquire()
+            response = self.session.get(url, headers=self.headers, params=params)
+            self.budget.update(response.headers)
+            if response.status_code in (401, 404):
+                print(f"Could not access {url} (status code: {response.status_code}).")
+                return None
+            if response.status_code in (403, 429) and attempt < self.max_retries:
+                if "Retry-After" in response.headers:  # secondary rate limit
+                    time.sleep(int(response.headers["Retry-After"]))
+                    continue
+                if response.headers.get("X-RateLimit-Remaining") == "0":
+                    continue  # the budget is exhausted now, so the next attempt waits for the reset
+            response.raise_for_status()
+            return response
+
+    def fetch_comments(self, url: str) -> list:
+        """
+        Fetch all comments of an issue or PR, following the pagination links.
+        :param url: the URL of the comments (e.g., https://api.github.com/repos/<owner>/<repo>/issues/<n>/comments).
+        :return: the comments (as returned by the API).
+        """
+        comments, params = [], {"per_page": self.per_page}
+        while url:
+            response = self._get(url, params)
+            if response is None:
+                break
+            comments += response.json()
+            # the next link already has the query parameters
+            url, params = response.links.get("next", {}).get("url"), None
+        return comments
+
+
+def iter_with_comments(prs: Iterable[dict], fetch_comments: Callable[[str], list],
+                       concurrency: int = 8) -> Iterator[tuple]:
+    """
+    Fetch the comments of PRs concurrently, as the PRs arrive (e.g., from a search that is still running).
+    :param prs: the PRs (dictionaries with a comments_url).
+    :param fetch_comments: a function that fetches the comments of a PR given their URL (e.g.,
+    CommentsClient.fetch_comments).
+    :param concurrency: how many PRs are processed at the same time.
+    :return: an iterator of (pr, comments) tuples, in the order they complete.
+    """
+    with ThreadPoolExecutor(concurrency) as executor:
+        pending = set()
+        for pr in prs:
+            pending.add(executor.submit(lambda p: (p, fetch_comments(p["comments_url"])), pr))
+            # at most a few PRs wait for a thread, so the PRs are consumed as fast as they are processed
+            if len(pending) >= 2 * concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from (future.result() for future in done)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from (future.result() for future in done)
+
+
+class JsonArrayWriter:
+    """
+    Writes a JSON array item by item, so the items do not have to be kept in memory. The array is closed when the
+    writer is closed (even after an error or an interruption), so the file can always be loaded with json.load.
+    """
+
+    def __init__(self, output_file: str, append: bool = False, key: str = None):
+        """
+        :param output_file: the JSON file (overwritten, unless append is set).
+        :param append: whether to append the items to the array of an existing file (written by a JsonArrayWriter).
+        :param key: (optional) the field that identifies the items: an item whose key was already written (including
+        the items of the existing file, when appending) is skipped.
+        """
+        self.count = 0
+        self.key, self.keys = key, set()
+        if append and os.path.exists(output_file):
+            if key is not None:
+                with open(output_file) as f:
+                    self.keys = {item[key] for item in json.load(f)}
+            # reopen the array, i.e., remove its closing bracket
+            with open(output_file, "rb+") as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(size - 1)
+                if f.read(1) != b"]":
+                    raise ValueError(f"{output_file} does not end with a JSON array")
+                f.truncate(size - 1)
+                self.count = int(size > 2)  # whether the array has items
+            self.file = open(output_file, "a")
+        else:
+            self.file = open(output_file, "w")
+            self.file.write("[")
+
+    def write(self, item) -> bool:
+        """
+        Append an item to the array (and flush it to the file).
+        :param item: the item (serializable to JSON).
+        :return: False if the item was skipped because its key was already written, True otherwise.
+        """
+        if self.key is not None:
+            if item[self.key] in self.keys:
+                return False
+            self.keys.add(item[self.key])
+        self.file.write((", " if self.count else "") + json.dumps(item))
+        self.file.flush()
+        self.count += 1
+        return True
+
+    def close(self) -> None:
+        """
+        Close the array and the file.
+        """
+        if not self.file.closed:
+            self.file.write("]")
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
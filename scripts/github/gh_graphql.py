@@ -0,0 +1,268 @@
+"""
+Batched GraphQL search of pull requests with their comments.
+With the REST API, every page of 100 search results costs one search request and every PR costs (at least) one more
+request for its comments. The GraphQL search returns a page of PRs with the first page of their comments in a single
+query, and the remaining comment pages of several PRs are fetched together in one query (one alias per PR), so most
+PRs cost no extra request. The search has the same cap of 1000 results per query as the REST one, so it runs over the
+same date windows (see gh_search.py; the client has a compatible `count` method to plan them).
+The progress (the current window and the cursor of its next page) is saved to a state file after each page, so an
+interrupted crawl resumes where it stopped.
+"""
+import json
+import os
+import time
+from typing import Iterator
+
+import requests
+
+from http_cache import get_session
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+# the number of PRs per search page and of comments per comment page (at most 100 each; 50 x 100 nodes per query is
+# well below the node limit of the API)
+PRS_PER_PAGE, COMMENTS_PER_PAGE = 50, 100
+# the number of PRs whose remaining comments are fetched in the same query
+COMMENTS_BATCH = 10
+
+COMMENT_PAGE = f"""
+fragment CommentPage on IssueCommentConnection {{
+  pageInfo {{ hasNextPage endCursor }}
+  nodes {{ body }}
+}}
+"""
+
+COUNT_QUERY = """
+query CountPRs($q: String!) {
+  search(query: $q, type: ISSUE, first: 1) { issueCount }
+}
+"""
+
+SEARCH_QUERY = f"""
+query SearchPRs($q: String!, $first: Int!, $after: String) {{
+  search(query: $q, type: ISSUE, first: $first, after: $after) {{
+    pageInfo {{ hasNextPage endCursor }}
+    nodes {{
+      ... on PullRequest {{
+        id
+        title
+        url
+        body
+        author {{ login __typename }}
+        comments(first: {COMMENTS_PER_PAGE}) {{ ...CommentPage }}
+      }}
+    }}
+  }}
+}}
+{COMMENT_PAGE}
+"""
+
+
+class GraphQLError(Exception):
+    """
+    Raised when a GraphQL query fails (the errors of the response are in the message).
+    """
+
+
+def more_comments_query(n: int) -> str:
+    """
+    Build the query of the next comment page of n PRs (the variables are $id<i> and $after<i>; the results are under
+    the pr<i> aliases).
+    :param n: the number of PRs.
+    :return: the query.
+    """
+    variables = ", ".join(f"$id{i}: ID!, $after{i}: String" for i in range(n))
+    fields = "\n".join(f"  pr{i}: node(id: $id{i}) {{ ... on PullRequest {{ "
+                       f"comments(first: {COMMENTS_PER_PAGE}, after: $after{i}) {{ ...CommentPage }} }} }}"
+                       for i in range(n))
+    return f"query MoreComments({variables}) {{\n{fields}\n}}\n{COMMENT_PAGE}"
+
+
+def rest_pr(node: dict) -> dict:
+    """
+    Convert a PR of the GraphQL search to the fields of a REST search result used by the collector.
+    Note that the logins of bots do not have the "[bot]" suffix of the REST API (their type is Bot in both).
+    :param node: the PR (see SEARCH_QUERY).
+    :return: a dictionary with the title, html_url, user (login and type) and body keys.
+    """
+    # the author of a deleted account is null (the REST API returns the ghost user)
+    author = node["author"] or {"login": "ghost", "__typename": "User"}
+    return {
+        "title": node["title"],
+        "html_url": node["url"],
+        "user": {"login": author["login"], "type": author["__typename"]},
+        "body": node["body"] or None,  # empty bodies are null in the REST API
+    }
+
+
+class GraphQLClient:
+    """
+    Client of the GraphQL API, waiting for the rate limit to reset when it is exhausted.
+    """
+
+    def __init__(self, headers: dict = None, url: str = GRAPHQL_URL, session: requests.Session = None,
+                 max_retries: int = 5):
+        """
+        :param headers: the request headers (the Authorization token is required by the GraphQL API).
+        :param url: the URL of the API (or of a local stand-in).
+        :param session: the HTTP session (by default, the one of the response cache; see http_cache.py).
+        :param max_retries: how many times a rate-limited or failed query is retried.
+        """
+        self.url = url
+        self.headers = headers or {}
+        self.session = session or get_session()
+        self.max_retries = max_retries
+
+    @staticmethod
+    def _reset_delay(headers) -> float:
+        """
+        :param headers: the response headers.
+        :return: the number of seconds until the rate limit resets (at least one).
+        """
+        return max(float(headers.get("X-RateLimit-Reset", 0)) - time.time(), 1)
+
+    def execute(self, query: str, variables: dict) -> dict:
+        """
+        Run a query, retrying it when it is rate limited (or the API times out).
+        :param query: the GraphQL query.
+        :param variables: the variables of the query.
+        :return: the data of the response.
+        """
+        for attempt in range(self.max_retries + 1):
+            response = self.session.post(self.url, headers=self.headers,
+                                         json={"query": query, "variables": variables})
+            retry = attempt < self.max_retries
+            if response.status_code in (403, 429) and retry:
+                # secondary rate limits have a Retry-After header
+                delay = int(response.headers.get("Retry-After", 0)) or self._reset_delay(response.headers)
+                print(f"Rate limited. Sleeping for {delay:.0f} seconds.")
+                time.sleep(delay)
+                continue
+            if response.status_code in (502, 504) and retry:  # the query timed out
+                time.sleep(2 ** attempt)
+                continue
+            response.raise_for_status()
+            payload = response.json()
+            errors = payload.get("errors") or []
+            if any(error.get("type") == "RATE_LIMITED" for error in errors) and retry:
+                delay = self._reset_delay(response.headers)
+                print(f"Rate limit exhausted. Sleeping for {delay:.0f} seconds.")
+                time.sleep(delay)
+                continue
+            if payload.get("data") is None:
+                raise GraphQLError(json.dumps(errors))
+            if errors:  # partial results (e.g., a PR that was deleted in the meantime)
+                print(f"WARNING: {json.dumps(errors)}")
+            return payload["data"]
+
+    def count(self, query: str) -> int:
+        """
+        Probe the number of results of a search query (so windows can be planned with gh_search.plan_windows).
+        :param query: the search query.
+        :return: the total count.
+        """
+        return self.execute(COUNT_QUERY, {"q": query})["search"]["issueCount"]
+
+    def search_prs(self, query: str, after: str = None, first: int = PRS_PER_PAGE) -> tuple:
+        """
+        Fetch a page of PRs with the first page of their comments.
+        :param query: the search query.
+        :param after: the cursor of the page (None for the first page).
+        :param first: the number of PRs per page.
+        :return: a (PRs, pageInfo) tuple.
+        """
+        search = self.execute(SEARCH_QUERY, {"q": query, "first": first, "after": after})["search"]
+        # the search may also return issues, which have no PR fields
+        return [node for node in search["nodes"] if node], search["pageInfo"]
+
+    def fetch_remaining_comments(self, prs: list, batch_size: int = COMMENTS_BATCH) -> None:
+        """
+        Fetch the comments of PRs beyond their first page, batch_size PRs per query, appending them in place.
+        :param prs: the PRs (see search_prs).
+        :param batch_size: the number of PRs per query.
+        """
+        pending = [pr for pr in prs if pr["comments"]["pageInfo"]["hasNextPage"]]
+        while pending:
+            batch, pending = pending[:batch_size], pending[batch_size:]
+            variables = {}
+            for i, pr in enumerate(batch):
+                variables[f"id{i}"], variables[f"after{i}"] = pr["id"], pr["comments"]["pageInfo"]["endCursor"]
+            data = self.execute(more_comments_query(len(batch)), variables)
+            for i, pr in enumerate(batch):
+                if not data.get(f"pr{i}"):  # deleted in the meantime
+                    continue
+                page = data[f"pr{i}"]["comments"]
+                pr["comments"]["nodes"] += page["nodes"]
+                pr["comments"]["pageInfo"] = page["pageInfo"]
+                if page["pageInfo"]["hasNextPage"]:
+                    pending.append(pr)
+
+
+class SearchState:
+    """
+    Progress of a search over windows: the queries of the windows, the index of the current one and the cursor of its
+    next page. It is saved as JSON, so an interrupted search can resume.
+    """
+
+    def __init__(self, state_file: str, queries: list, index: int = 0, cursor: str = None):
+        """
+        :param state_file: the JSON file of the state.
+        :param queries: the search queries of the windows (see gh_search.window_query).
+        :param index: the index of the current window.
+        :param cursor: the cursor of the next page of the current window (None for its first page).
+        """
+        self.state_file = state_file
+        self.queries = queries
+        self.index = index
+        self.cursor = cursor
+
+    @classmethod
+    def load(cls, state_file: str):
+        """
+        Load the state of an interrupted search.
+        :param state_file: the JSON file of the state.
+        :return: the state, or None if there is no state file.
+        """
+        if not os.path.exists(state_file):
+            return None
+        with open(state_file) as f:
+            state = json.load(f)
+        return cls(state_file, state["queries"], state["index"], state["cursor"])
+
+    def save(self) -> None:
+        """
+        Save the state (atomically, so an interruption cannot leave a partial file).
+        """
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"queries": self.queries, "index": self.index, "cursor": self.cursor}, f)
+        os.replace(tmp_file, self.state_file)
+
+    def delete(self) -> None:
+        """
+        Delete the state file (once the search is complete).
+        """
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
+
+
+def iter_prs_with_comments(client: GraphQLClient, state: SearchState) -> Iterator[tuple]:
+    """
+    Fetch the PRs of the windows of a search with all their comments, resuming from a state. The state is saved once
+    all PRs of a page were consumed, so the PRs of a page may be yielded again after an interruption (but no page is
+    skipped). The state file is deleted when the search is complete.
+    :param client: the GraphQL client.
+    :param state: the state of the search (see SearchState).
+    :return: an iterator of (pr, comments) tuples, as returned by gh_comments.iter_with_comments (the PRs have the
+    fields of rest_pr and the comments have a body).
+    """
+    while state.index < len(state.queries):
+        prs, page_info = client.search_prs(state.queries[state.index], state.cursor)
+        client.fetch_remaining_comments(prs)
+        for pr in prs:
+            yield rest_pr(pr), pr["comments"]["nodes"]
+        if page_info["hasNextPage"]:
+            state.cursor = page_info["endCursor"]
+        else:
+            state.index, state.cursor = state.index + 1, None
+        state.save()
+    state.delete()
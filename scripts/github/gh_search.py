@@ -0,0 +1,236 @@
+"""
+Adaptive date windows for GitHub searches.
+The search API returns at most 1000 results per query, so a query is split into windows of creation dates that have
+at most 1000 results each. Instead of fixed windows, the planner probes the total_count of a window (a single request
+with one result per page), bisects the windows that are over the cap (down to one second, the resolution of the
+`created:` qualifier) and then merges adjacent sparse windows, so the windows cover the whole period without gaps or
+overlaps and no more queries than needed are made. Windows are probed and fetched concurrently, under a limit on the
+number of search requests per minute.
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, NamedTuple
+
+import requests
+
+from http_cache import get_session
+
+GITHUB_API_URL = "https://api.github.com"
+# the maximum number of results of a search, and of results per page
+RESULTS_CAP, PER_PAGE = 1000, 100
+# GitHub was launched in 2008, so no issue or PR was created before
+FIRST_DATE = datetime(2008, 1, 1, tzinfo=timezone.utc)
+ONE_SECOND = timedelta(seconds=1)
+# merged windows are filled up to this fraction of the cap (results created while crawling must still fit)
+FILL_RATIO = 0.9
+
+
+class Window(NamedTuple):
+    """
+    A window of creation dates [start, end] (both inclusive, with a resolution of one second) and its number of
+    results.
+    """
+    start: datetime
+    end: datetime
+    count: int
+
+
+def format_date(date: datetime) -> str:
+    """
+    Format a date as in the `created:` qualifier (e.g., "2024-05-01T12:00:00Z").
+    :param date: the date (in UTC).
+    :return: the formatted date.
+    """
+    return date.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def window_query(query: str, start: datetime, end: datetime) -> str:
+    """
+    Restrict a search query to a window of creation dates.
+    :param query: the search query (without a `created:` qualifier).
+    :param start: the start of the window (inclusive).
+    :param end: the end of the window (inclusive).
+    :return: the query of the window.
+    """
+    return f"{query} created:{format_date(start)}..{format_date(end)}"
+
+
+class RateLimiter:
+    """
+    Spaces out requests (from any thread), so that at most `per_minute` requests start per minute.
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        :param per_minute: the maximum number of requests per minute (None for no limit).
+        """
+        self.interval = 60 / per_minute if per_minute else 0
+        self.next_start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """
+        Wait until a request may start (and book that slot).
+        """
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class SearchClient:
+    """
+    Client of the issue search endpoint (`/search/issues`).
+    """
+
+    def __init__(self, headers: dict = None, base_url: str = GITHUB_API_URL, per_minute: float = 30,
+                 session: requests.Session = None, max_retries: int = 5):
+        """
+        :param headers: the request headers (e.g., the Authorization token).
+        :param base_url: the URL of the API (or of a local stand-in).
+        :param per_minute: the maximum number of search requests per minute (30 with a token, 10 without one).
+        :param session: the HTTP session (by default, the one of the response cache; see http_cache.py).
+        :param max_retries: how many times a rate-limited request is retried.
+        """
+        self.url = f"{base_url}/search/issues"
+        self.headers = headers or {}
+        self.rate_limiter = RateLimiter(per_minute)
+        self.session = session or get_session()
+        self.max_retries = max_retries
+
+    def search(self, query: str, page: int = 1, per_page: int = PER_PAGE) -> dict:
+        """
+        Fetch a page of results, waiting for the rate limit to reset if it is exceeded.
+        :param query: the search query.
+        :param page: the page number (starting at 1).
+        :param per_page: the number of results per page.
+        :return: the response (with the total_count and items keys).
+        """
+        params = {"q": query, "per_page": per_page, "page": page}
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            response = self.session.get(self.url, headers=self.headers, params=params)
+            if response.status_code in (403, 429) and attempt < self.max_retries:
+                if "Retry-After" in response.headers:  # secondary rate limit
+                    delay = int(response.headers["Retry-After"])
+                elif response.headers.get("X-RateLimit-Remaining") == "0":
+                    delay = int(response.headers["X-RateLimit-Reset"]) - int(time.time())
+                else:
+                    response.raise_for_status()
+                print(f"Rate limited. Sleeping for {max(delay, 1)} seconds.")
+                time.sleep(max(delay, 1))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def count(self, query: str) -> int:
+        """
+        Probe the number of results of a query.
+        :param query: the search query.
+        :return: the total count.
+        """
+        return self.search(query, per_page=1)["total_count"]
+
+
+def split_windows(client: SearchClient, query: str, start: datetime, end: datetime, cap: int = RESULTS_CAP,
+                  concurrency: int = 4) -> list:
+    """
+    Split a period into windows with at most `cap` results each, bisecting the windows over the cap. All windows of
+    the same level of the bisection are probed concurrently.
+    :param client: the search client.
+    :param query: the search query (without a `created:` qualifier).
+    :param start: the start of the period (inclusive).
+    :param end: the end of the period (inclusive).
+    :param cap: the maximum number of results of a window.
+    :param concurrency: how many windows are probed at the same time.
+    :return: the windows, sorted by date (one-second windows may still be over the cap).
+    """
+    windows, pending = [], [(start, end)]
+    with ThreadPoolExecutor(concurrency) as executor:
+        while pending:
+            counts = executor.map(lambda w: client.count(window_query(query, *w)), pending)
+            next_pending = []
+            for (w_start, w_end), count in zip(pending, counts):
+                if count <= cap or w_start == w_end:
+                    if count > cap:
+                        print(f"WARNING: {count} results created at {format_date(w_start)} (only {cap} are returned)")
+                    windows.append(Window(w_start, w_end, count))
+                else:
+                    middle = w_start + ONE_SECOND * ((w_end - w_start) // ONE_SECOND // 2)
+                    next_pending += [(w_start, middle), (middle + ONE_SECOND, w_end)]
+            pending = next_pending
+    return sorted(windows)
+
+
+def merge_windows(windows: list, cap: int = RESULTS_CAP, fill_ratio: float = FILL_RATIO) -> list:
+    """
+    Merge adjacent windows as long as their total number of results stays under a fraction of the cap.
+    :param windows: the windows, sorted by date and contiguous.
+    :param cap: the maximum number of results of a window.
+    :param fill_ratio: the fraction of the cap up to which windows are merged.
+    :return: the merged windows (which cover the same period).
+    """
+    merged = []
+    for window in windows:
+        if merged and merged[-1].count + window.count <= fill_ratio * cap:
+            merged[-1] = Window(merged[-1].start, window.end, merged[-1].count + window.count)
+        else:
+            merged.append(window)
+    return merged
+
+
+def check_coverage(windows: list, start: datetime, end: datetime) -> None:
+    """
+    Check that windows cover a period without gaps or overlaps.
+    :param windows: the windows, sorted by date.
+    :param start: the start of the period (inclusive).
+    :param end: the end of the period (inclusive).
+    """
+    bounds = [start] + [w.end + ONE_SECOND for w in windows]
+    if [w.start for w in windows] != bounds[:-1] or bounds[-1] != end + ONE_SECOND:
+        raise ValueError(f"The windows do not cover {format_date(start)}..{format_date(end)}")
+
+
+def plan_windows(client: SearchClient, query: str, start: datetime = FIRST_DATE, end: datetime = None,
+                 cap: int = RESULTS_CAP, concurrency: int = 4) -> list:
+    """
+    Plan the windows of a search query.
+    :param client: the search client.
+    :param query: the search query (without a `created:` qualifier).
+    :param start: the start of the period (by default, the launch of GitHub).
+    :param end: the end of the period (by default, now).
+    :param cap: the maximum number of results of a window.
+    :param concurrency: how many windows are probed at the same time.
+    :return: the windows, sorted by date, which cover the whole period.
+    """
+    end = end or datetime.now(timezone.utc).replace(microsecond=0)
+    windows = merge_windows(split_windows(client, query, start, end, cap, concurrency), cap)
+    check_coverage(windows, start, end)
+    return windows
+
+
+def search_windows(client: SearchClient, query: str, windows: list, concurrency: int = 4) -> Iterator[dict]:
+    """
+    Fetch all results of the windows of a query (their pages are fetched concurrently). If a window got new results
+    since it was planned, its extra pages are fetched as well (up to the cap).
+    :param client: the search client.
+    :param query: the search query (without a `created:` qualifier).
+    :param windows: the windows (see plan_windows).
+    :param concurrency: how many pages are fetched at the same time.
+    :return: an iterator over the results (issues or PRs), window by window.
+    """
+    max_pages = RESULTS_CAP // PER_PAGE
+    pages = [(window_query(query, w.start, w.end), page, num_pages) for w in windows if w.count > 0
+             for num_pages in [min(math.ceil(w.count / PER_PAGE), max_pages)] for page in range(1, num_pages + 1)]
+    with ThreadPoolExecutor(concurrency) as executor:
+        for (w_query, page, num_pages), response in zip(pages, executor.map(lambda p: client.search(*p[:2]), pages)):
+            yield from response["items"]
+            if page == num_pages:
+                for extra_page in range(num_pages + 1, min(math.ceil(response["total_count"] / PER_PAGE),
+                                                           max_pages) + 1):
+                    yield from client.search(w_query, extra_page)["items"]
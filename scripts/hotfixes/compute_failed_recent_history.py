@@ -1,5 +1,6 @@
 import pandas as pd
 
+from key_ids import anti_join, encode, is_member
 from utils import DATA_DIR
 import random
 
@@ -24,8 +25,10 @@ def exclude_failed_repos(df_evolution_commits: pd.DataFrame, df_evolution_errors
     :param df_evolution_errors: DataFrame containing errors for repositories.
     :return: Filtered DataFrame excluding failed repositories.
     """
-    failed_repos = set(df_evolution_errors["repo_url"].unique())
-    return df_evolution_commits[~df_evolution_commits["repo_url"].isin(failed_repos)]
+    repo_ids = encode(df_evolution_commits["repo_url"], "repo_url")
+    # the failed repos are only looked up (the ones without commits are unknown, i.e., -1, and never members)
+    failed_repo_ids = encode(df_evolution_errors["repo_url"], "repo_url", add=False)
+    return df_evolution_commits[~is_member(repo_ids, failed_repo_ids)]
 
 
 
@@ -34,10 +37,12 @@ if __name__ == "__main__":
     group = "recent"
     df_recent_commits, df_recent_evolution_commits, df_recent_evolution_errors = load(group)
     # find repos in df_recent_commits that are missing in df_recent_evolution_commits
-    missing_repos = set(df_recent_commits["repo_url"]) - set(df_recent_evolution_commits["repo_url"])
-    print(f"Number of missing repos in evolution commits: {len(missing_repos)}")
+    commit_repo_ids = encode(df_recent_commits["repo_url"], "repo_url")
+    evolution_repo_ids = encode(df_recent_evolution_commits["repo_url"], "repo_url", add=False)
+    missing_repo_ids = anti_join(commit_repo_ids, evolution_repo_ids)
+    print(f"Number of missing repos in evolution commits: {len(missing_repo_ids)}")
     # filter df_recent_commits to only include missing repos
-    df_recent_missing_commits = df_recent_commits[df_recent_commits["repo_url"].isin(missing_repos)]
+    df_recent_missing_commits = df_recent_commits[is_member(commit_repo_ids, missing_repo_ids)]
     print(f"Number of missing commits: {len(df_recent_missing_commits)}")
     # save the missing commits to a CSV file
     output_file = DATA_DIR / f"selected_{group}_commits_retry.csv"
@@ -1,34 +1,164 @@
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 import glob
 import argparse
+import tempfile
 
-def merge_csv_files(input_dir, output_file, pattern="*.csv"):
-    """Merge all CSV files in the input_dir matching pattern into one output_file."""
-    csv_files = glob.glob(os.path.join(input_dir, pattern))
+# how many rows are copied at a time
+CHUNK_SIZE = 100_000
+# the number of spill files of the dedupe (see mark_first_rows)
+PARTITIONS = 64
+
+
+def check_headers(csv_files: list) -> list:
+    """
+    Check that all CSV files have the same columns (in any order).
+    :param csv_files: the CSV files.
+    :return: the columns of the first file (the order used in the output).
+    """
+    columns = pd.read_csv(csv_files[0], nrows=0).columns.tolist()
+    for file in csv_files[1:]:
+        other_columns = pd.read_csv(file, nrows=0).columns.tolist()
+        if set(other_columns) != set(columns) or len(other_columns) != len(columns):
+            missing = [c for c in columns if c not in other_columns]
+            extra = [c for c in other_columns if c not in columns]
+            raise ValueError(f"Incompatible header in {file} (missing columns: {missing}, extra columns: {extra})")
+    return columns
+
+
+def mark_first_rows(csv_files: list, key: list, tmp_dir: str, chunk_size: int = CHUNK_SIZE,
+                    partitions: int = PARTITIONS) -> np.ndarray:
+    """
+    Find the first row of each key over the rows of several CSV files, with bounded memory.
+    The keys are hashed (64 bits, with a negligible probability of collisions) and the (hash, row number) pairs are
+    spilled to partition files by hash, chunk by chunk; each partition is then deduplicated on its own, so only one
+    chunk or one partition (16 bytes per row of a partition) is in memory at a time. The result is a memory-mapped
+    file of flags (one byte per row), so the rows can be filtered as they are copied.
+    :param csv_files: the CSV files.
+    :param key: the columns of the key.
+    :param tmp_dir: the directory of the spill files.
+    :param chunk_size: how many rows are read at a time.
+    :param partitions: the number of partitions.
+    :return: a boolean array (memory-mapped) that tells, for each row of the files (in order), whether it is the first
+    row of its key.
+    """
+    pair_dtype = np.dtype([("hash", "<u8"), ("row", "<i8")])
+    part_files = [os.path.join(tmp_dir, f"part_{p}.bin") for p in range(partitions)]
+    num_rows = 0
+    outputs = [open(f, "wb") for f in part_files]
+    try:
+        for file in csv_files:
+            for chunk in pd.read_csv(file, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=[""],
+                                     usecols=key):
+                pairs = np.empty(len(chunk), dtype=pair_dtype)
+                pairs["hash"] = pd.util.hash_pandas_object(chunk[key], index=False).to_numpy()
+                pairs["row"] = np.arange(num_rows, num_rows + len(chunk))
+                num_rows += len(chunk)
+                # the rows of each partition stay in order
+                part = pairs["hash"] % np.uint64(partitions)
+                order = np.argsort(part, kind="stable")
+                bounds = np.searchsorted(part[order], np.arange(partitions + 1))
+                pairs = pairs[order]
+                for p in range(partitions):
+                    pairs[bounds[p]:bounds[p + 1]].tofile(outputs[p])
+    finally:
+        for output in outputs:
+            output.close()
+
+    is_first = np.memmap(os.path.join(tmp_dir, "is_first.bin"), dtype=bool, mode="w+", shape=(max(num_rows, 1),))
+    is_first[:] = True
+    for part_file in part_files:
+        pairs = np.fromfile(part_file, dtype=pair_dtype)
+        os.remove(part_file)
+        # a stable sort keeps the rows of each hash in order, so the first one of each group is the first row
+        pairs = pairs[np.argsort(pairs["hash"], kind="stable")]
+        is_duplicate = np.zeros(len(pairs), dtype=bool)
+        is_duplicate[1:] = pairs["hash"][1:] == pairs["hash"][:-1]
+        is_first[pairs["row"][is_duplicate]] = False
+    return is_first
+
+
+def merge_csv_files(input_dir, output_file, pattern="*.csv", dedupe_on: list = None, output_format: str = "csv",
+                    chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Merge all CSV files in the input_dir matching pattern into one output_file.
+    Files are copied chunk by chunk (so only one chunk is in memory at a time) after checking that their headers
+    are compatible; columns are written in the order of the first file. Values are copied as they are (as strings).
+    :param input_dir: the directory with the CSV files.
+    :param output_file: the merged file.
+    :param pattern: the filename pattern of the CSV files.
+    :param dedupe_on: (optional) the columns of a key (e.g., repo_url, commit_hash, model_file_path); only the first
+    row of each key is kept (the keys are found in a first pass over the files, see mark_first_rows).
+    :param output_format: 'csv' or 'parquet' (zstd-compressed, with all columns stored as strings).
+    :param chunk_size: how many rows are copied at a time.
+    :return: the number of rows written.
+    """
+    if output_format not in ("csv", "parquet"):
+        raise ValueError(f"Invalid output format: {output_format}")
+    csv_files = sorted(f for f in glob.glob(os.path.join(input_dir, pattern))
+                       if os.path.abspath(f) != os.path.abspath(output_file))
 
     if not csv_files:
         print(f"No CSV files found in directory: {input_dir}")
-        return
+        return 0
 
     print(f"Found {len(csv_files)} CSV files. Merging...")
+    columns = check_headers(csv_files)
+    if dedupe_on is not None and not set(dedupe_on) <= set(columns):
+        raise ValueError(f"Invalid key: {dedupe_on} (columns: {columns})")
+
+    num_rows, num_duplicates, row = 0, 0, 0
+    # the CSV output is (re)created with the header, and the Parquet output has all columns stored as strings
+    writer = None
+    if output_format == "csv":
+        pd.DataFrame(columns=columns).to_csv(output_file, index=False)
+    else:
+        writer = pq.ParquetWriter(output_file, pa.schema([(c, pa.string()) for c in columns]), compression="zstd")
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_file))) as tmp_dir:
+        is_first = mark_first_rows(csv_files, dedupe_on, tmp_dir, chunk_size) if dedupe_on is not None else None
+        try:
+            for file in csv_files:
+                print(f"Reading {file}")
+                # only empty cells are missing values (e.g., a "None" message is kept as it is)
+                for chunk in pd.read_csv(file, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                                         na_values=[""]):
+                    chunk = chunk[columns]
+                    if is_first is not None:
+                        num_rows_before, row = len(chunk), row + len(chunk)
+                        chunk = chunk[is_first[row - len(chunk):row]]
+                        num_duplicates += num_rows_before - len(chunk)
+                    if writer is None:
+                        chunk.to_csv(output_file, mode="a", header=False, index=False)
+                    else:
+                        writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))
+                    num_rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+            del is_first  # unmapped before the spill directory is removed
 
-    # Read and concatenate all CSVs
-    dataframes = []
-    for file in csv_files:
-        print(f"Reading {file}")
-        df = pd.read_csv(file)
-        dataframes.append(df)
+    if dedupe_on is not None:
+        print(f"Dropped {num_duplicates} duplicated rows (key: {', '.join(dedupe_on)})")
+    print(f"Merge complete. {num_rows} rows written to: {output_file}")
+    return num_rows
 
-    merged_df = pd.concat(dataframes, ignore_index=True)
-    merged_df.to_csv(output_file, index=False)
-    print(f"Merge complete. Output written to: {output_file}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Merge multiple CSV files with headers.")
     parser.add_argument("input_dir", help="Directory containing CSV files to merge")
     parser.add_argument("output_file", help="Path to the merged output CSV file")
     parser.add_argument("--pattern", default="*.csv", help="Filename pattern to match CSV files (default: *.csv)")
+    parser.add_argument("--dedupe-on", default=None,
+                        help="Comma-separated key columns; only the first row of each key is kept "
+                             "(e.g., repo_url,commit_hash,model_file_path)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="Output format (default: csv)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help=f"Number of rows copied at a time (default: {CHUNK_SIZE})")
 
     args = parser.parse_args()
-    merge_csv_files(args.input_dir, args.output_file, args.pattern)
+    merge_csv_files(args.input_dir, args.output_file, args.pattern,
+                    args.dedupe_on.split(",") if args.dedupe_on else None, args.format, args.chunk_size)
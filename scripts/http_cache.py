@@ -0,0 +1,304 @@
+"""
+Persistent cache of the HTTP responses of the crawlers (Hugging Face API and discussion pages, GitHub and Stack
+Exchange APIs), shared by all scripts and stored in a SQLite file in the data directory.
+Responses are keyed by the request URL (with its query parameters in a canonical order). Each endpoint has a TTL
+policy (TTL_POLICIES): a response younger than its TTL is served locally; an older one is revalidated with a
+conditional request (If-None-Match / If-Modified-Since, from its ETag / Last-Modified headers), so unchanged resources
+are answered with an empty 304 response (which, e.g., the GitHub API does not count against the rate limit) and the
+stored body is reused. The cache is bounded in size: the least recently used responses are evicted first.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+CACHE_FILE = Path(__file__).parent / "../data/http_cache.sqlite3"
+HOUR, DAY = 60 * 60, 24 * 60 * 60
+# how long (in seconds) the responses of each endpoint (URL regex) are served without contacting the server; URLs
+# that match none of them are not cached
+TTL_POLICIES = {
+    r"^https://huggingface\.co/api/models/": 7 * DAY,
+    r"^https://huggingface\.co/[^?#]+/discussions/\d+": 7 * DAY,
+    r"^https://api\.github\.com/search/": DAY,
+    r"^https://api\.github\.com/repos/[^/]+/[^/]+/issues/\d+/comments": 7 * DAY,
+    r"^https://api\.stackexchange\.com/": DAY,
+}
+# the maximum total size of the stored bodies (in bytes)
+MAX_SIZE = 2 * 1024 ** 3
+# headers that describe the transfer of the body rather than the body itself (bodies are stored decoded)
+_TRANSFER_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+
+class CachedResponse(NamedTuple):
+    """
+    A stored response: the URL it was fetched from (after redirects), its status, headers and body, and when it was
+    last fetched or revalidated (in seconds since the epoch).
+    """
+    url: str
+    status: int
+    headers: dict
+    body: bytes
+    stored_at: float
+
+    def text(self) -> str:
+        """
+        :return: the body decoded with the charset of the Content-Type header (UTF-8 by default).
+        """
+        return self.body.decode(get_encoding_from_headers(CaseInsensitiveDict(self.headers)) or "utf-8", "replace")
+
+
+def cache_key(url: str, method: str = "GET") -> str:
+    """
+    Compute the key of a request, i.e., a hash of its method and URL with the query parameters sorted (so the same
+    parameters given in a different order map to the same response).
+    :param url: the request URL (with its query parameters).
+    :param method: the HTTP method.
+    :return: the key.
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    url = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ""))
+    return hashlib.sha256(f"{method.upper()} {url}".encode()).hexdigest()
+
+
+def conditional_headers(cached: CachedResponse) -> dict:
+    """
+    Build the headers of a conditional request that revalidates a stored response.
+    :param cached: the stored response.
+    :return: the If-None-Match and/or If-Modified-Since headers (empty if the response has no validators).
+    """
+    headers = CaseInsensitiveDict(cached.headers)
+    conditions = {}
+    if headers.get("ETag"):
+        conditions["If-None-Match"] = headers["ETag"]
+    if headers.get("Last-Modified"):
+        conditions["If-Modified-Since"] = headers["Last-Modified"]
+    return conditions
+
+
+class ResponseCache:
+    """
+    SQLite store of the responses (safe to use from several threads; several processes may share the same file).
+    The file is only opened when a cacheable URL is first looked up.
+    """
+
+    def __init__(self, cache_file: str | Path = CACHE_FILE, ttl_policies: dict = None, max_size: int = MAX_SIZE):
+        """
+        :param cache_file: the SQLite file.
+        :param ttl_policies: the TTL (in seconds) of each endpoint (URL regex), as in TTL_POLICIES (the default).
+        :param max_size: the maximum total size of the stored bodies (in bytes).
+        """
+        self.cache_file = Path(cache_file)
+        self.ttl_policies = [(re.compile(pattern), ttl)
+                             for pattern, ttl in (TTL_POLICIES if ttl_policies is None else ttl_policies).items()]
+        self.max_size = max_size
+        self.size = None  # total size of the bodies (approximate when other processes also write to the file)
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open the SQLite file (creating the table if needed).
+        :return: the connection.
+        """
+        if self._connection is None:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.cache_file, timeout=60, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, url TEXT, status INTEGER, "
+                               "headers TEXT, body BLOB, size INTEGER, stored_at REAL, accessed_at REAL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+            self.size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    def ttl(self, url: str) -> float | None:
+        """
+        Find the TTL policy of a URL.
+        :param url: the URL.
+        :return: the TTL (in seconds) of the first matching endpoint, or None if the URL is not cached.
+        """
+        for pattern, ttl in self.ttl_policies:
+            if pattern.search(url):
+                return ttl
+        return None
+
+    def get(self, key: str) -> CachedResponse | None:
+        """
+        Look up a response (and mark it as recently used).
+        :param key: the key of the request (see cache_key).
+        :return: the stored response, or None if there is none.
+        """
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT url, status, headers, body, stored_at FROM responses WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        url, status, headers, body, stored_at = row
+        return CachedResponse(url, status, json.loads(headers), body, stored_at)
+
+    def put(self, key: str, url: str, status: int, headers: dict, body: bytes) -> CachedResponse:
+        """
+        Store a response (replacing the previous one with the same key), evicting the least recently used responses
+        if the cache grows over its maximum size.
+        :param key: the key of the request (see cache_key).
+        :param url: the URL the response was fetched from.
+        :param status: the status code.
+        :param headers: the response headers.
+        :param body: the (decoded) body.
+        :return: the stored response.
+        """
+        headers = {name: value for name, value in headers.items() if name.lower() not in _TRANSFER_HEADERS}
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            previous = connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               (key, url, status, json.dumps(headers), body, len(body), now, now))
+            self.size += len(body) - (previous[0] if previous else 0)
+            if self.size > self.max_size:
+                self._evict()
+        return CachedResponse(url, status, headers, body, now)
+
+    def refresh(self, key: str, cached: CachedResponse, headers: dict) -> CachedResponse:
+        """
+        Mark a stored response as revalidated (i.e., after a 304 response), updating its headers with the new ones
+        (e.g., the current rate limit or a new ETag).
+        :param key: the key of the request (see cache_key).
+        :param cached: the stored response.
+        :param headers: the headers of the 304 response.
+        :return: the refreshed response.
+        """
+        merged = CaseInsensitiveDict(cached.headers)
+        merged.update({name: value for name, value in headers.items() if name.lower() not in _TRANSFER_HEADERS})
+        merged = dict(merged)
+        now = time.time()
+        with self._lock:
+            self._connect().execute("UPDATE responses SET headers = ?, stored_at = ?, accessed_at = ? WHERE key = ?",
+                                    (json.dumps(merged), now, now, key))
+        return cached._replace(headers=merged, stored_at=now)
+
+    def _evict(self) -> None:
+        """
+        Delete the least recently used responses until the cache is below 90% of its maximum size (the caller holds
+        the lock).
+        """
+        connection = self._connection
+        self.size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = 0.9 * self.max_size
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if self.size <= target:
+                break
+            evicted.append((key,))
+            self.size -= size
+        connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def close(self) -> None:
+        """
+        Close the SQLite file.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def _to_response(request: requests.PreparedRequest, cached: CachedResponse) -> requests.Response:
+    """
+    Build a response object out of a stored response.
+    :param request: the request being answered.
+    :param cached: the stored response.
+    :return: the response (with `from_cache` set to True).
+    """
+    response = requests.Response()
+    response.status_code = cached.status
+    response.reason = "OK" if cached.status == 200 else ""
+    response.headers = CaseInsensitiveDict(cached.headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = cached.url
+    response.request = request
+    response._content = cached.body
+    response.from_cache = True
+    return response
+
+
+class CachedSession(requests.Session):
+    """
+    requests session that answers the GET requests of cacheable URLs (see ResponseCache.ttl) from the cache,
+    revalidating stale responses conditionally. Streamed requests (e.g., file downloads) are never cached.
+    Responses have a `from_cache` attribute (True for responses served locally, including revalidated ones).
+    """
+
+    def __init__(self, cache: ResponseCache = None):
+        """
+        :param cache: the response cache (by default, the shared one; see default_cache).
+        """
+        super().__init__()
+        self.cache = cache or default_cache()
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        ttl = self.cache.ttl(request.url) if request.method == "GET" and not kwargs.get("stream") else None
+        if ttl is None:
+            response = super().send(request, **kwargs)
+            response.from_cache = False
+            return response
+
+        key = cache_key(request.url)
+        cached = self.cache.get(key)
+        if cached is not None and time.time() - cached.stored_at < ttl:
+            return _to_response(request, cached)
+        if cached is not None:
+            request.headers.update(conditional_headers(cached))
+        response = super().send(request, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            return _to_response(request, self.cache.refresh(key, cached, response.headers))
+        if response.status_code == 200:
+            self.cache.put(key, response.url, response.status_code, response.headers, response.content)
+        response.from_cache = False
+        return response
+
+
+_DEFAULT_CACHE = None
+_DEFAULT_SESSION = None
+
+
+def default_cache() -> ResponseCache:
+    """
+    :return: the cache shared by all crawlers (stored in CACHE_FILE, with the TTL_POLICIES).
+    """
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = ResponseCache()
+    return _DEFAULT_CACHE
+
+
+def get_session() -> CachedSession:
+    """
+    :return: a session (with keep-alive connections) over the shared cache.
+    """
+    global _DEFAULT_SESSION
+    if _DEFAULT_SESSION is None:
+        _DEFAULT_SESSION = CachedSession()
+    return _DEFAULT_SESSION
+
+
+def configure_hf_cache(cache: ResponseCache = None) -> None:
+    """
+    Make the huggingface_hub calls (e.g., HfApi.model_info) go through the response cache.
+    :param cache: the response cache (by default, the shared one).
+    """
+    from huggingface_hub import configure_http_backend
+
+    configure_http_backend(backend_factory=lambda: CachedSession(cache))
@@ -0,0 +1,159 @@
+"""
+Persistent dictionaries that map the keys shared by the datasets (repo_url and commit_hash) to dense integer ids.
+Each dictionary is stored in the data directory (i.e., `keys_<name>.parquet`) and is append-only, so the id of a key
+never changes and ids computed for different files (commit logs, evolution data, errors, ...) can be compared directly.
+Membership tests, anti-joins and distinct counts over those ids are then integer-array operations (a boolean lookup
+table indexed by id) instead of hashing millions of strings with `isin`, sets or `drop_duplicates`.
+Read-only filters should encode the keys they exclude with `add=False` (unknown keys are mapped to -1, which are never
+members), so that only the datasets being processed add keys to the dictionaries.
+"""
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows (the dictionaries are then not locked)
+    fcntl = None
+
+KEY_NAMES = ["repo_url", "commit_hash"]
+# dictionaries loaded so far (key = file path), with the modification time of the file when it was read
+_DICTIONARIES = {}
+
+
+def dictionary_file(name: str, data_dir: str | Path = DATA_DIR) -> Path:
+    """
+    Where a key dictionary is stored.
+    :param name: one of KEY_NAMES.
+    :param data_dir: the data directory.
+    :return: the Parquet file path.
+    """
+    if name not in KEY_NAMES:
+        raise ValueError(f"Invalid key: {name}")
+    return Path(data_dir) / f"keys_{name}.parquet"
+
+
+@contextmanager
+def _locked(file: Path):
+    """
+    Hold an exclusive lock on a dictionary (a lock file next to it), so that processes adding keys at the same time
+    do not give the same id to different keys.
+    :param file: the dictionary file.
+    """
+    with open(file.with_name(file.name + ".lock"), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_dictionary(name: str, data_dir: str | Path = DATA_DIR) -> pd.Index:
+    """
+    Load a key dictionary (cached until the file changes).
+    :param name: one of KEY_NAMES.
+    :param data_dir: the data directory.
+    :return: an index with the keys, where the id of a key is its position.
+    """
+    file = dictionary_file(name, data_dir)
+    mtime = file.stat().st_mtime if file.exists() else None
+    if file not in _DICTIONARIES or _DICTIONARIES[file][0] != mtime:
+        keys = pd.read_parquet(file)[name] if mtime is not None else pd.Series([], dtype=object)
+        _DICTIONARIES[file] = (mtime, pd.Index(keys.to_numpy(dtype=object), name=name))
+    return _DICTIONARIES[file][1]
+
+
+def encode(keys: pd.Series | np.ndarray | list, name: str, data_dir: str | Path = DATA_DIR,
+           add: bool = True) -> np.ndarray:
+    """
+    Map keys to their ids.
+    :param keys: the keys (e.g., the repo_url column of a data frame).
+    :param name: one of KEY_NAMES.
+    :param data_dir: the data directory.
+    :param add: whether keys that are not in the dictionary are added to it (and the dictionary saved); otherwise,
+    they are mapped to -1.
+    :return: an int64 array with the ids of the keys.
+    """
+    if isinstance(keys, pd.Series) and isinstance(keys.dtype, pd.CategoricalDtype):
+        # only the categories are looked up
+        ids = encode(keys.cat.categories, name, data_dir, add)
+        codes = keys.cat.codes.to_numpy()
+        return np.where(codes >= 0, ids[codes], -1).astype(np.int64)
+    codes, uniques = pd.factorize(np.asarray(keys, dtype=object))
+    dictionary = load_dictionary(name, data_dir)
+    ids = dictionary.get_indexer(uniques)
+    if add and (ids < 0).any():
+        file = dictionary_file(name, data_dir)
+        with _locked(file):
+            # another process may have added keys in the meantime
+            dictionary = load_dictionary(name, data_dir)
+            ids = dictionary.get_indexer(uniques)
+            new_keys = uniques[ids < 0]
+            if len(new_keys):
+                ids[ids < 0] = np.arange(len(dictionary), len(dictionary) + len(new_keys))
+                dictionary = dictionary.append(pd.Index(new_keys, name=name))
+                # written to a temporary file first, so readers never see a partial dictionary
+                tmp_file = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+                pd.DataFrame({name: dictionary.to_numpy()}).to_parquet(tmp_file, index=False)
+                os.replace(tmp_file, file)
+                _DICTIONARIES[file] = (file.stat().st_mtime, dictionary)
+    return np.where(codes >= 0, ids[codes], -1).astype(np.int64)
+
+
+def decode(ids: np.ndarray, name: str, data_dir: str | Path = DATA_DIR) -> np.ndarray:
+    """
+    Map ids back to their keys.
+    :param ids: the ids.
+    :param name: one of KEY_NAMES.
+    :param data_dir: the data directory.
+    :return: an array with the keys.
+    """
+    return load_dictionary(name, data_dir).to_numpy()[ids]
+
+
+def is_member(ids: np.ndarray, other_ids: np.ndarray) -> np.ndarray:
+    """
+    Integer version of `isin`: find which ids are in another set of ids.
+    :param ids: the ids to be tested (negative ids, i.e., unknown keys, are never members).
+    :param other_ids: the ids of the set.
+    :return: a boolean mask over ids.
+    """
+    ids, other_ids = np.asarray(ids), np.asarray(other_ids)
+    other_ids = other_ids[other_ids >= 0]
+    size = max(ids.max(initial=0), other_ids.max(initial=0)) + 1
+    lookup = np.zeros(size, dtype=bool)
+    lookup[other_ids] = True
+    return (ids >= 0) & lookup[np.maximum(ids, 0)]
+
+
+def anti_join(ids: np.ndarray, other_ids: np.ndarray) -> np.ndarray:
+    """
+    Find the distinct ids that are not in another set of ids (i.e., a set difference).
+    :param ids: the ids.
+    :param other_ids: the ids to be excluded.
+    :return: the sorted ids that are in ids but not in other_ids.
+    """
+    ids = np.unique(ids)
+    return ids[~is_member(ids, other_ids)]
+
+
+def count_unique(*ids: np.ndarray) -> int:
+    """
+    Count the distinct ids (or tuples of ids, e.g., (repo_url, commit_hash) pairs).
+    :param ids: one or more arrays of ids of the same length.
+    :return: the number of distinct values (or tuples).
+    """
+    # tuples are combined into a single integer (ids are dense, so the product of the ranges is small); ids are offset
+    # by one, so that the -1 ids of unknown keys are digits of their own
+    values = np.asarray(ids[0], dtype=np.int64) + 1
+    for other in ids[1:]:
+        other = np.asarray(other, dtype=np.int64) + 1
+        values = values * (other.max(initial=0) + 1) + other
+    return len(np.unique(values))
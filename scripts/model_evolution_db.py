@@ -0,0 +1,305 @@
+"""
+Embedded SQL database with the outputs of the data collection pipeline (results/db_model_evolution.sqlite3).
+The CSV files are ingested into indexed tables (next to the tables of the manual analysis of the posts), so analyses
+can filter and aggregate them in the database instead of loading whole CSV files with pandas:
+- commits: the commit logs (selected_<group>_commits*.csv), without the `all_files_in_tree` column.
+- evolution: the post-processed evolution data (repositories_evolution_<group>_commits_processed.csv).
+- errors: the repositories that could not be processed (selected_<group>_errors.csv and
+  repositories_evolution_<group>_errors.csv).
+- pr_metadata: the metadata of the PRs created by the SFConvertBot (sfconvertbot_pr_metadata.csv.zip).
+- discussions: the discussions of the safetensors converter (converter_discussions.csv).
+Every row records the file it came from (`source_file`) and its group (`group_type`, if any). The ingestion is
+incremental: a file is only (re)loaded if its SHA-256 hash differs from the one recorded when it was last ingested.
+
+Run this module to ingest the files:
+    python model_evolution_db.py [--tables TABLE ...]
+"""
+import argparse
+import datetime
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+
+from utils import DATA_DIR, RESULTS_DIR
+
+DB_FILE = RESULTS_DIR / "db_model_evolution.sqlite3"
+# columns indexed in every table that has them
+INDEXED_COLUMNS = ["repo_url", "commit_hash", "date", "serialization_format"]
+# columns added to every row (where the row came from)
+SOURCE_COLUMNS = ["source_file", "group_type"]
+# how many rows are parsed (and inserted) at a time
+CHUNK_SIZE = 50_000
+# dates are stored as UTC strings, which sort chronologically and work with SQLite's date functions
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# formats used to truncate the dates when counting rows per period
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+
+
+class Source(NamedTuple):
+    """
+    A CSV file (in the data folder) that is ingested into a table.
+    """
+    table: str
+    file_name: str
+    group_type: str | None = None
+
+
+SOURCES = [
+    *[Source("commits", f"selected_{group}_commits.csv", group) for group in ("recent", "legacy")],
+    Source("commits", "selected_recent_commits_retry.csv", "recent"),
+    *[Source("evolution", f"repositories_evolution_{group}_commits_processed.csv", group)
+      for group in ("recent", "legacy")],
+    *[Source("errors", f"selected_{group}_errors.csv", group) for group in ("recent", "legacy")],
+    *[Source("errors", f"repositories_evolution_{group}_errors.csv", group) for group in ("recent", "legacy")],
+    Source("pr_metadata", "sfconvertbot_pr_metadata.csv.zip"),
+    Source("discussions", "converter_discussions.csv"),
+]
+TABLES = list(dict.fromkeys(source.table for source in SOURCES))
+# columns that are not ingested (the model files in the tree of each commit are in the normalized commit logs)
+EXCLUDED_COLUMNS = {"commits": {"all_files_in_tree"}}
+
+
+def connect(db_file: str | Path = DB_FILE) -> sqlite3.Connection:
+    """
+    Open a connection to the database, creating the table that tracks the ingested files if needed.
+    :param db_file: the SQLite database file.
+    :return: the connection.
+    """
+    connection = sqlite3.connect(db_file)
+    connection.execute("CREATE TABLE IF NOT EXISTS ingested_files (source_file TEXT PRIMARY KEY, table_name TEXT, "
+                       "sha256 TEXT, size INTEGER, mtime REAL, num_rows INTEGER, ingested_at TEXT)")
+    return connection
+
+
+def file_hash(file_path: str | Path, block_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hash of a file (read in blocks).
+    :param file_path: the file path.
+    :param block_size: how many bytes are read at a time.
+    :return: the hexadecimal digest.
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def table_columns(connection: sqlite3.Connection, table: str) -> list[str]:
+    """
+    Get the columns of a table.
+    :param connection: the database connection.
+    :param table: the table name.
+    :return: the column names (empty if the table does not exist).
+    """
+    return [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')]
+
+
+def _append(connection: sqlite3.Connection, table: str, chunk: pd.DataFrame) -> None:
+    """
+    Append rows to a table, adding the columns that the table does not have yet.
+    :param connection: the database connection.
+    :param table: the table name.
+    :param chunk: the rows to be inserted.
+    """
+    columns = table_columns(connection, table)
+    for column in chunk.columns:
+        if columns and column not in columns:
+            connection.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}"')
+    chunk.to_sql(table, connection, if_exists="append", index=False)
+
+
+def _create_indexes(connection: sqlite3.Connection, table: str) -> None:
+    """
+    Create the indexes of a table (on the source file and on the INDEXED_COLUMNS it has).
+    :param connection: the database connection.
+    :param table: the table name.
+    """
+    columns = table_columns(connection, table)
+    for column in ["source_file"] + [c for c in INDEXED_COLUMNS if c in columns]:
+        connection.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON "{table}" ("{column}")')
+
+
+def ingest_file(connection: sqlite3.Connection, source: Source, data_dir: str | Path = DATA_DIR) -> bool:
+    """
+    Ingest a source file into its table, replacing the rows previously loaded from it.
+    Files that did not change since they were last ingested (same hash) are skipped. The hash is only computed if the
+    size or the modification time of the file changed.
+    :param connection: the database connection.
+    :param source: the file to be ingested.
+    :param data_dir: the folder with the file.
+    :return: True if the file was (re)loaded, False if it was up-to-date.
+    """
+    file_path = Path(data_dir) / source.file_name
+    stat = file_path.stat()
+    ingested = connection.execute("SELECT sha256, size, mtime FROM ingested_files WHERE source_file = ?",
+                                  (source.file_name,)).fetchone()
+    if ingested and ingested[1:] == (stat.st_size, stat.st_mtime):
+        return False
+    sha256 = file_hash(file_path)
+    if ingested and ingested[0] == sha256:
+        with connection:
+            connection.execute("UPDATE ingested_files SET size = ?, mtime = ? WHERE source_file = ?",
+                               (stat.st_size, stat.st_mtime, source.file_name))
+        return False
+
+    if table_columns(connection, source.table):
+        with connection:
+            connection.execute(f'DELETE FROM "{source.table}" WHERE source_file = ?', (source.file_name,))
+    excluded = EXCLUDED_COLUMNS.get(source.table, set())
+    num_rows = 0
+    for chunk in pd.read_csv(file_path, chunksize=CHUNK_SIZE, usecols=lambda c: c not in excluded):
+        if "date" in chunk.columns:
+            chunk["date"] = pd.to_datetime(chunk["date"], utc=True, format="ISO8601").dt.strftime(DATE_FORMAT)
+        chunk["source_file"] = source.file_name
+        chunk["group_type"] = source.group_type
+        _append(connection, source.table, chunk)
+        num_rows += len(chunk)
+
+    # the file is only recorded once all of its rows are in (an interrupted ingestion is redone from scratch)
+    with connection:
+        _create_indexes(connection, source.table)
+        connection.execute("INSERT OR REPLACE INTO ingested_files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           (source.file_name, source.table, sha256, stat.st_size, stat.st_mtime, num_rows,
+                            datetime.datetime.now().isoformat(timespec="seconds")))
+    return True
+
+
+def ingest(tables: list[str] = None, db_file: str | Path = DB_FILE, data_dir: str | Path = DATA_DIR,
+           verbose: bool = False) -> dict:
+    """
+    Ingest the source files of some tables (files that do not exist are skipped).
+    :param tables: (optional) the tables to be ingested (by default, all TABLES).
+    :param db_file: the SQLite database file.
+    :param data_dir: the folder with the source files.
+    :param verbose: whether to print the status of each file.
+    :return: a dictionary that maps each existing source file to whether it was (re)loaded.
+    """
+    tables = TABLES if tables is None else tables
+    invalid = set(tables) - set(TABLES)
+    if invalid:
+        raise ValueError(f"Invalid tables: {sorted(invalid)}")
+    loaded = {}
+    connection = connect(db_file)
+    try:
+        for source in SOURCES:
+            if source.table not in tables:
+                continue
+            if not (Path(data_dir) / source.file_name).exists():
+                if verbose:
+                    print(f"\t{source.file_name}: not found (skipped)")
+                continue
+            loaded[source.file_name] = ingest_file(connection, source, data_dir)
+            if verbose:
+                print(f"\t{source.file_name}: {'loaded' if loaded[source.file_name] else 'up-to-date'}")
+    finally:
+        connection.close()
+    return loaded
+
+
+def query(sql: str, params: tuple | dict = (), db_file: str | Path = DB_FILE) -> pd.DataFrame:
+    """
+    Run a SQL query over the database.
+    :param sql: the query (use `?` placeholders for the parameters).
+    :param params: the parameters of the query.
+    :param db_file: the SQLite database file.
+    :return: a data frame with the results.
+    """
+    connection = connect(db_file)
+    try:
+        return pd.read_sql_query(sql, connection, params=params)
+    finally:
+        connection.close()
+
+
+def _where_clause(columns: list[str], where: dict | None) -> tuple[str, list]:
+    """
+    Build a WHERE clause where each column is equal to a value (or in a list of values).
+    :param columns: the columns of the table (used to validate the filters).
+    :param where: a dictionary that maps columns to values (or lists of values).
+    :return: the clause (empty if there are no filters) and its parameters.
+    """
+    conditions, params = [], []
+    for column, value in (where or {}).items():
+        if column not in columns:
+            raise ValueError(f"Invalid column: {column}")
+        if isinstance(value, (list, tuple, set)):
+            conditions.append(f'"{column}" IN ({", ".join("?" * len(value))})')
+            params.extend(value)
+        else:
+            conditions.append(f'"{column}" = ?')
+            params.append(value)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+def read_table(table: str, where: dict = None, db_file: str | Path = DB_FILE) -> pd.DataFrame:
+    """
+    Read (some rows of) a table, with the same columns as its source files.
+    :param table: the table name.
+    :param where: (optional) a dictionary that maps columns to values (or lists of values) to filter the rows.
+    :param db_file: the SQLite database file.
+    :return: a data frame with the rows.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Invalid table: {table}")
+    connection = connect(db_file)
+    try:
+        columns = table_columns(connection, table)
+        clause, params = _where_clause(columns, where)
+        select = ", ".join(f'"{c}"' for c in columns if c not in SOURCE_COLUMNS)
+        return pd.read_sql_query(f'SELECT {select} FROM "{table}"{clause}', connection, params=params)
+    finally:
+        connection.close()
+
+
+def count_rows(table: str, by: list[str] = None, freq: str = None, where: dict = None, distinct: str = None,
+               db_file: str | Path = DB_FILE) -> pd.DataFrame:
+    """
+    Count the rows of a table (in the database), optionally grouped by columns and/or periods of the `date` column.
+    For example, the number of repositories per serialization format and month of the recent group:
+        count_rows("evolution", by=["serialization_format"], freq="month", where={"group_type": "recent"},
+                   distinct="repo_url")
+    :param table: the table name.
+    :param by: (optional) the columns to group by.
+    :param freq: (optional) the period ('day', 'month' or 'year') to group the dates by.
+    :param where: (optional) a dictionary that maps columns to values (or lists of values) to filter the rows.
+    :param distinct: (optional) count the distinct values of this column instead of the rows.
+    :param db_file: the SQLite database file.
+    :return: a data frame with the groups (the period is in a column named after `freq`) and their `count`.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Invalid table: {table}")
+    if freq is not None and freq not in PERIOD_FORMATS:
+        raise ValueError(f"Invalid frequency: {freq}")
+    connection = connect(db_file)
+    try:
+        columns = table_columns(connection, table)
+        by = by or []
+        for column in by + ([distinct] if distinct else []):
+            if column not in columns:
+                raise ValueError(f"Invalid column: {column}")
+        groups = [f'"{c}"' for c in by]
+        if freq is not None:
+            groups.insert(0, f"strftime('{PERIOD_FORMATS[freq]}', date) AS \"{freq}\"")
+        clause, params = _where_clause(columns, where)
+        count = f'COUNT(DISTINCT "{distinct}")' if distinct else "COUNT(*)"
+        sql = f'SELECT {", ".join(groups + [f"{count} AS count"])} FROM "{table}"{clause}'
+        if groups:
+            sql += f" GROUP BY {', '.join(str(i + 1) for i in range(len(groups)))}"
+            sql += f" ORDER BY {', '.join(str(i + 1) for i in range(len(groups)))}"
+        return pd.read_sql_query(sql, connection, params=params)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the pipeline outputs into the SQLite database.")
+    parser.add_argument("--tables", nargs="+", choices=TABLES, default=TABLES, help="Tables to be ingested.")
+    args = parser.parse_args()
+    print(f"Ingesting {', '.join(args.tables)} into {DB_FILE}...")
+    ingest(args.tables, verbose=True)
+    print(query("SELECT table_name, COUNT(*) AS files, SUM(num_rows) AS rows FROM ingested_files GROUP BY 1"))
+    print("Done!")
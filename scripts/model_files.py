@@ -0,0 +1,134 @@
+"""
+Shared matcher for model files, i.e., files whose extension is one of MODEL_FILE_EXTENSIONS.
+All extensions are compiled into a single regular expression, so a whole column of paths (or of ";"-joined lists of
+paths, as in the commit logs) can be matched at once with pandas' string methods, instead of splitting the strings and
+building a `Path` object per file.
+
+The matcher has the same semantics as `Path(file_path).suffix[1:] in MODEL_FILE_EXTENSIONS`: the extension is what
+follows the last dot of the file name, as long as that dot is neither the first nor the last character of the name.
+
+Run this module to benchmark the matcher against the `Path`-based implementation:
+    python model_files.py [--num-paths N]
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+import pandas as pd
+from analyticaml import MODEL_FILE_EXTENSIONS
+
+# separator used in the `changed_files` and `all_files_in_tree` columns of the commit logs
+PATHS_SEPARATOR = ";"
+# set version of MODEL_FILE_EXTENSIONS (for constant-time lookups of a single extension)
+MODEL_FILE_EXTENSIONS_SET = frozenset(MODEL_FILE_EXTENSIONS)
+
+# A suffix never contains a dot or a slash, so extensions that do can never be matched (and are left out)
+_EXTENSIONS = "|".join(re.escape(ext) for ext in sorted(MODEL_FILE_EXTENSIONS_SET, key=len, reverse=True)
+                       if ext and "." not in ext and "/" not in ext)
+_SEP = re.escape(PATHS_SEPARATOR)
+# a single path: the dot must be preceded by a character of the file name (i.e., it cannot start the name);
+# trailing slashes are ignored, as in `Path`
+MODEL_FILE_PATTERN = re.compile(rf"[^/]\.(?:{_EXTENSIONS})/*\Z")
+# a list of paths joined by PATHS_SEPARATOR: same as above, but each path ends at a separator (or the end of string)
+MODEL_FILES_PATTERN = re.compile(rf"[^/{_SEP}]\.(?:{_EXTENSIONS})/*(?={_SEP}|\Z)")
+# same as above, but it captures the whole path (used to extract the model files from the list)
+_MODEL_FILE_ITEM_PATTERN = re.compile(rf"(?:^|(?<={_SEP}))([^{_SEP}]*[^/{_SEP}]\.(?:{_EXTENSIONS})/*)(?={_SEP}|\Z)")
+
+
+def is_model_extension(extension: str) -> bool:
+    """
+    Check if an extension (without the leading dot) is a model file extension.
+    :param extension: the file extension (e.g., "bin").
+    :return: True if it is one of MODEL_FILE_EXTENSIONS, False otherwise.
+    """
+    return extension in MODEL_FILE_EXTENSIONS_SET
+
+
+def is_model_file(file_path: str) -> bool:
+    """
+    Check if the file is a model file
+    :param file_path: the file path
+    :return: True if the file is a model file, False otherwise.
+    """
+    return MODEL_FILE_PATTERN.search(file_path) is not None
+
+
+def filter_by_extension(changed_files: str) -> bool:
+    """
+    Implement a filter to check if the list of changed files in a commit has model files.
+    A model file is a file that has one of the extensions in MODEL_FILE_EXTENSIONS.
+    :param changed_files: a string with the list of changed files in a commit (separated by ";").
+    :return: True if there is a model file in the list, False otherwise.
+    """
+    return MODEL_FILES_PATTERN.search(changed_files) is not None
+
+
+def match_model_files(file_paths: pd.Series) -> pd.Series:
+    """
+    Vectorized version of `is_model_file`.
+    :param file_paths: a series of file paths (NaN values are treated as non-model files).
+    :return: a boolean series (same index) that is True for the model files.
+    """
+    return file_paths.str.contains(MODEL_FILE_PATTERN, na=False)
+
+
+def contains_model_file(joined_paths: pd.Series) -> pd.Series:
+    """
+    Vectorized version of `filter_by_extension`.
+    :param joined_paths: a series of strings with lists of paths separated by ";" (e.g., the `changed_files` or
+    `all_files_in_tree` columns of the commit logs). NaN values are treated as empty lists.
+    :return: a boolean series (same index) that is True for the rows with at least one model file.
+    """
+    return joined_paths.str.contains(MODEL_FILES_PATTERN, na=False)
+
+
+def explode_model_files(joined_paths: pd.Series) -> pd.Series:
+    """
+    Extract the model files from a series of ";"-joined paths, one per row.
+    The items are returned as they are in the list (e.g., "+ path" for the `changed_files` column).
+    :param joined_paths: a series of strings with lists of paths separated by ";".
+    :return: a series with one row per model file, indexed by the index of the row it was extracted from.
+    """
+    model_files = joined_paths.str.findall(_MODEL_FILE_ITEM_PATTERN).explode()
+    return model_files.dropna()
+
+
+def _benchmark(num_paths: int, paths_per_commit: int = 25) -> None:
+    """
+    Compare the throughput of this matcher with the `Path`-based implementation over synthetic commit logs.
+    :param num_paths: total number of paths to match.
+    :param paths_per_commit: how many paths are joined in each row.
+    """
+    extensions = sorted(MODEL_FILE_EXTENSIONS_SET) + ["json", "txt", "md", "py", "gitattributes", ""]
+    paths = [f"folder_{i % 97}/file_{i}.{extensions[i % len(extensions)]}" for i in range(num_paths)]
+    joined = pd.Series([PATHS_SEPARATOR.join(paths[i:i + paths_per_commit])
+                        for i in range(0, num_paths, paths_per_commit)])
+    print(f"Benchmarking over {num_paths:,} paths ({len(joined):,} rows)...")
+
+    def reference(changed_files: str) -> bool:
+        return any([Path(f).suffix[1:] in MODEL_FILE_EXTENSIONS for f in changed_files.split(PATHS_SEPARATOR)])
+
+    start = time.perf_counter()
+    expected = joined.apply(reference)
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = contains_model_file(joined)
+    matcher_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exploded = explode_model_files(joined)
+    explode_time = time.perf_counter() - start
+
+    assert expected.equals(actual), "The vectorized matcher disagrees with the Path-based implementation"
+    print(f"\tPath-based apply:     {reference_time:8.3f}s ({num_paths / reference_time:,.0f} paths/s)")
+    print(f"\tcontains_model_file:  {matcher_time:8.3f}s ({num_paths / matcher_time:,.0f} paths/s)")
+    print(f"\texplode_model_files:  {explode_time:8.3f}s ({len(exploded):,} model files)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the model file matcher.")
+    parser.add_argument("--num-paths", type=int, default=2_000_000, help="Number of paths to match.")
+    args = parser.parse_args()
+    _benchmark(args.num_paths)
@@ -0,0 +1,55 @@
+"""
+This script normalizes the commit logs produced by get_commit_logs.py into integer tables stored in Parquet format:
+- selected_<group>_commits<suffix>_commits.parquet: one row per commit (commit_id, repo_url, commit_hash, ...).
+- selected_<group>_commits<suffix>_paths.parquet: the path dictionary (path_id, path, is_model_file).
+- selected_<group>_commits<suffix>_changes.parquet: the files changed by each commit (commit_id, path_id, change_status).
+- selected_<group>_commits<suffix>_tree.parquet: the model files in the tree of each commit (commit_id, path_id).
+The analyses load these tables (see commit_logs.load_normalized_commit_log) instead of re-parsing the CSV files.
+"""
+import argparse
+import sys
+
+from commit_logs import normalize_commit_log, save_normalized_commit_log, normalized_files
+from commit_logs import touches_model_files, has_model_files_in_tree
+from utils import DATA_DIR
+
+
+def parse_args():
+    """
+    Parse the command line arguments
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Normalize the commit logs of a repository group.")
+    parser.add_argument(
+        "group_type",
+        choices=["legacy", "recent"],
+        help="Type of repository group to process: 'legacy' or 'recent'."
+    )
+    parser.add_argument(
+        "--retry",
+        action="store_true",
+        help="Normalize the commit logs of the repositories to be retried (see hotfixes/compute_failed_recent_history.py)."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    suffix = "_retry" if args.retry else ""
+    input_file = DATA_DIR / f"selected_{args.group_type}_commits{suffix}.csv"
+    if not input_file.exists():
+        print(f"Input file {input_file} does not exist. Please run get_commit_logs.py to generate it.")
+        sys.exit(1)
+
+    print(f"Normalizing the commit logs from {input_file}...")
+    log = normalize_commit_log(input_file)
+    save_normalized_commit_log(log, input_file)
+
+    print(f"# commits: {len(log.commits)} over {log.commits['repo_url'].nunique()} repositories")
+    print(f"# unique paths: {len(log.paths)} ({log.paths['is_model_file'].sum()} model files)")
+    print(f"# changed files: {len(log.changes)}")
+    print(f"# commits touching at least one model file: {touches_model_files(log).sum()}")
+    print(f"# commits with at least one model file in its tree: {has_model_files_in_tree(log).sum()}")
+    for table, out_file in normalized_files(input_file).items():
+        print(f"Table '{table}' saved to {out_file}")
+    print("Done!")
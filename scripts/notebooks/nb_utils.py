@@ -1,13 +1,25 @@
 import datetime
+import sys
 import zipfile
 from pathlib import Path
-from typing import Literal
+from typing import Literal, NamedTuple
 
 import numpy as np
 import pandas as pd
-from analyticaml import MODEL_FILE_EXTENSIONS
 from matplotlib.font_manager import FontProperties
-from tqdm import tqdm
+
+# the notebooks are run from scripts/notebooks, and the shared modules of the pipeline are in scripts/
+SCRIPTS_DIR = str(Path(__file__).resolve().parent.parent)
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from commit_logs import NormalizedCommitLog, load_normalized_commit_log
+from commit_logs import has_model_files_in_tree, touches_model_files
+from key_ids import count_unique, is_member
+from model_evolution_db import count_rows, ingest, query, read_table
+from repo_metadata import load_repos_metadata
+from rq_aggregates import read_aggregate, refresh_aggregates
+from snapshot_index import SnapshotIndex, load_snapshot_index
 
 # Create a font property with Noto Emoji and Roboto Condensed fonts
 EMOJI_FONT = FontProperties(fname=Path('../../assets/NotoEmoji-Regular.ttf'))
@@ -19,11 +31,19 @@ SAFETENSORS_RELEASE_DATE = pd.to_datetime("2022-09-22")
 # Data and results directories
 DATA_DIR = Path('../../data')
 RESULTS_DIR = Path('../../results')
+# data frames computed by read_repositories_evolution and normalized commit logs (key = group)
+_REPOSITORIES_EVOLUTION, _COMMIT_LOGS = {}, {}
+# columns of the repositories' metadata read by read_repos_metadata (key = (group, column))
+_REPOS_METADATA = {}
+# snapshot indexes loaded by get_snapshot_index (key = group)
+_SNAPSHOT_INDEXES = {}
 
 
 def read_repositories_evolution(group: Literal['recent', 'legacy', 'both'] | str) -> pd.DataFrame:
     """
     Read the commits from the repository evolution dataset.
+    The data frame of each group is computed once and cached, so calling it again (e.g., in other notebook cells)
+    only costs a copy.
     :return: a data frame
     """
     if group not in ('recent', 'legacy', 'both'):
@@ -35,111 +55,134 @@ def read_repositories_evolution(group: Literal['recent', 'legacy', 'both'] | str
         df = pd.concat([df_recent, df_legacy], ignore_index=True)
         return df
 
+    if group not in _REPOSITORIES_EVOLUTION:
+        _REPOSITORIES_EVOLUTION[group] = _compute_repositories_evolution(group)
+    return _REPOSITORIES_EVOLUTION[group].copy()
+
+
+def _compute_repositories_evolution(group: Literal['recent', 'legacy']) -> pd.DataFrame:
+    """
+    Read the repository evolution dataset of a group and add the elapsed days and change status of each model file.
+    :param group: the group of repositories ('recent' or 'legacy').
+    :return: a data frame
+    """
     df = pd.read_csv(DATA_DIR / f"repositories_evolution_{group}_commits_processed.csv")
     # ensure date is in datetime format
     df['date'] = pd.to_datetime(df['date'])
     # Calculate elapsed days since reference date (safetensors first release)
     df['elapsed_days'] = (df['date'] - SAFETENSORS_RELEASE_DATE).dt.days
-    # Add a change_status to data frame
-    df_commits = pd.read_csv(DATA_DIR / f"selected_{group}_commits.csv")
-    # set "changed_files" and "all_files_in_tree" columns to empty string if it is NaN
-    df_commits["changed_files"] = df_commits["changed_files"].fillna("")
-    df_commits["all_files_in_tree"] = df_commits["all_files_in_tree"].fillna("")
-    changed_files = dict()  # key = repo_url/file_path&&commit_hash; value = status (added, modified, deleted)
-    for index, row in tqdm(df_commits.iterrows(), total=len(df_commits), unit="commit"):
-        commit_hash = row["commit_hash"]
-        repo_url = row["repo_url"]
-        if row["changed_files"]:
-            for x in row["changed_files"].split(";"):
-                status, file_path = x.split(maxsplit=1)
-                changed_files[f"{repo_url}/{file_path}&&{commit_hash}"] = status
-
-    # Add the change_status to the data frame for the files that are in the commit
+    # Add a change_status (added, modified, deleted, ...) to the files that are in the commit
+    commit_log = _load_commit_log(group)
     df["change_status"] = ""
-    for index, row in tqdm(df.iterrows(), total=len(df), unit="commit"):
-        commit_hash = row["commit_hash"]
-        model_file_path = row["model_file_path"]
-        if df.at[index, "is_in_commit"]:
-            df.at[index, "change_status"] = changed_files[f"{model_file_path}&&{commit_hash}"]
+    df_in_commit = df.loc[df["is_in_commit"].astype(bool), ["repo_url", "commit_hash", "model_file_path"]]
+    if df_in_commit.empty:
+        return df
 
+    # map (repo_url, commit_hash) to commit ids
+    df_log_commits = commit_log.commits.drop_duplicates(["repo_url", "commit_hash"], keep="last")
+    commits_index = pd.MultiIndex.from_arrays([df_log_commits["repo_url"].astype(str), df_log_commits["commit_hash"]])
+    commit_ids = df_log_commits["commit_id"].to_numpy()[
+        commits_index.get_indexer(pd.MultiIndex.from_frame(df_in_commit[["repo_url", "commit_hash"]]))]
+    # map the model file paths (i.e., repo_url/file_path) to path ids
+    file_paths = [path[len(repo_url) + 1:] for repo_url, path in
+                  zip(df_in_commit["repo_url"], df_in_commit["model_file_path"])]
+    path_ids = pd.Index(commit_log.paths["path"]).get_indexer(file_paths)
+    # join with the changes on (commit_id, path_id), combined into a single integer key
+    num_paths = len(commit_log.paths)
+    df_changes = commit_log.changes
+    change_keys = df_changes["commit_id"].to_numpy(np.int64) * num_paths + df_changes["path_id"].to_numpy(np.int64)
+    change_keys = pd.Series(df_changes["change_status"].astype(str).to_numpy(), index=change_keys)
+    change_keys = change_keys[~change_keys.index.duplicated(keep="last")]
+    keys = commit_ids.astype(np.int64) * num_paths + path_ids
+    positions = change_keys.index.get_indexer(keys)
+    positions[(commit_ids < 0) | (path_ids < 0)] = -1
+    if (positions < 0).any():
+        missing = df_in_commit[positions < 0].iloc[0]
+        raise KeyError(f"{missing['model_file_path']}&&{missing['commit_hash']}")
+    df.loc[df_in_commit.index, "change_status"] = change_keys.to_numpy()[positions]
     return df
 
 
-def filter_by_extension(changed_files: str) -> bool:
-    """
-    Implement a filter to check if the list of changed files in a commit has model files.
-    A model file is a file that has one of the extensions in MODEL_FILE_EXTENSIONS.
-    :param changed_files: a string with the list of changed files in a commit (separated by ";").
-    :return: True if there is a model file in the list, False otherwise.
-    """
-    changed_files = changed_files.split(";")
-    file_extensions = [Path(f).suffix[1:] for f in changed_files]
-    return any([ext in MODEL_FILE_EXTENSIONS for ext in file_extensions])
-
-
 def get_commit_log_stats(df_repository_evolution: pd.DataFrame,
                          group: Literal['recent', 'legacy', 'both']) -> pd.Series:
     """
     Read the commits logs extracted for the selected repositories and compute some basic stats.
-    :return:
+    The stats of each group are computed in a single pass over its normalized commit log; for 'both', the stats of
+    each group are combined (the groups have disjoint sets of repositories, so counts are simply added up).
+    :return: a tuple with the stats, the number of commits touching model files and the number of commits adding them.
     """
-    stats = pd.Series()
+    if group not in ('recent', 'legacy', 'both'):
+        raise ValueError(f"Invalid group: {group}")
+    groups = ['recent', 'legacy'] if group == 'both' else [group]
+    stats = _compute_commit_log_stats(df_repository_evolution, groups[0])
+    for other_group in groups[1:]:
+        other_stats = _compute_commit_log_stats(df_repository_evolution, other_group)
+        for key in stats.index:
+            stats[key] = max(stats[key], other_stats[key]) if key == "last commit date" else stats[key] + other_stats[key]
     stats.name = f"Commit log stats for {group} repositories"
-    if group == 'both':
-        stats_recent, total_touching_models_recent, total_adding_models_recent = get_commit_log_stats(
-            df_repository_evolution, 'recent')
-        stats_legacy, total_touching_models_legacy, total_adding_models_legacy = get_commit_log_stats(
-            df_repository_evolution, 'legacy')
-        total_touching_model_files = total_touching_models_recent + total_touching_models_legacy
-        total_adding_model_files = total_adding_models_recent + total_adding_models_legacy
-        # assertion that ensures both stats_recent and stats_legacy have the same keys
-        assert set(stats_recent.index) == set(
-            stats_legacy.index), "Stats for recent and legacy groups should have the same keys."
-        # merge the stats for recent and legacy groups
-        for key in set(stats_recent.index):
-            stats[key] = stats_recent.get(key, 0) + stats_legacy.get(key, 0)
-        return stats, total_touching_model_files, total_adding_model_files
-
-    # Load the repositories and set nan columns to empty string
-    input_file = DATA_DIR / f"selected_{group}_commits.csv"
-    df = pd.read_csv(input_file).fillna("")
+    return (stats, stats["# commits modifying/adding/deleting at least one serialized model"],
+            stats["# commits adding at least one serialized model"])
 
-    # exclude repos that are not in the evolution data frame
-    repo_urls = df_repository_evolution["repo_url"].unique()
-    df = df[df["repo_url"].isin(repo_urls)]
-    total_commits = len(df)
 
+def _compute_commit_log_stats(df_repository_evolution: pd.DataFrame,
+                              group: Literal['recent', 'legacy']) -> pd.Series:
+    """
+    Compute the stats reported by get_commit_log_stats for a single group.
+    :param df_repository_evolution: the repository evolution data frame (it may include other groups).
+    :param group: the group of repositories ('recent' or 'legacy').
+    :return: a series with the stats
+    """
+    commit_log = _load_commit_log(group)
+    # repo_url ids of the commit log and of the evolution data
+    repo_ids, evolution_repo_ids = _local_ids(commit_log.commits["repo_url"], df_repository_evolution["repo_url"])
+    # exclude repos that are not in the evolution data frame
+    is_evolution_repo = is_member(repo_ids, evolution_repo_ids)
     # identify the commits that added/modified/deleted at least one model file
-    df = df[df["changed_files"].apply(lambda x: filter_by_extension(x))]
-    df.reset_index(drop=True, inplace=True)
-    total_touching_model_files = len(df)
-    total_repos_touching_model_files = df["repo_url"].nunique()
-    # compute commits that modify or add model files
-    df_added_model_files = df_repository_evolution[df_repository_evolution['change_status'] == '+']
-    total_adding_model_files = len(df_added_model_files[['repo_url', 'commit_hash']].drop_duplicates())
-    total_repos_adding_model_files = df_added_model_files['repo_url'].nunique()
-    # compute commits that do not contain at least one model file in its tree
-    num_empty = 0
-    for _, row in df.iterrows():
-        all_model_files = []
-        for f in row["all_files_in_tree"].split(";"):
-            if Path(f).suffix[1:] in MODEL_FILE_EXTENSIONS:
-                all_model_files.append(f)
-        if len(all_model_files) == 0:
-            num_empty += 1
-
-    stats.loc["# commits in all logs (total)"] = total_commits
-    stats.loc["# commits modifying/adding/deleting at least one serialized model"] = total_touching_model_files
+    is_touching = is_evolution_repo & touches_model_files(commit_log)
+    # identify the commits that do not contain at least one model file in its tree
+    is_empty = is_touching & ~has_model_files_in_tree(commit_log)
+    # compute commits that add model files (from the evolution rows of this group's repositories)
+    is_added = is_member(evolution_repo_ids, repo_ids) & (df_repository_evolution['change_status'] == '+').to_numpy()
+    added_repo_ids = evolution_repo_ids[is_added]
+    added_commit_ids = _local_ids(df_repository_evolution['commit_hash'].to_numpy()[is_added])[0]
+    num_repos_touching = count_unique(repo_ids[is_touching])
+    last_commit_date = commit_log.commits["date"][is_touching].max()
+
+    stats = pd.Series(dtype=object)
+    stats.loc["# commits in all logs (total)"] = int(is_evolution_repo.sum())
+    stats.loc["# commits modifying/adding/deleting at least one serialized model"] = int(is_touching.sum())
     stats.loc[
-        "# repos associated with commits modifying/adding/deleting at least one serialized model"] = total_repos_touching_model_files
-    stats.loc["# commits adding at least one serialized model"] = total_adding_model_files
-    stats.loc["# repos associated with commits adding at least one serialized model"] = total_repos_adding_model_files
-    stats.loc["# commits containing at least one model file in its tree"] = len(df) - num_empty
-    stats.loc["# commits not containing at least one model file"] = num_empty
-    stats.loc["# repos"] = df["repo_url"].nunique()
-    stats.loc["last commit date"] = df["date"].max()
+        "# repos associated with commits modifying/adding/deleting at least one serialized model"] = num_repos_touching
+    stats.loc["# commits adding at least one serialized model"] = count_unique(added_repo_ids, added_commit_ids)
+    stats.loc["# repos associated with commits adding at least one serialized model"] = count_unique(added_repo_ids)
+    stats.loc["# commits containing at least one model file in its tree"] = int((is_touching & ~is_empty).sum())
+    stats.loc["# commits not containing at least one model file"] = int(is_empty.sum())
+    stats.loc["# repos"] = num_repos_touching
+    stats.loc["last commit date"] = last_commit_date.strftime("%Y-%m-%d %H:%M:%S") if is_touching.any() else np.nan
+    return stats
 
-    return stats, total_touching_model_files, total_adding_model_files
+
+def _local_ids(*keys: pd.Series | np.ndarray) -> list:
+    """
+    Map keys to ids that are only meaningful within a computation (for is_member and count_unique). Unlike
+    key_ids.encode, the dictionaries of the data directory are neither read nor extended.
+    :param keys: one or more sets of keys (e.g., the repo_url columns of two data frames).
+    :return: an int64 array of ids for each set of keys (equal keys have equal ids across the sets).
+    """
+    arrays = [np.asarray(k, dtype=object) for k in keys]
+    codes, _ = pd.factorize(np.concatenate(arrays))
+    return np.split(codes.astype(np.int64), np.cumsum([len(a) for a in arrays])[:-1])
+
+
+def _load_commit_log(group: Literal['recent', 'legacy']) -> NormalizedCommitLog:
+    """
+    Load (once) the normalized commit log of a group.
+    :param group: the group of repositories ('recent' or 'legacy').
+    :return: the normalized commit log
+    """
+    if group not in _COMMIT_LOGS:
+        _COMMIT_LOGS[group] = load_normalized_commit_log(DATA_DIR / f"selected_{group}_commits.csv")
+    return _COMMIT_LOGS[group]
 
 
 def get_safetensors_releases():
@@ -245,55 +288,234 @@ def compute_year_range(year: int) -> pd.DatetimeIndex:
     return pd.date_range(start=start_date, end=end_date, freq='D')
 
 
-def get_commit_counts_by_date(df: pd.DataFrame) -> pd.Series:
+def compute_calendar_weeks(dates: pd.Series) -> np.ndarray:
     """
-    Get the number of commits by date.
+    Vectorized version of compute_calendar_week.
+    :param dates: a series of dates
+    :return: an array with the calendar week number (0-52) of each date
+    """
+    dates = pd.Series(pd.to_datetime(dates))
+    iso_weeks = dates.dt.isocalendar().week.to_numpy(np.int64)
+    years, months = dates.dt.year.to_numpy(), dates.dt.month.to_numpy()
+    # iso week of January 1st and December 31st of the year of each date
+    jan1st_weeks = pd.to_datetime({'year': years, 'month': 1, 'day': 1}).dt.isocalendar().week.to_numpy(np.int64)
+    dec31st_weeks = pd.to_datetime({'year': years, 'month': 12, 'day': 31}).dt.isocalendar().week.to_numpy(np.int64)
+    # If January 1st is in the last week of the previous year, the first days of January are in week 0
+    starts_in_last_week = jan1st_weeks > 50
+    weeks = np.where(starts_in_last_week,
+                     np.where((months == 1) & (iso_weeks > 50), 0, iso_weeks),
+                     iso_weeks - 1)
+    # If December 31st is in the first week of the next year, the last days of December are in week 52
+    ends_in_first_week = ~starts_in_last_week & (dec31st_weeks == 1) & (months == 12) & (iso_weeks == 1)
+    return np.where(ends_in_first_week, 52, weeks)
+
+
+class CalendarHeatmaps(NamedTuple):
+    """
+    Year matrices (7 rows for days, 53 columns for weeks) of the calendar heatmaps:
+    - years: the years, in ascending order.
+    - groups: the groups (one heatmap per group and year), or None if the dates were not grouped.
+    - counts: the number of dates that fall on each day, with shape (years, 7, 53), or (groups, years, 7, 53).
+    - masks: the days that do not belong to each year (see compute_calendar_mask), with shape (years, 7, 53).
+    """
+    years: np.ndarray
+    groups: np.ndarray | None
+    counts: np.ndarray
+    masks: np.ndarray
+
+
+def build_calendar_heatmaps(dates: pd.Series, by: pd.Series | np.ndarray | None = None,
+                            years: list | None = None) -> CalendarHeatmaps:
+    """
+    Count the dates (e.g., commits) per day of the year, laid out as in the calendar heatmaps.
+    All dates are placed in one pass, using the same weeks as compute_calendar_week.
+    :param dates: a series with the dates (times are ignored).
+    :param by: (optional) the group of each date (e.g., the serialization format), aligned with `dates`.
+    :param years: (optional) the years to be included (by default, all years with dates). Other dates are ignored.
+    :return: the year matrices of the heatmaps.
+    """
+    dates = pd.Series(pd.to_datetime(dates)).reset_index(drop=True)
+    years = np.sort(dates.dt.year.unique()) if years is None else np.sort(np.asarray(years))
+    in_years = dates.dt.year.isin(years).to_numpy()
+    dates = dates[in_years]
+
+    # flat position of each date: (group, year, day of the week, week)
+    cells = np.searchsorted(years, dates.dt.year.to_numpy()) * 7 + dates.dt.weekday.to_numpy()
+    cells = cells * 53 + compute_calendar_weeks(dates)
+    groups, num_groups = None, 1
+    if by is not None:
+        codes, groups = pd.factorize(np.asarray(by)[in_years], sort=True)
+        cells = codes * (len(years) * 7 * 53) + cells
+        num_groups = len(groups)
+    counts = np.bincount(cells, minlength=num_groups * len(years) * 7 * 53).reshape(num_groups, len(years), 7, 53)
+
+    # days before January 1st (first week) and after December 31st (last week) do not belong to the year
+    days = np.arange(7)
+    jan1_weekdays = pd.to_datetime({'year': years, 'month': 1, 'day': 1}).dt.weekday.to_numpy()
+    dec31_weekdays = pd.to_datetime({'year': years, 'month': 12, 'day': 31}).dt.weekday.to_numpy()
+    masks = np.zeros((len(years), 7, 53), dtype=bool)
+    masks[:, :, 0] = days < jan1_weekdays[:, None]
+    masks[:, :, -1] = days > dec31_weekdays[:, None]
+    return CalendarHeatmaps(years, groups, counts if by is not None else counts[0], masks)
+
+
+# pandas frequencies used by get_commit_time_series (weeks start on Monday, as in the calendar heatmaps)
+TIME_SERIES_FREQUENCIES = {'D': 'D', 'W': 'W-MON', 'M': 'MS'}
+
+
+def get_commit_time_series(df: pd.DataFrame,
+                           freq: Literal['D', 'W', 'M'] = 'D',
+                           by: str | list | None = None) -> tuple:
+    """
+    Count the commits per day, week or month.
+    Missing periods are filled with zeros by a single reindex over a date range that goes from the first commit (or
+    SAFETENSORS_RELEASE_DATE, if earlier) until yesterday (or the last commit, if later).
     :param df: a data frame with a 'date' column that contains commit dates.
-    :return: a series with the number of commits by date
-    """
-    # group by timestamp, and ignore the times, just group based on the date
-    commits_by_date = df.groupby(df['date'].dt.floor('D')).size().sort_index()
-    # add all dates from SAFE TENSORS RELEASE DATE to today
-    for i in range(0, (pd.Timestamp.today() - SAFETENSORS_RELEASE_DATE).days):
-        date = SAFETENSORS_RELEASE_DATE + pd.Timedelta(days=i)
-        if date not in commits_by_date.index:
-            commits_by_date.loc[date] = 0
-    commits_by_date = commits_by_date.sort_index()
-    commits_by_date.name = 'count'  # name the totals as 'count'
-    # Ensure 'files_modified_by_date' has datetime as the index if not already
-    commits_by_date.index = pd.to_datetime(commits_by_date.index)
-    # Determine the maximum value across the entire dataset to set a common color range
-    vmax = commits_by_date.max()
+    :param freq: 'D' (daily), 'W' (weekly, labeled by the Monday of each week) or 'M' (monthly, labeled by the first
+    day of each month).
+    :param by: (optional) column(s) used to split the commits into several series (e.g., 'serialization_format').
+    :return: a tuple (counts, log_counts, vmax, vmax_log). Without `by`, counts is a series named 'count' and the
+    maximum values are scalars. With `by`, counts is a data frame with one column per group and the maximum values
+    are series (one value per group).
+    """
+    if freq not in TIME_SERIES_FREQUENCIES:
+        raise ValueError(f"Invalid frequency: {freq}")
+    dates = pd.to_datetime(df['date']).dt.floor('D')
+    if by is None:
+        counts = dates.groupby(dates).size()
+    else:
+        levels = [by] if isinstance(by, str) else list(by)
+        counts = df.groupby([dates, *levels]).size().unstack(levels, fill_value=0)
+    counts.index.name = 'date'
+
+    # every day from the release date until yesterday, and also the days with commits outside this range
+    release_date = SAFETENSORS_RELEASE_DATE.tz_localize(dates.dt.tz)
+    last_date = release_date + pd.Timedelta(days=(pd.Timestamp.today(tz=dates.dt.tz) - release_date).days - 1)
+    if not counts.empty:
+        release_date, last_date = min(release_date, counts.index.min()), max(last_date, counts.index.max())
+    counts = counts.reindex(pd.date_range(release_date, last_date, freq='D', name='date'), fill_value=0)
+    if freq != 'D':
+        counts = counts.resample(TIME_SERIES_FREQUENCIES[freq], label='left', closed='left').sum()
+    if by is None:
+        counts.name = 'count'  # name the totals as 'count'
+
     # Apply a log transformation to the commits, offsetting by 1 to handle zero values
-    log_commits_by_date = np.log1p(commits_by_date)  # log(1 + count)
-    # Determine the max log-transformed value for setting the consistent color range
-    vmax_log = log_commits_by_date.max()
-    return commits_by_date, log_commits_by_date, vmax, vmax_log
+    log_counts = np.log1p(counts)  # log(1 + count)
+    # Determine the maximum values to set a common color range (per group)
+    return counts, log_counts, counts.max(), log_counts.max()
 
 
-def extract_metadata(group: str) -> dict:
+def get_commit_counts_by_date(df: pd.DataFrame) -> tuple:
     """
-    Extract metadata from the repository URLs.
-    :param repo_urls: a list of repository URLs
-    :return: a DataFrame with the extracted metadata
+    Get the number of commits by date.
+    :param df: a data frame with a 'date' column that contains commit dates.
+    :return: a tuple (commits_by_date, log_commits_by_date, vmax, vmax_log) (see get_commit_time_series)
+    """
+    return get_commit_time_series(df, freq='D')
+
+
+def read_repos_metadata(group: Literal['recent', 'legacy', 'both'] | str, columns: list[str]) -> pd.DataFrame:
+    """
+    Read some columns of the repositories' metadata (e.g., ['created_at', 'last_modified']).
+    Only the requested columns are loaded (from the columnar copy of `selected_<group>_repos.json`, see
+    repo_metadata.py), and each column is cached, so looking up other repositories later does not reload it.
+    :param group: 'recent', 'legacy' or 'both' (if a repository is in both groups, the legacy metadata is kept)
+    :param columns: the columns to be read
+    :return: a data frame indexed by repo_url
     """
     if group == 'both':
-        dict_recent = extract_metadata('recent')
-        dict_legacy = extract_metadata('legacy')
-        # merge the two dictionaries
-        return {**dict_recent, **dict_legacy}
+        df = pd.concat([read_repos_metadata('recent', columns), read_repos_metadata('legacy', columns)])
+        return df[~df.index.duplicated(keep='last')]
+    if group not in ('recent', 'legacy'):
+        raise ValueError(f"Invalid group: {group}")
+
+    missing = [c for c in columns if (group, c) not in _REPOS_METADATA]
+    if missing:
+        df_metadata = load_repos_metadata(DATA_DIR / f"selected_{group}_repos.json", missing)
+        for column in missing:
+            _REPOS_METADATA[(group, column)] = df_metadata[column]
+    return pd.concat([_REPOS_METADATA[(group, c)] for c in columns], axis=1)
+
+
+def query_db(sql: str, params: tuple | dict = (), tables: list[str] = None) -> pd.DataFrame:
+    """
+    Run a SQL query over results/db_model_evolution.sqlite3 (see model_evolution_db.py).
+    :param sql: the query (use `?` placeholders for the parameters)
+    :param params: the parameters of the query
+    :param tables: (optional) tables to be ingested before running the query (only changed files are reloaded)
+    :return: a data frame with the results
+    """
+    if tables:
+        ingest(tables)
+    return query(sql, params)
+
+
+def read_db_table(table: str, where: dict = None) -> pd.DataFrame:
+    """
+    Read (some rows of) a table of results/db_model_evolution.sqlite3, ingesting its source files first if they
+    changed since they were last ingested.
+    :param table: 'commits', 'evolution', 'errors', 'pr_metadata' or 'discussions'
+    :param where: (optional) a dictionary that maps columns to values (or lists of values) to filter the rows
+    :return: a data frame with the same columns as the source files
+    """
+    ingest([table])
+    return read_table(table, where)
+
+
+def count_db_rows(table: str, group: Literal['recent', 'legacy', 'both'] | str = 'both', by: list[str] = None,
+                  freq: Literal['day', 'month', 'year'] = None, where: dict = None, distinct: str = None) -> pd.DataFrame:
+    """
+    Count the rows of a table of results/db_model_evolution.sqlite3 in the database (see model_evolution_db.count_rows),
+    ingesting its source files first if they changed since they were last ingested.
+    :param table: 'commits', 'evolution', 'errors', 'pr_metadata' or 'discussions'
+    :param group: only count the rows of this group of repositories ('both' counts all rows)
+    :param by: (optional) the columns to group by
+    :param freq: (optional) the period to group the dates by
+    :param where: (optional) a dictionary that maps columns to values (or lists of values) to filter the rows
+    :param distinct: (optional) count the distinct values of this column instead of the rows
+    :return: a data frame with the groups and their `count`
+    """
+    if group not in ('recent', 'legacy', 'both'):
+        raise ValueError(f"Invalid group: {group}")
+    where = dict(where or {})
+    if group != 'both':
+        where['group_type'] = group
+    ingest([table])
+    return count_rows(table, by=by, freq=freq, where=where, distinct=distinct)
+
+
+def read_rq_aggregate(name: str, group: Literal['recent', 'legacy', 'both'] | str) -> pd.DataFrame:
+    """
+    Read one of the materialized RQ1/RQ2 aggregates (see rq_aggregates.py), refreshing it first for the repositories
+    whose evolution rows (or creation date) changed since it was last computed.
+    :param name: 'formats_per_month', 'formats_per_creation_month', 'commits_by_tool' or 'first_safetensors_adoption'
+    :param group: 'recent', 'legacy' or 'both'
+    :return: the aggregate (see rq_aggregates.read_aggregate)
+    """
+    if group not in ('recent', 'legacy', 'both'):
+        raise ValueError(f"Invalid group: {group}")
+    for g in (('recent', 'legacy') if group == 'both' else (group,)):
+        df = read_repositories_evolution(g)
+        df['created_at'] = df['repo_url'].map(read_repos_metadata(g, ['created_at'])['created_at'])
+        refresh_aggregates(df, g)
+    return read_aggregate(name, group)
+
+
+def get_snapshot_index(group: Literal['recent', 'legacy']) -> SnapshotIndex:
+    """
+    Load the point-in-time index of the model files of a group (see snapshot_index.py), built from the processed
+    evolution data and the commit log (for the deletions), e.g., to query which files/formats existed at a date with
+    snapshot_at(index, date) or count them over many dates with count_at(index, dates).
+    :param group: 'recent' or 'legacy'
+    :return: the snapshot index
+    """
     if group not in ('recent', 'legacy'):
         raise ValueError(f"Invalid group: {group}")
-    # Extracted results, load to frame and delete the large CSV
-    df_metadata = pd.read_json(DATA_DIR / f"selected_{group}_repos.json")
-    # Convert the 'created_at' column to datetime
-    df_metadata['created_at'] = pd.to_datetime(df_metadata['created_at'], utc=True)
-    df_metadata['last_modified'] = pd.to_datetime(df_metadata['last_modified']/ 1000, unit='s', utc=True)
-    df_metadata['lastModified'] = pd.to_datetime(df_metadata['created_at'], utc=True)
-    # rename id to 'repo_url' for consistency
-    df_metadata.rename(columns={'id': 'repo_url'}, inplace=True)
-    # Create a dictionary to map the 'repo_url' to the metadata
-    return df_metadata.set_index('repo_url').to_dict(orient='index')
+    if group not in _SNAPSHOT_INDEXES:
+        _SNAPSHOT_INDEXES[group] = load_snapshot_index(
+            DATA_DIR / f"repositories_evolution_{group}_commits_processed.csv",
+            DATA_DIR / f"selected_{group}_commits.csv")
+    return _SNAPSHOT_INDEXES[group]
 
 
 if __name__ == "__main__":
@@ -308,8 +530,7 @@ if __name__ == "__main__":
     #     r = compute_year_range(year)
     #     print(year, r[0], r[-1])
 
-    all = extract_metadata('recent')
+    df_metadata = read_repos_metadata('recent', ['created_at', 'last_modified'])
 
-    print(all['speechbrain/ssl-wav2vec2-base-librispeech']['last_modified'])
-    print(all['speechbrain/ssl-wav2vec2-base-librispeech']['created_at'])
-    print(all['speechbrain/ssl-wav2vec2-base-librispeech']['lastModified'])
+    print(df_metadata.loc['speechbrain/ssl-wav2vec2-base-librispeech', 'last_modified'])
+    print(df_metadata.loc['speechbrain/ssl-wav2vec2-base-librispeech', 'created_at'])
@@ -1,5 +1,6 @@
 import pandas as pd
 
+from key_ids import encode, is_member
 from utils import DATA_DIR
 import random
 
@@ -24,8 +25,10 @@ def exclude_failed_repos(df_evolution_commits: pd.DataFrame, df_evolution_errors
     :param df_evolution_errors: DataFrame containing errors for repositories.
     :return: Filtered DataFrame excluding failed repositories.
     """
-    failed_repos = set(df_evolution_errors["repo_url"].unique())
-    return df_evolution_commits[~df_evolution_commits["repo_url"].isin(failed_repos)]
+    repo_ids = encode(df_evolution_commits["repo_url"], "repo_url")
+    # the failed repos are only looked up (the ones without commits are unknown, i.e., -1, and never members)
+    failed_repo_ids = encode(df_evolution_errors["repo_url"], "repo_url", add=False)
+    return df_evolution_commits[~is_member(repo_ids, failed_repo_ids)]
 
 
 
@@ -0,0 +1,60 @@
+"""
+Columnar store for the metadata of the selected repositories (i.e., `selected_<group>_repos.json`).
+The JSON files are large (mostly because of the `siblings` lists), so they are converted once into a Parquet file
+(one row per repository, with the dates already parsed), from which only the requested columns are read.
+"""
+import json
+from pathlib import Path
+
+import pandas as pd
+
+# key of the store (the `id` of the repositories in the JSON files)
+REPO_URL = "repo_url"
+
+
+def metadata_file(input_file: str | Path) -> Path:
+    """
+    Where the columnar version of a metadata file is stored (next to the JSON file, in Parquet format).
+    :param input_file: the JSON file with the repositories' metadata.
+    :return: the Parquet file path.
+    """
+    input_file = Path(input_file)
+    return input_file.with_name(f"{input_file.stem}_metadata.parquet")
+
+
+def convert_repos_metadata(input_file: str | Path) -> pd.DataFrame:
+    """
+    Read a metadata file and convert it to a flat table.
+    Dates are parsed as UTC timestamps, while nested values (e.g., `siblings`) and columns with values of mixed types
+    (e.g., `gated`, which is either False or a string) are stored as JSON strings.
+    :param input_file: the JSON file with the repositories' metadata.
+    :return: a data frame with one row per repository (the `id` is renamed to `repo_url`).
+    """
+    df_metadata = pd.read_json(input_file)
+    # rename id to 'repo_url' for consistency
+    df_metadata.rename(columns={'id': REPO_URL}, inplace=True)
+    df_metadata['created_at'] = pd.to_datetime(df_metadata['created_at'], utc=True)
+    if pd.api.types.is_numeric_dtype(df_metadata['last_modified']):  # milliseconds since epoch
+        df_metadata['last_modified'] = pd.to_datetime(df_metadata['last_modified'] / 1000, unit='s', utc=True)
+    else:
+        df_metadata['last_modified'] = pd.to_datetime(df_metadata['last_modified'], utc=True)
+    for column in df_metadata.columns[df_metadata.dtypes == object]:
+        is_string = df_metadata[column].dropna().map(lambda v: isinstance(v, str))
+        if not is_string.all():
+            df_metadata[column] = df_metadata[column].map(json.dumps, na_action='ignore')
+    return df_metadata
+
+
+def load_repos_metadata(input_file: str | Path, columns: list[str] = None) -> pd.DataFrame:
+    """
+    Load (some of the columns of) the metadata of the repositories.
+    If the metadata file was not converted yet (or it changed since then), it is converted and saved first.
+    :param input_file: the JSON file with the repositories' metadata.
+    :param columns: (optional) the columns to be read (by default, all of them).
+    :return: a data frame indexed by repo_url.
+    """
+    parquet_file = metadata_file(input_file)
+    if not parquet_file.exists() or parquet_file.stat().st_mtime < Path(input_file).stat().st_mtime:
+        convert_repos_metadata(input_file).to_parquet(parquet_file, index=False)
+    columns = None if columns is None else [REPO_URL] + [c for c in columns if c != REPO_URL]
+    return pd.read_parquet(parquet_file, columns=columns).set_index(REPO_URL)
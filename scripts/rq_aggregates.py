@@ -0,0 +1,182 @@
+"""
+Materialized aggregates of the repositories' evolution data used by RQ1 and RQ2, stored in the SQLite database (see
+model_evolution_db.py):
+- formats_per_month: number of model files per serialization format and commit month.
+- formats_per_creation_month: number of repositories per serialization format first added to them and month of
+  their creation (RQ2FormatsRepoCreation_<group>.csv).
+- commits_by_tool: number of commits adding safetensors files made (or not) by the conversion tool.
+- first_safetensors_adoption: the first commit adding safetensors files to each repository.
+All aggregates are stored per repository, together with a fingerprint of the repository's evolution rows, so when the
+evolution data changes (e.g., after a --retry run) only the repositories whose rows changed are recomputed.
+The totals are then computed in the database.
+"""
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from model_evolution_db import DB_FILE, connect
+
+# message of the commits made by Hugging Face's conversion tool
+BOT_MESSAGE = "Adding `safetensors` variant of this model"
+# formats that are excluded from the format distributions
+UNDETERMINED_FORMATS = ["undetermined", "UNDETERMINED (symbolic link)"]
+# columns of the evolution data that the aggregates depend on (and that are fingerprinted)
+INPUT_COLUMNS = ["repo_url", "commit_hash", "model_file_path", "serialization_format", "message", "author", "date",
+                 "elapsed_days", "change_status", "created_at"]
+AGGREGATES = ["formats_per_month", "formats_per_creation_month", "commits_by_tool", "first_safetensors_adoption"]
+FINGERPRINTS_TABLE = "rq_fingerprints"
+
+
+def repo_fingerprints(df: pd.DataFrame) -> pd.Series:
+    """
+    Compute a fingerprint of the evolution rows of each repository (it does not depend on the order of the rows).
+    :param df: the evolution data (with the INPUT_COLUMNS).
+    :return: a series that maps each repo_url to its fingerprint (as a signed 64-bit integer).
+    """
+    row_hashes = pd.util.hash_pandas_object(df[INPUT_COLUMNS], index=False).to_numpy()
+    codes, repo_urls = pd.factorize(df["repo_url"])
+    fingerprints = np.zeros(len(repo_urls), dtype=np.uint64)
+    np.add.at(fingerprints, codes, row_hashes)  # wraps around (modulo 2^64)
+    return pd.Series(fingerprints.view(np.int64), index=pd.Index(repo_urls, name="repo_url"), name="fingerprint")
+
+
+def _safetensors_additions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Select the rows of the safetensors files added by each commit.
+    :param df: the evolution data.
+    :return: the rows with 'safetensors' serialization format and '+' change status.
+    """
+    return df[(df["serialization_format"] == "safetensors") & (df["change_status"] == "+")]
+
+
+def compute_partials(df: pd.DataFrame) -> dict:
+    """
+    Compute the aggregates of each repository.
+    :param df: the evolution data (with the INPUT_COLUMNS).
+    :return: a dictionary that maps each aggregate name to a data frame with one or more rows per repository.
+    """
+    df_formats = df[~df["serialization_format"].isin(UNDETERMINED_FORMATS)]
+    dates = pd.to_datetime(df_formats["date"], utc=True)
+
+    # model files per format and month of the commit
+    months = dates.dt.strftime("%Y-%m").rename("month")
+    formats_per_month = df_formats.groupby(["repo_url", months, "serialization_format"]).size()
+
+    # first format added to each repository, by month of creation (repositories created before Hugging Face stored
+    # creation dates have a creation date later than their first commit, so the commit date is used instead)
+    created_at = pd.to_datetime(df_formats["created_at"], utc=True)
+    created_at = created_at.where(created_at <= dates, dates)
+    df_added = df_formats.assign(date=dates, created_at=created_at)[df_formats["change_status"] == "+"]
+    df_added = df_added.sort_values("date", kind="stable").drop_duplicates(["repo_url", "created_at"], keep="first")
+    creation_months = df_added["created_at"].dt.tz_localize(None).dt.strftime("%Y-%m").rename("month")
+    formats_per_creation_month = df_added.groupby(["repo_url", creation_months, "serialization_format"]).size()
+
+    # commits adding safetensors files, by whether they were made by the conversion tool
+    df_safetensors = _safetensors_additions(df)
+    df_commits = df_safetensors.assign(by_tool=df_safetensors["message"].str.contains(BOT_MESSAGE, regex=False))
+    commits_by_tool = df_commits.drop_duplicates(["repo_url", "commit_hash", "by_tool"]).groupby(
+        ["repo_url", "by_tool"]).size()
+
+    # first commit adding safetensors files
+    first_adoption = _safetensors_additions(df).sort_values(["elapsed_days", "date"], kind="stable")
+    first_adoption = first_adoption.drop_duplicates("repo_url", keep="first")
+    first_adoption = first_adoption[["repo_url", "elapsed_days", "date", "commit_hash", "author"]].assign(
+        date=pd.to_datetime(first_adoption["date"]).astype(str))
+
+    return {
+        "formats_per_month": formats_per_month.rename("count").reset_index(),
+        "formats_per_creation_month": formats_per_creation_month.rename("count").reset_index(),
+        "commits_by_tool": commits_by_tool.rename("num_commits").reset_index(),
+        "first_safetensors_adoption": first_adoption.reset_index(drop=True),
+    }
+
+
+def _delete_repos(connection: sqlite3.Connection, table: str, group: str, repo_urls: list) -> None:
+    """
+    Delete the rows of some repositories of a group from a table (if it exists).
+    :param connection: the database connection.
+    :param table: the table name.
+    :param group: the group of repositories.
+    :param repo_urls: the repositories whose rows are deleted.
+    """
+    if connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+        connection.executemany(f'DELETE FROM "{table}" WHERE group_type = ? AND repo_url = ?',
+                               [(group, repo_url) for repo_url in repo_urls])
+
+
+def refresh_aggregates(df: pd.DataFrame, group: str, db_file: str | Path = DB_FILE) -> list:
+    """
+    Update the aggregates of a group with the current evolution data.
+    Only the repositories whose fingerprint changed (or that are new) are recomputed, and repositories that are no
+    longer in the data are removed.
+    :param df: the evolution data of the group (with the INPUT_COLUMNS).
+    :param group: the group of repositories ('recent' or 'legacy').
+    :param db_file: the SQLite database file.
+    :return: the repositories that were recomputed or removed.
+    """
+    fingerprints = repo_fingerprints(df)
+    connection = connect(db_file)
+    try:
+        connection.execute(f'CREATE TABLE IF NOT EXISTS "{FINGERPRINTS_TABLE}" '
+                           "(group_type TEXT, repo_url TEXT, fingerprint INTEGER, PRIMARY KEY (group_type, repo_url))")
+        stored = pd.read_sql_query(f'SELECT repo_url, fingerprint FROM "{FINGERPRINTS_TABLE}" WHERE group_type = ?',
+                                   connection, params=(group,)).set_index("repo_url")["fingerprint"]
+        is_stale = fingerprints.ne(stored.reindex(fingerprints.index))
+        stale = fingerprints.index[is_stale].tolist() + stored.index.difference(fingerprints.index).tolist()
+        if not stale:
+            return []
+
+        partials = compute_partials(df[df["repo_url"].isin(stale)])
+        with connection:
+            for table in [FINGERPRINTS_TABLE] + [f"rq_{name}" for name in AGGREGATES]:
+                _delete_repos(connection, table, group, stale)
+            for name, df_partial in partials.items():
+                df_partial.insert(0, "group_type", group)
+                df_partial.to_sql(f"rq_{name}", connection, if_exists="append", index=False)
+                connection.execute(f'CREATE INDEX IF NOT EXISTS "idx_rq_{name}_repo_url" '
+                                   f'ON "rq_{name}" (group_type, repo_url)')
+            connection.executemany(f'INSERT INTO "{FINGERPRINTS_TABLE}" VALUES (?, ?, ?)',
+                                   [(group, repo_url, int(fingerprint))
+                                    for repo_url, fingerprint in fingerprints[is_stale].items()])
+        return stale
+    finally:
+        connection.close()
+
+
+def read_aggregate(name: str, group: str, db_file: str | Path = DB_FILE) -> pd.DataFrame:
+    """
+    Read the totals of an aggregate (computed in the database from the per-repository aggregates).
+    :param name: one of AGGREGATES.
+    :param group: the group of repositories ('recent', 'legacy' or 'both').
+    :param db_file: the SQLite database file.
+    :return: for the format distributions, a data frame with the counts per month (a monthly PeriodIndex) and format
+    (columns); for commits_by_tool, the number of commits and of repositories by whether they were made by the tool;
+    for first_safetensors_adoption, the elapsed days until safetensors was first added to each repository.
+    """
+    if name not in AGGREGATES:
+        raise ValueError(f"Invalid aggregate: {name}")
+    groups = ["recent", "legacy"] if group == "both" else [group]
+    where = f"WHERE group_type IN ({', '.join('?' * len(groups))})"
+    sql = {
+        "formats_per_month": f"SELECT month, serialization_format, SUM(count) AS count FROM rq_formats_per_month "
+                             f"{where} GROUP BY 1, 2",
+        "formats_per_creation_month": f"SELECT month, serialization_format, SUM(count) AS count "
+                                      f"FROM rq_formats_per_creation_month {where} GROUP BY 1, 2",
+        "commits_by_tool": f"SELECT by_tool, SUM(num_commits) AS num_commits, COUNT(DISTINCT repo_url) AS num_repos "
+                           f"FROM rq_commits_by_tool {where} GROUP BY 1 ORDER BY 1",
+        "first_safetensors_adoption": f"SELECT repo_url, MIN(elapsed_days) AS elapsed_days "
+                                      f"FROM rq_first_safetensors_adoption {where} GROUP BY 1 ORDER BY 2, 1",
+    }[name]
+    connection = connect(db_file)
+    try:
+        df = pd.read_sql_query(sql, connection, params=groups)
+    finally:
+        connection.close()
+    if name in ("formats_per_month", "formats_per_creation_month"):
+        df = df.pivot(index="month", columns="serialization_format", values="count").fillna(0).astype(int)
+        df.index = pd.PeriodIndex(df.index, freq="M", name="month")
+    elif name == "commits_by_tool":
+        df["by_tool"] = df["by_tool"].astype(bool)
+    return df
@@ -8,10 +8,11 @@ It applies inclusion / exclusion criteria to select model repositories to includ
 import random
 
 import pandas as pd
-from analyticaml import MODEL_FILE_EXTENSIONS
 from huggingface_hub import HfApi
 from tqdm import tqdm
 
+from http_cache import configure_hf_cache
+from model_files import is_model_extension
 from scripts.utils import load
 from utils import DATA_DIR
 
@@ -27,7 +28,7 @@ def has_model_file(model_files: list) -> bool:
     :param model_files: list of files in the repository.
     :return: True if the repository has at least one model file, False otherwise.
     """
-    return any([file["extension"] in MODEL_FILE_EXTENSIONS for file in model_files])
+    return any(is_model_extension(file["extension"]) for file in model_files)
 
 
 def get_repo_size(repo_id: str) -> int:
@@ -153,6 +154,7 @@ def sample(df: pd.DataFrame, total: int):
 
 
 if __name__ == "__main__":
+    configure_hf_cache()  # the model_info calls are answered from the response cache when possible
     input_file = DATA_DIR / "hf_sort_by_createdAt_top1209240.json.zip"
     out_legacy_models_file = DATA_DIR / "selected_legacy_repos.json"
     out_recent_models_file = DATA_DIR / "selected_recent_repos.json"
@@ -0,0 +1,236 @@
+"""
+Point-in-time index of the model files of each repository, i.e., which model files (and in which serialization
+formats) existed in a repository at a given date.
+The index is a table of validity intervals [start, end) built from the runs of the format timeline of the
+(processed) evolution data (see format_timeline.py). The evolution data only lists the model files in the tree of
+each analyzed commit, so a commit that deletes the last model files of a repository leaves no rows behind; these
+deletions are taken from the commit log (changes with the '-' status), which closes the intervals that would otherwise
+remain open.
+Intervals are sorted by repository and start, and their bounds are kept as integer arrays (nanoseconds since the
+epoch, in UTC), so queries are vectorized comparisons and binary searches rather than scans and group-bys.
+"""
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from commit_logs import NormalizedCommitLog, load_normalized_commit_log
+from format_timeline import to_utc, build_format_timeline
+
+INTERVALS_COLUMNS = ["repo_url", "model_file_path", "serialization_format", "start", "end"]
+# upper bound of the intervals that are still open (i.e., files that exist at the last analyzed commit)
+OPEN_END = np.iinfo(np.int64).max
+
+
+class SnapshotIndex(NamedTuple):
+    """
+    Interval index of the model files:
+    - intervals: one row per validity interval (repo_url, model_file_path, serialization_format, start, end), sorted
+      by repository and start. The end is NaT for files that exist at the last analyzed commit.
+    - repo_urls: the repositories, in the same order as the intervals.
+    - bounds: the intervals of repo_urls[i] are intervals[bounds[i]:bounds[i + 1]].
+    - starts, ends: the interval bounds in nanoseconds since the epoch (OPEN_END for open intervals).
+    """
+    intervals: pd.DataFrame
+    repo_urls: pd.Index
+    bounds: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+
+
+def index_file(input_file: str | Path) -> Path:
+    """
+    Where the intervals of a (processed) evolution file are stored (next to the CSV file, in Parquet format).
+    :param input_file: the CSV file with the evolution data.
+    :return: the Parquet file path.
+    """
+    input_file = Path(input_file)
+    return input_file.with_name(f"{input_file.stem}_snapshots.parquet")
+
+
+def _timestamps_to_ns(timestamps: pd.Series) -> np.ndarray:
+    """
+    Convert UTC timestamps to nanoseconds since the epoch, mapping NaT to OPEN_END.
+    :param timestamps: the timestamps.
+    :return: an int64 array.
+    """
+    ns = pd.DatetimeIndex(timestamps).as_unit("ns").asi8.copy()
+    ns[pd.isna(timestamps).to_numpy()] = OPEN_END
+    return ns
+
+
+def from_intervals(df_intervals: pd.DataFrame) -> SnapshotIndex:
+    """
+    Build the index over a table of intervals.
+    :param df_intervals: a data frame with the INTERVALS_COLUMNS.
+    :return: the snapshot index.
+    """
+    df = df_intervals[INTERVALS_COLUMNS].sort_values(["repo_url", "start", "model_file_path"], kind="stable")
+    df = df.reset_index(drop=True)
+    repo_urls = df["repo_url"].to_numpy()
+    is_first = np.ones(len(df), dtype=bool)
+    is_first[1:] = repo_urls[1:] != repo_urls[:-1]
+    bounds = np.append(np.flatnonzero(is_first), len(df))
+    return SnapshotIndex(df, pd.Index(repo_urls[is_first], name="repo_url"), bounds,
+                         _timestamps_to_ns(df["start"]), _timestamps_to_ns(df["end"]))
+
+
+def model_file_deletions(log: NormalizedCommitLog, repo_urls: list = None) -> pd.DataFrame:
+    """
+    Find the model files deleted by each commit of a commit log.
+    :param log: the normalized commit log.
+    :param repo_urls: (optional) only the deletions of these repositories are returned.
+    :return: a data frame with the repo_url, the model_file_path (as in the evolution data, i.e.,
+    "<repo_url>/<file path>") and the date (in UTC) of each deletion.
+    """
+    changes = log.changes[log.changes["change_status"] == "-"]
+    changes = changes[log.paths["is_model_file"].to_numpy()[changes["path_id"].to_numpy()]]
+    commit_ids = changes["commit_id"].to_numpy()
+    dates = pd.to_datetime(log.commits["date"].astype(str), utc=True, format="ISO8601")
+    df = pd.DataFrame({"repo_url": log.commits["repo_url"].astype(str).to_numpy()[commit_ids],
+                       "path": log.paths["path"].to_numpy()[changes["path_id"].to_numpy()],
+                       "date": dates.iloc[commit_ids].reset_index(drop=True)})
+    if repo_urls is not None:
+        df = df[df["repo_url"].isin(repo_urls)]
+    return pd.DataFrame({"repo_url": df["repo_url"], "model_file_path": df["repo_url"] + "/" + df["path"],
+                         "date": df["date"]}).reset_index(drop=True)
+
+
+def build_snapshot_index(df_evolution: pd.DataFrame, log: NormalizedCommitLog = None) -> SnapshotIndex:
+    """
+    Build the snapshot index of the evolution data.
+    :param df_evolution: the evolution data (e.g., repositories_evolution_<group>_commits_processed.csv).
+    :param log: (optional) the normalized commit log of the same repositories, used to close the intervals of the
+    model files deleted by commits that are not in the evolution data.
+    :return: the snapshot index.
+    """
+    runs = build_format_timeline(df_evolution).runs
+    df = runs[INTERVALS_COLUMNS].copy()
+    if log is not None and not df.empty:
+        # the first deletion of the same file after the start of the interval (if any) ends it
+        df_deletions = model_file_deletions(log, runs["repo_url"].unique())
+        df_deletions = df_deletions.rename(columns={"date": "deleted_at"}).sort_values("deleted_at", kind="stable")
+        df = df.reset_index(names="position").sort_values("start", kind="stable")
+        df = pd.merge_asof(df, df_deletions[["model_file_path", "deleted_at"]], left_on="start",
+                           right_on="deleted_at", by="model_file_path", direction="forward",
+                           allow_exact_matches=False)
+        is_deleted = df["deleted_at"].notna() & (df["end"].isna() | (df["deleted_at"] < df["end"]))
+        df["end"] = df["end"].mask(is_deleted, df["deleted_at"])
+        df = df.sort_values("position").drop(columns=["position", "deleted_at"])
+    return from_intervals(df)
+
+
+def load_snapshot_index(input_file: str | Path, commit_log_file: str | Path = None) -> SnapshotIndex:
+    """
+    Load the snapshot index of an evolution file.
+    If it was not built yet (or the input files changed since then), it is built and saved first.
+    :param input_file: the CSV file with the evolution data.
+    :param commit_log_file: (optional) the CSV file with the commit log of the same repositories.
+    :return: the snapshot index.
+    """
+    out_file = index_file(input_file)
+    sources = [Path(f) for f in (input_file, commit_log_file) if f is not None]
+    if not out_file.exists() or any(out_file.stat().st_mtime < f.stat().st_mtime for f in sources):
+        log = load_normalized_commit_log(commit_log_file) if commit_log_file is not None else None
+        index = build_snapshot_index(pd.read_csv(input_file), log)
+        index.intervals.to_parquet(out_file, index=False)
+        return index
+    return from_intervals(pd.read_parquet(out_file))
+
+
+def _repo_positions(index: SnapshotIndex, repo_urls: list = None) -> np.ndarray | slice:
+    """
+    Find the positions of the intervals of some repositories.
+    :param index: the snapshot index.
+    :param repo_urls: the repositories (None for all of them).
+    :return: the positions (or a slice over all intervals).
+    """
+    if repo_urls is None:
+        return slice(None)
+    ids = index.repo_urls.get_indexer(pd.Index(repo_urls).unique())
+    ids = ids[ids >= 0]
+    starts, ends = index.bounds[ids], index.bounds[ids + 1]
+    lengths = ends - starts
+    return np.repeat(starts, lengths) + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+
+def snapshot_at(index: SnapshotIndex, date: str | pd.Timestamp, repo_urls: list = None) -> pd.DataFrame:
+    """
+    Find the model files that existed at a given date.
+    :param index: the snapshot index.
+    :param date: the date (naive dates are assumed to be in UTC).
+    :param repo_urls: (optional) only the model files of these repositories are returned.
+    :return: the intervals that contain the date (at most one per model file).
+    """
+    t = to_utc(date).as_unit("ns").value
+    positions = _repo_positions(index, repo_urls)
+    starts, ends = index.starts[positions], index.ends[positions]
+    rows = np.flatnonzero((starts <= t) & (t < ends))
+    if not isinstance(positions, slice):
+        rows = positions[rows]
+    return index.intervals.iloc[rows]
+
+
+def snapshot_between(index: SnapshotIndex, start: str | pd.Timestamp, end: str | pd.Timestamp,
+                     repo_urls: list = None) -> pd.DataFrame:
+    """
+    Find the model files that existed at any time in a period.
+    :param index: the snapshot index.
+    :param start: the start of the period (inclusive).
+    :param end: the end of the period (exclusive).
+    :param repo_urls: (optional) only the model files of these repositories are returned.
+    :return: the intervals that overlap the period.
+    """
+    t0, t1 = to_utc(start).as_unit("ns").value, to_utc(end).as_unit("ns").value
+    positions = _repo_positions(index, repo_urls)
+    starts, ends = index.starts[positions], index.ends[positions]
+    rows = np.flatnonzero((starts < t1) & (t0 < ends))
+    if not isinstance(positions, slice):
+        rows = positions[rows]
+    return index.intervals.iloc[rows]
+
+
+def count_at(index: SnapshotIndex, dates: pd.DatetimeIndex | list, by: str = "serialization_format",
+             unique: str = None) -> pd.DataFrame:
+    """
+    Count the model files (or repositories) that existed at each of several dates.
+    For each group, the number of intervals that contain a date is the number of intervals that started up to that
+    date minus the number of those that ended up to that date, so all dates are answered with two binary searches.
+    :param index: the snapshot index.
+    :param dates: the dates (naive dates are assumed to be in UTC).
+    :param by: the column of the intervals to group by (e.g., 'serialization_format' or 'repo_url').
+    :param unique: (optional) count distinct values of this column (e.g., 'repo_url' for the number of repositories
+    with at least one file of each format) instead of intervals.
+    :return: a data frame indexed by date with one column per group.
+    """
+    dates = pd.DatetimeIndex([to_utc(d) for d in dates], name="date")
+    t = dates.as_unit("ns").asi8
+    df = index.intervals
+    starts, ends = index.starts, index.ends
+    if unique is not None:
+        # merge the overlapping intervals of each (group, unique) pair, so each pair is counted once per date
+        keys = pd.MultiIndex.from_arrays([df[by], df[unique]])
+        order = np.lexsort((starts, keys.codes[1], keys.codes[0]))
+        codes = (keys.codes[0].astype(np.int64) << 32) | keys.codes[1]
+        codes, starts, ends = codes[order], starts[order], ends[order]
+        groups = df[by].to_numpy()[order]
+        is_new_pair = np.ones(len(codes), dtype=bool)
+        is_new_pair[1:] = codes[1:] != codes[:-1]
+        # intervals of a pair overlap when one starts before the largest end of the previous ones
+        max_ends = pd.Series(ends).groupby(np.cumsum(is_new_pair)).cummax().to_numpy()
+        is_new_block = is_new_pair.copy()
+        is_new_block[1:] |= starts[1:] >= max_ends[:-1]
+        block_ids = np.cumsum(is_new_block)
+        starts, groups = starts[is_new_block], groups[is_new_block]
+        ends = pd.Series(ends).groupby(block_ids).max().to_numpy()
+    else:
+        groups = df[by].to_numpy()
+
+    codes, uniques = pd.factorize(groups, sort=True)
+    counts = np.zeros((len(t), len(uniques)), dtype=np.int64)
+    for k in range(len(uniques)):
+        is_group = codes == k
+        counts[:, k] = (np.searchsorted(np.sort(starts[is_group]), t, "right")
+                        - np.searchsorted(np.sort(ends[is_group]), t, "right"))
+    return pd.DataFrame(counts, index=dates, columns=pd.Index(uniques, name=by))
@@ -1,15 +1,11 @@
-import json
 import sys
 
+from so_collector import iter_items
 
-def count_entries(filename):
-    # Load the data from the JSON file
-    with open(filename, 'r', encoding='utf-8') as f:
-        data = json.load(f)
 
-    # Count the number of items in the 'items' list
-    count = len(data.get('items', []))
-    return count
+def count_entries(filename):
+    # Count the items of the file (NDJSON files are streamed, legacy JSON files have an 'items' list)
+    return sum(1 for _ in iter_items(filename))
 
 
 if __name__ == "__main__":
@@ -1,29 +1,27 @@
-import json
 import sys
+
+from so_collector import item_key, iter_items, rewrite_items
+
+
 def remove_duplicates(filename):
-    # Load the data from the JSON file
-    with open(filename, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Extract items and initialize structures for tracking duplicates
-    items = data.get('items', [])
+    # Initialize structures for tracking duplicates
     seen_ids = set()
-    unique_items = []
     duplicate_count = 0
-    
-    # Iterate over items to check for duplicates
-    for item in items:
-        item_id = item.get('question_id') or item.get('answer_id')
-        if item_id in seen_ids:
-            duplicate_count += 1
-        else:
-            seen_ids.add(item_id)
-            unique_items.append(item)
-    
-    # Save the unique items back to the JSON file
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump({'items': unique_items}, f, ensure_ascii=False, indent=4)
-    
+
+    # Stream the items (NDJSON files are not loaded whole) and keep the first item of each id
+    def unique_items():
+        nonlocal duplicate_count
+        for item in iter_items(filename):
+            item_id = item_key(item)
+            if item_id in seen_ids:
+                duplicate_count += 1
+            else:
+                seen_ids.add(item_id)
+                yield item
+
+    # Save the unique items back to the file (in the same format)
+    rewrite_items(filename, unique_items())
+
     return duplicate_count
 
 if __name__ == "__main__":
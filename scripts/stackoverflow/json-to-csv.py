@@ -1,13 +1,12 @@
 import csv
 import json
+import os
 import sys
 
+from so_collector import iter_items
 
-def convert_json_to_csv(json_file, csv_file):
-    # Open and load the JSON file
-    with open(json_file, 'r') as f:
-        data = json.load(f)
 
+def convert_json_to_csv(json_file, csv_file):
     # Open the CSV file for writing
     with open(csv_file, 'w', encoding='utf-8') as f:
         writer = csv.writer(f)
@@ -15,8 +14,8 @@ def convert_json_to_csv(json_file, csv_file):
         # Write the header row
         writer.writerow(['title', 'source', 'url', 'json_content'])
 
-        # Iterate over items in the JSON
-        for item in data.get("items", []):
+        # Iterate over items in the JSON (NDJSON files are streamed)
+        for item in iter_items(json_file):
             title = item.get('title', 'N/A')
             question_id = item.get('question_id', 'N/A')
             url = f"https://stackoverflow.com/questions/{question_id}"
@@ -33,6 +32,6 @@ if __name__ == "__main__":
         sys.exit(1)
 
     json_file = sys.argv[1]
-    output_file = json_file.replace('.json', '.csv')
+    output_file = os.path.splitext(json_file)[0] + '.csv'
     # Convert .json to .csv
     convert_json_to_csv(json_file, output_file)
@@ -1,42 +1,13 @@
-import requests
-import json
+import os
 import sys
 
-# This script collects questions or answers from Stack Overflow that contain the words "safetensor" or "safe tensor" or "safetensors".
-def search_questions(query):
-    url = "https://api.stackexchange.com/2.2/search/excerpts"
-    params = {
-        "order": "desc",
-        "sort": "activity",
-        "pagesize": 100,
-        "q": query,
-        "site": "stackoverflow",
-    }
-    all_items = []
-    page = 1
-
-    while True:
-        params['page'] = page  # Set page parameter to the current page
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-
-        data = response.json()
-        all_items.extend(data.get('items', []))
-
-        # Break out of the loop if there are no more items to fetch
-        if not data.get('has_more', False):
-            break
-
-        page += 1  # Increment the page number for the next iteration
-
-    return all_items
+from dotenv import load_dotenv
 
+from so_collector import QUERIES, NdjsonWriter, StackExchangeClient, iter_search, unique_items
 
-def write_to_json(data, filename):
-    # Save the data to the file, overwriting any existing content
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump({'items': data}, f, ensure_ascii=False, indent=4)
-
+# This script collects questions or answers from Stack Overflow that contain the words "safetensor" or "safe tensor" or "safetensors".
+# The queries run concurrently (see so_collector.py) and the items are written as NDJSON, without duplicates,
+# as they arrive.
 
 
 if __name__ == "__main__":
@@ -45,20 +16,13 @@ if __name__ == "__main__":
         print("Usage: python parse-SO.py <output-filename>")
         sys.exit(1)
 
+    load_dotenv()
+    client = StackExchangeClient(key=os.getenv("STACKEXCHANGE_KEY"))  # the key raises the daily quota
 
-    all_items = []
-
-    query1 = "safetensor"
-    items1 = search_questions(query1)
-    all_items.extend(items1)
-
-    query2 = "safe tensor"
-    items2 = search_questions(query2)
-    all_items.extend(items2)
-
-    query3 = "safetensors"
-    items3 = search_questions(query3)
-    all_items.extend(items3)
+    with NdjsonWriter(sys.argv[1]) as writer:
+        for item in unique_items(iter_search(client, QUERIES)):
+            writer.write(item)
 
-    write_to_json(all_items, sys.argv[1])
-    print("# of questions or answers in SO that contain the queries =", len(all_items))
+    print("# of questions or answers in SO that contain the queries =", writer.count)
+    if client.quota_remaining is not None:
+        print("Remaining quota:", client.quota_remaining)
@@ -0,0 +1,268 @@
+"""
+Concurrent collection of Stack Overflow search results, and streaming of the collected items.
+The search queries are run concurrently (each one page by page), under the throttles of the Stack Exchange API: the
+`backoff` field of a response (the number of seconds to wait before the next request to the same method) holds back
+all queries, and the collection stops when the daily quota (`quota_remaining`) is exhausted. The items are
+deduplicated as they arrive and written as NDJSON (one item per line), so they can be processed without loading the
+whole file. The readers also support the legacy files (a JSON object with an `items` list).
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+import requests
+
+from http_cache import get_session
+
+SEARCH_URL = "https://api.stackexchange.com/2.2/search/excerpts"
+QUERIES = ["safetensor", "safe tensor", "safetensors"]
+PAGE_SIZE = 100
+# error of the API when a throttle is violated (e.g., "too many requests from this IP, more requests available in
+# 1234 seconds")
+THROTTLE_VIOLATION = 502
+
+
+class StackExchangeClient:
+    """
+    Client of the excerpt search, shared by several threads. The requests of all threads wait for the backoff of the
+    latest response, and no request is sent once the quota is exhausted.
+    """
+
+    def __init__(self, key: str = None, site: str = "stackoverflow", url: str = SEARCH_URL,
+                 session: requests.Session = None, max_retries: int = 5, max_wait: float = 300):
+        """
+        :param key: the API key (which raises the daily quota from 300 to 10,000 requests).
+        :param site: the Stack Exchange site.
+        :param url: the URL of the search (or of a local stand-in).
+        :param session: the HTTP session (by default, the one of the response cache; see http_cache.py).
+        :param max_retries: how many times a throttled request is retried.
+        :param max_wait: the longest wait for a throttle (longer ones mean that the quota is exhausted).
+        """
+        self.params = {"site": site, **({"key": key} if key else {})}
+        self.url = url
+        self.session = session or get_session()
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.next_request = 0.0  # when the next request may be sent (in seconds since the epoch)
+        self.quota_remaining = None
+        self.lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        """
+        :return: whether the daily quota is exhausted.
+        """
+        return self.quota_remaining is not None and self.quota_remaining <= 0
+
+    def _hold_back(self, delay: float) -> None:
+        """
+        Hold back all requests for a delay.
+        :param delay: the delay in seconds.
+        """
+        with self.lock:
+            self.next_request = max(self.next_request, time.time() + delay)
+
+    def _wait(self) -> None:
+        """
+        Wait until requests may be sent again.
+        """
+        with self.lock:
+            delay = self.next_request - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def search(self, query: str, page: int = 1, page_size: int = PAGE_SIZE) -> dict | None:
+        """
+        Fetch a page of search results, waiting for the backoff of the API.
+        :param query: the search query.
+        :param page: the page number (starting at 1).
+        :param page_size: the number of items per page.
+        :return: the response (with the items and has_more keys), or None if the quota is exhausted.
+        """
+        params = {**self.params, "order": "desc", "sort": "activity", "pagesize": page_size, "q": query,
+                  "page": page}
+        for attempt in range(self.max_retries + 1):
+            self._wait()
+            if self.exhausted:
+                return None
+            response = self.session.get(self.url, params=params)
+            data = response.json()
+            if data.get("error_id") == THROTTLE_VIOLATION and attempt < self.max_retries:
+                match = re.search(r"available in (\d+) seconds", data.get("error_message", ""))
+                delay = int(match.group(1)) if match else 2 ** attempt
+                if delay > self.max_wait:
+                    with self.lock:
+                        self.quota_remaining = 0
+                    return None
+                print(f"Throttled. Sleeping for {delay} seconds.")
+                self._hold_back(delay)
+                continue
+            response.raise_for_status()
+            # the backoff and quota of a cached response are out of date
+            if not getattr(response, "from_cache", False):
+                self._hold_back(data.get("backoff", 0))
+                with self.lock:
+                    # concurrent responses may arrive out of order, and the quota only decreases (within a day)
+                    quota = data.get("quota_remaining", self.quota_remaining)
+                    if quota is not None and self.quota_remaining is not None:
+                        quota = min(quota, self.quota_remaining)
+                    self.quota_remaining = quota
+            return data
+
+
+def iter_search(client: StackExchangeClient, queries: Iterable[str], page_size: int = PAGE_SIZE) -> Iterator[dict]:
+    """
+    Run search queries concurrently, each one page by page until there are no more results (or the quota is
+    exhausted).
+    :param client: the Stack Exchange client.
+    :param queries: the search queries.
+    :param page_size: the number of items per page.
+    :return: an iterator over the items of all queries, in the order their pages arrive (with duplicates).
+    """
+    queries = list(queries)
+    pages, stop = queue.Queue(), threading.Event()
+
+    def search_query(query):
+        try:
+            page = 1
+            while not stop.is_set():
+                data = client.search(query, page, page_size)
+                if data is None:
+                    print(f"WARNING: the quota is exhausted, the results of '{query}' are incomplete")
+                    break
+                pages.put(data.get("items", []))
+                if not data.get("has_more", False):
+                    break
+                page += 1
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(None)  # the query is done
+
+    with ThreadPoolExecutor(len(queries) or 1) as executor:
+        for query in queries:
+            executor.submit(search_query, query)
+        try:
+            running = len(queries)
+            while running:
+                items = pages.get()
+                if items is None:
+                    running -= 1
+                elif isinstance(items, Exception):
+                    raise items
+                else:
+                    yield from items
+        finally:
+            stop.set()  # the other queries stop after their current page
+
+
+def item_key(item: dict):
+    """
+    The key of an item for deduplication (as in dupcheck-json.py: the question of an item, or the answer if it has no
+    question).
+    :param item: the item.
+    :return: the key.
+    """
+    return item.get("question_id") or item.get("answer_id")
+
+
+def unique_items(items: Iterable[dict]) -> Iterator[dict]:
+    """
+    Drop the duplicates of items as they stream in.
+    :param items: the items.
+    :return: an iterator over the first item of each key (see item_key).
+    """
+    seen = set()
+    for item in items:
+        key = item_key(item)
+        if key not in seen:
+            seen.add(key)
+            yield item
+
+
+class NdjsonWriter:
+    """
+    Writes items as NDJSON (one JSON object per line), flushing each item, so an interrupted collection keeps the
+    items written so far.
+    """
+
+    def __init__(self, output_file: str):
+        """
+        :param output_file: the NDJSON file (overwritten).
+        """
+        self.file = open(output_file, "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, item: dict) -> None:
+        """
+        Append an item to the file.
+        :param item: the item (serializable to JSON).
+        """
+        self.file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_ndjson(filename: str) -> bool:
+    """
+    Check whether a file of items is NDJSON or a legacy JSON object with an `items` list.
+    :param filename: the file.
+    :return: True if the file is NDJSON (an empty file is NDJSON as well).
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        first_line = next((line for line in f if line.strip()), "")
+    if not first_line:
+        return True
+    try:
+        first = json.loads(first_line)
+    except json.JSONDecodeError:  # the first line of an indented JSON object
+        return False
+    return not (isinstance(first, dict) and list(first) == ["items"] and isinstance(first["items"], list))
+
+
+def iter_items(filename: str) -> Iterator[dict]:
+    """
+    Iterate over the items of a file, streaming NDJSON files (legacy JSON files are loaded whole).
+    :param filename: the NDJSON or legacy JSON file.
+    :return: an iterator over the items.
+    """
+    if not is_ndjson(filename):
+        with open(filename, "r", encoding="utf-8") as f:
+            yield from json.load(f).get("items", [])
+        return
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def rewrite_items(filename: str, items: Iterable[dict]) -> None:
+    """
+    Replace the items of a file, keeping its format (the file is replaced once all items are written, so the items
+    may be read from the same file).
+    :param filename: the NDJSON or legacy JSON file.
+    :param items: the new items.
+    """
+    tmp_file = f"{filename}.tmp"
+    if is_ndjson(filename):
+        with NdjsonWriter(tmp_file) as writer:
+            for item in items:
+                writer.write(item)
+    else:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"items": list(items)}, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_file, filename)
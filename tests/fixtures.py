@@ -0,0 +1,89 @@
+"""
+Data builders shared by several test modules (and by benchmarks/bench_parse_discussion_page.py).
+"""
+import html
+import json
+import random
+
+import pandas as pd
+
+# text snippets used in the generated discussions (with characters that must be escaped in attributes)
+SNIPPETS = ["Adding `safetensors` variant of this model", 'the "pickle" format', "it's <b>unsafe</b>", "a > b & c",
+            "déjà vu ✅", "data-target=\"DiscussionEvents\"", "line\nbreak", "<div class='x'>",
+            "İstanbul ǅ ẞ"]  # characters whose lowercase has another length
+# comments, raw text elements and other markup that html.parser does not parse as tags (a page may contain several)
+RAW_TEXT_PARTS = ["<!-- " + "x" * 200 + " -->", "İ" * 60, "<!-- <script>var a = 1; -->",
+                  "<script>var s = '<!-- not a comment';</script>", "<SCRIPT type='module'>x = '<div>'</SCRIPT >",
+                  "<style>.a::before { content: '<p>' }</style>", '<span title="<!--">x</span>',
+                  "<![CDATA[ <script> ]]>", "<!--> not a comment -->"]
+
+
+def discussion_page(n: int) -> str:
+    events = html.escape(f'{{"discussion": {{"num": {n}, "events": []}}}}', quote=True)
+    header = html.escape(f'{{"discussion": {{"num": {n}, "status": "open"}}}}', quote=True)
+    return (f'<html><body><div class="SVELTE_HYDRATER contents" data-target="DiscussionEvents" '
+            f'data-props="{events}"></div><div class="SVELTE_HYDRATER contents" data-target="DiscussionHeader" '
+            f'data-props="{header}"></div></body></html>')
+
+
+def random_props(rng: random.Random, n: int) -> str:
+    events = [{"id": f"{rng.getrandbits(64):x}", "type": "comment", "author": {"name": f"user{rng.randint(0, 99)}"},
+               "data": {"latest": {"raw": " ".join(rng.choices(SNIPPETS, k=rng.randint(1, 20)))}}}
+              for _ in range(rng.randint(0, 8))]
+    return json.dumps({"discussion": {"num": n, "status": rng.choice(["open", "merged", "closed"]),
+                                      "title": rng.choice(SNIPPETS), "events": events}}, ensure_ascii=rng.random() < .5)
+
+
+def hydrater_div(rng: random.Random, target: str, props: str, css_class: str = "SVELTE_HYDRATER contents") -> str:
+    quote = rng.choice(['"', "'"])
+    attributes = [f'class="{css_class}"', f'data-target="{target}"',
+                  f'data-props={quote}{html.escape(props, quote=True)}{quote}']
+    rng.shuffle(attributes)
+    tag = rng.choice(["div", "DIV"])
+    return f"<{tag} {' '.join(attributes)}></{tag}>"
+
+
+def random_discussion_page(rng: random.Random, n: int) -> str:
+    """
+    A page with the layout of a discussion page (boilerplate markup, the hydrater divs of other components and the
+    DiscussionEvents/DiscussionHeader divs), with random variations: missing, duplicated or decoy elements, attribute
+    order, quoting and case.
+    """
+    parts = [f'<nav><a href="/models/org/m{i}">org/m{i}</a></nav><div class="flex">{rng.choice(SNIPPETS)}</div>'
+             for i in range(rng.randint(10, 200))]
+    parts.append(hydrater_div(rng, "UserMenu", random_props(rng, n)))
+    for target in rng.sample(["DiscussionEvents", "DiscussionHeader"], 2):
+        if rng.random() < .2:  # a decoy with another class
+            parts.append(hydrater_div(rng, target, random_props(rng, n), css_class="SVELTE_HYDRATER"))
+        if rng.random() < .9:
+            parts.append(hydrater_div(rng, target, random_props(rng, n)))
+        if rng.random() < .2:  # a duplicate (only the first one is used)
+            parts.append(hydrater_div(rng, target, random_props(rng, n)))
+    if rng.random() < .3:
+        parts.extend(rng.choices(RAW_TEXT_PARTS, k=rng.randint(1, 2)))
+    if rng.random() < .2:  # the data-target mentioned in text
+        parts.append(f'<p>{html.escape("data-target=DiscussionHeader ")}</p><pre>data-target=DiscussionEvents </pre>')
+    rng.shuffle(parts)
+    return f"<!DOCTYPE html><html><head><title>Discussion #{n}</title></head><body>{''.join(parts)}</body></html>"
+
+
+def discussion_corpus(size: int = 200, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    return [random_discussion_page(rng, n) for n in range(size)]
+
+
+# (commit_hash, date, model files in the tree as (path, format, is_in_commit))
+COMMITS = [
+    ("c1", "2022-01-01 10:00:00+00:00", [("model.bin", "pickle", True)]),
+    ("c2", "2022-06-01 10:00:00+00:00", [("model.bin", "pickle", False), ("tf_model.h5", "h5/hdf5", True)]),
+    ("c3", "2022-10-01 10:00:00+02:00", [("model.bin", "pickle", False), ("model.safetensors", "safetensors", True)]),
+    ("c4", "2023-01-01 10:00:00+00:00", [("model.safetensors", "safetensors", True)]),
+    ("c5", "2023-02-01 10:00:00+00:00", [("model.bin", "pickle", True), ("model.safetensors", "safetensors", False)]),
+]
+
+
+def evolution_data(repo_url="org/model"):
+    return pd.DataFrame([{"repo_url": repo_url, "commit_hash": commit_hash, "model_file_path": f"{repo_url}/{path}",
+                          "serialization_format": serialization_format, "message": "update", "author": "dev",
+                          "date": date, "is_in_commit": is_in_commit}
+                         for commit_hash, date, files in COMMITS for path, serialization_format, is_in_commit in files])
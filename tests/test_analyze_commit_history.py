@@ -1,9 +1,15 @@
+import tempfile
 import unittest
 
 import pandas as pd
 
-from scripts.analyze_commit_history import filter_by_extension
-from scripts.analyze_commit_history import is_model_file
+from scripts.commit_logs import has_model_files_in_tree
+from scripts.commit_logs import load_normalized_commit_log
+from scripts.commit_logs import touches_model_files
+from scripts.key_ids import encode
+from scripts.key_ids import is_member
+from scripts.model_files import filter_by_extension
+from scripts.model_files import is_model_file
 from scripts.utils import DATA_DIR
 
 
@@ -29,21 +35,23 @@ class TestAnalyzeCommitHistory(unittest.TestCase):
     def test_commits_completeness(self):
         group = "recent"
         # load up data
-        df_commits = pd.read_csv(DATA_DIR / f"selected_{group}_commits.csv").fillna("")
+        commit_log = load_normalized_commit_log(DATA_DIR / f"selected_{group}_commits.csv")
         df_evolution_commits = pd.read_csv(DATA_DIR / f"repositories_evolution_{group}_commits.csv")
         df_evolution_errors = pd.read_csv(DATA_DIR / f"repositories_evolution_{group}_errors.csv")
-        ## Get repos that failed
-        failed_repos = df_evolution_errors["repo_url"].unique()
-        ## Identify the commits that have at least one model file
-        df_commits = df_commits[df_commits["changed_files"].apply(lambda x: filter_by_extension(x))]
-        ## Identify the commits that have at least one model file in all_files_in_tree, which is a semicolon-separated string
-        df_commits = df_commits[df_commits["all_files_in_tree"].apply(lambda x: filter_by_extension(x))]
-        ## Exclude from df_commits the failed repos
-        df_commits = df_commits[~df_commits["repo_url"].isin(failed_repos)]
-
-        ## Check if all commits in df_commits are present in df_evolution_commits
-        self.assertTrue(df_commits["commit_hash"].isin(df_evolution_commits["commit_hash"]).all(),
-                        "Not all commits in df_commits are present in df_evolution_commits")
+        # the ids are only needed by this test, so their dictionaries are not saved to the data directory
+        with tempfile.TemporaryDirectory() as keys_dir:
+            ## Identify the commits that have at least one model file (changed and in all_files_in_tree)
+            df_commits = commit_log.commits[touches_model_files(commit_log) & has_model_files_in_tree(commit_log)]
+            ## Exclude from df_commits the failed repos
+            repo_ids = encode(df_commits["repo_url"], "repo_url", keys_dir)
+            failed_repo_ids = encode(df_evolution_errors["repo_url"], "repo_url", keys_dir, add=False)
+            df_commits = df_commits[~is_member(repo_ids, failed_repo_ids)]
+
+            ## Check if all commits in df_commits are present in df_evolution_commits
+            self.assertTrue(is_member(encode(df_commits["commit_hash"], "commit_hash", keys_dir),
+                                      encode(df_evolution_commits["commit_hash"], "commit_hash", keys_dir,
+                                             add=False)).all(),
+                            "Not all commits in df_commits are present in df_evolution_commits")
 
     def test_model_files_detection(self):
         # Test with a string of changed files
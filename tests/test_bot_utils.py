@@ -0,0 +1,116 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.bot.bot_utils import iter_discussions_metadata
+from scripts.bot.bot_utils import parse_discussion_page
+from scripts.bot.bot_utils import parse_discussion_page_soup
+from tests.fixtures import discussion_corpus
+from tests.fixtures import discussion_page
+
+
+class TestParseDiscussionPage(unittest.TestCase):
+    def test_corpus_equivalence(self):
+        corpus = discussion_corpus()
+        for page in corpus:
+            self.assertEqual(parse_discussion_page_soup(page), parse_discussion_page(page))
+        # the corpus covers pages with and without each element
+        results = [parse_discussion_page(page) for page in corpus]
+        self.assertTrue(any(events is None for events, _ in results) and any(header for _, header in results))
+
+    def test_edge_cases(self):
+        pages = ['<div class="SVELTE_HYDRATER contents" data-target="DiscussionHeader" data-props></div>',
+                 '<div class="SVELTE_HYDRATER contents" data-target=DiscussionHeader data-props=a&amp;b></div>',
+                 '<div class="SVELTE_HYDRATER contents" data-props="x < y" data-target="DiscussionEvents"></div>',
+                 '<div class="SVELTE_HYDRATER  contents" data-target="DiscussionEvents" data-props="1" data-props="2">',
+                 '<!-- <div class="SVELTE_HYDRATER contents" data-target="DiscussionHeader" data-props="1"> -->',
+                 '<script>x = \'<div class="SVELTE_HYDRATER contents" data-target="DiscussionHeader">\'</script>'
+                 '<div class="SVELTE_HYDRATER contents" data-target="DiscussionHeader" data-props="2">',
+                 "<p>no discussion here</p>", ""]
+        # comments, scripts and markup that end or hide the raw text elsewhere than a plain search would
+        divs = ('<div class="SVELTE_HYDRATER contents" data-target="DiscussionEvents" data-props="E"></div>'
+                '<div class="SVELTE_HYDRATER contents" data-target="DiscussionHeader" data-props="H"></div>')
+        pages += [prefix + divs for prefix in ["İ" * 60 + "<!--" + "x" * 100 + "-->",
+                                               "İ" * 60 + "<script>" + "x" * 100 + "</script>",
+                                               "<!-- <script> -->", "<!-- <style> --!>", '<a title="<!--">x</a>',
+                                               "<![CDATA[ <script> ]]>", "<!--> ", "<script>x</script >",
+                                               "<script>x</scripts>"]]
+        pages.append("<SCRIPT>" + divs + "</SCRIPT>")
+        for page in pages:
+            self.assertEqual(parse_discussion_page_soup(page), parse_discussion_page(page))
+
+
+class DiscussionsHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the discussion pages: /ok/<n> is a page, /flaky/<n> is rate limited on the first request,
+    /error is a server error and anything else is not found.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive connections
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] = server.requests.get(self.path, 0) + 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            num_requests = server.requests[self.path]
+        time.sleep(0.02)
+        if self.path.startswith("/ok/") or (self.path.startswith("/flaky/") and num_requests > 1):
+            status, body = 200, discussion_page(int(self.path.split("/")[-1]))
+        elif self.path.startswith("/flaky/"):
+            status, body = 429, "Too Many Requests"
+        elif self.path == "/error":
+            status, body = 500, "Internal Server Error"
+        else:
+            status, body = 404, "Not Found"
+        with server.lock:
+            server.in_flight -= 1
+        body = body.encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestFetchDiscussionsMetadata(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), DiscussionsHandler)
+        self.server.lock, self.server.requests, self.server.in_flight, self.server.max_in_flight = \
+            threading.Lock(), {}, 0, 0
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fetch(self):
+        urls = [f"{self.base_url}/ok/{n}" for n in range(20)] + [f"{self.base_url}/flaky/1", f"{self.base_url}/error",
+                                                                  f"{self.base_url}/missing"]
+        results = {url: (events, header) for url, events, header in
+                   iter_discussions_metadata(iter(urls), concurrency=4, rate=None, max_retries=2, backoff=0.01)}
+        self.assertEqual(set(urls), set(results))
+        self.assertLessEqual(self.server.max_in_flight, 4)
+        for n in range(20):
+            self.assertEqual(parse_discussion_page(discussion_page(n)), results[f"{self.base_url}/ok/{n}"])
+        self.assertEqual('{"discussion": {"num": 1, "status": "open"}}', results[f"{self.base_url}/flaky/1"][1])
+        self.assertEqual(2, self.server.requests["/flaky/1"])
+        self.assertEqual(("HTTP Error (status code: 500)",) * 2, results[f"{self.base_url}/error"])
+        self.assertEqual(3, self.server.requests["/error"])
+        self.assertEqual(("HTTP Error (status code: 404)",) * 2, results[f"{self.base_url}/missing"])
+        self.assertEqual(1, self.server.requests["/missing"])
+
+    def test_rate_limit(self):
+        start = time.monotonic()
+        results = list(iter_discussions_metadata([f"{self.base_url}/ok/{n}" for n in range(6)], concurrency=6,
+                                                 rate=20))
+        self.assertEqual(6, len(results))
+        # the requests to the same host start at least 1/20 s apart
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 20)
@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from analyticaml import MODEL_FILE_EXTENSIONS
+
+from scripts.commit_logs import CHANGE_STATUSES
+from scripts.commit_logs import COMMITS_COLUMNS
+from scripts.commit_logs import has_model_files_in_tree
+from scripts.commit_logs import iter_repository_commits
+from scripts.commit_logs import load_normalized_commit_log
+from scripts.commit_logs import normalize_commit_log
+from scripts.commit_logs import normalized_files
+from scripts.commit_logs import touches_model_files
+
+EXTENSION = sorted(MODEL_FILE_EXTENSIONS)[0]
+MODEL, SUB_MODEL, WEIGHTS = f"model.{EXTENSION}", f"sub/model.{EXTENSION}", f"weights/model.{EXTENSION}"
+# (repo_url, commit_hash, message, changed_files, all_files_in_tree), with every change status
+NORMALIZED_COMMITS = [
+    ("org/a", "h0", "init", f"+ {MODEL};+ README.md", f"{MODEL};README.md"),
+    ("org/a", "h1", "docs", "* README.md", f"{MODEL};README.md"),
+    ("org/a", "h2", None, f"- {MODEL};= config.json", "README.md;config.json"),
+    ("org/b", "h3", "move", f"> {SUB_MODEL};< {WEIGHTS}", f"{SUB_MODEL};{WEIGHTS}"),
+    ("org/b", "h4", "empty", None, None),
+]
+
+
+def write_commit_log(csv_file: str, rows: list) -> None:
+    pd.DataFrame(rows, columns=COMMITS_COLUMNS).to_csv(csv_file, index=False)
+
+
+class TestIterRepositoryCommits(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.csv_file = os.path.join(self.tmp_dir.name, "selected_recent_commits.csv")
+        # (repo_url, commit_hash, author): org/c spans several chunks and org/b only has commits of the bot
+        commits = [("org/a", "a1", "dev"), ("org/a", "a2", "bot"), ("org/a", "a3", "dev"), ("org/b", "b1", "bot"),
+                   ("org/c", "c1", "dev"), ("org/c", "c2", "bot"), ("org/c", "c3", "dev"), ("org/c", "c4", "dev"),
+                   ("org/c", "c5", "dev"), ("org/d", "d1", "dev"), ("org/d", "d2", "dev")]
+        write_commit_log(self.csv_file, [(repo_url, commit_hash, author, "2023-01-01 10:00:00+00:00", None,
+                                          "+ model.bin", "model.bin") for repo_url, commit_hash, author in commits])
+
+    def read_groups(self, **kwargs) -> list:
+        return [(repo_url, commits["commit_hash"].tolist())
+                for repo_url, commits in iter_repository_commits(self.csv_file, **kwargs)]
+
+    def test_chunk_boundaries(self):
+        expected = [("org/a", ["a1", "a2", "a3"]), ("org/b", ["b1"]), ("org/c", ["c1", "c2", "c3", "c4", "c5"]),
+                    ("org/d", ["d1", "d2"])]
+        for chunk_size in [1, 2, 3, 4, 100]:
+            self.assertEqual(expected, self.read_groups(chunk_size=chunk_size), chunk_size)
+        # the empty cells are read as empty strings
+        _, commits = next(iter_repository_commits(self.csv_file, chunk_size=2))
+        self.assertEqual(["", "", ""], commits["message"].tolist())
+
+    def test_row_filter(self):
+        expected = [("org/a", ["a1", "a3"]), ("org/c", ["c1", "c3", "c4", "c5"]), ("org/d", ["d1", "d2"])]
+        for chunk_size in [1, 2, 3, 100]:
+            groups = self.read_groups(row_filter=lambda chunk: chunk["author"] != "bot", chunk_size=chunk_size)
+            self.assertEqual(expected, groups, chunk_size)
+
+    def test_usecols(self):
+        groups = list(iter_repository_commits(self.csv_file, chunk_size=3, usecols=["repo_url", "commit_hash"]))
+        self.assertEqual(["org/a", "org/b", "org/c", "org/d"], [repo_url for repo_url, _ in groups])
+        self.assertEqual({"repo_url", "commit_hash"}, set(groups[0][1].columns))
+
+    def test_non_contiguous_repository(self):
+        with open(self.csv_file, "a") as f:
+            f.write("org/a,a4,dev,2023-01-01 10:00:00+00:00,,+ model.bin,model.bin\n")
+        groups = self.read_groups(chunk_size=4)
+        # a repository that is not stored contiguously is yielded once per block
+        self.assertEqual(["org/a", "org/b", "org/c", "org/d", "org/a"], [repo_url for repo_url, _ in groups])
+        self.assertEqual(["a4"], groups[-1][1])
+
+
+class TestNormalizeCommitLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.csv_file = os.path.join(self.tmp_dir.name, "selected_recent_commits.csv")
+        write_commit_log(self.csv_file, [(repo_url, commit_hash, "dev", f"2023-01-0{i + 1} 10:00:00+00:00", message,
+                                          changed_files, tree)
+                                         for i, (repo_url, commit_hash, message, changed_files, tree)
+                                         in enumerate(NORMALIZED_COMMITS)])
+
+    def test_normalize(self):
+        log = normalize_commit_log(self.csv_file)
+        self.assertEqual(list(range(5)), log.commits["commit_id"].tolist())
+        self.assertEqual(["h0", "h1", "h2", "h3", "h4"], log.commits["commit_hash"].tolist())
+        self.assertEqual("", log.commits["message"].iat[2])
+        self.assertEqual("category", log.commits["repo_url"].dtype)
+        self.assertEqual(pd.Timestamp("2023-01-03 10:00:00+00:00"), log.commits["date"].iat[2])
+        # the paths are interned in order of appearance (the changed files of a chunk, then its tree)
+        self.assertEqual([MODEL, "README.md", "config.json", SUB_MODEL, WEIGHTS], log.paths["path"].tolist())
+        self.assertEqual([True, False, False, True, True], log.paths["is_model_file"].tolist())
+        self.assertEqual([(0, 0, "+"), (0, 1, "+"), (1, 1, "*"), (2, 0, "-"), (2, 2, "="), (3, 3, ">"), (3, 4, "<")],
+                         list(log.changes.itertuples(index=False, name=None)))
+        self.assertEqual(CHANGE_STATUSES, list(log.changes["change_status"].cat.categories))
+        self.assertEqual(sorted(CHANGE_STATUSES), sorted(log.changes["change_status"].unique()))
+        # only the model files of the trees are kept
+        self.assertEqual([(0, 0), (1, 0), (3, 3), (3, 4)], list(log.tree.itertuples(index=False, name=None)))
+
+        np.testing.assert_array_equal([True, False, True, True, False], touches_model_files(log))
+        np.testing.assert_array_equal([True, True, False, True, False], has_model_files_in_tree(log))
+
+        # the tables do not depend on the chunk size
+        for chunk_size in [1, 2, 3]:
+            for expected, actual in zip(log, normalize_commit_log(self.csv_file, chunk_size=chunk_size)):
+                pd.testing.assert_frame_equal(expected, actual)
+
+    def test_load(self):
+        files = normalized_files(self.csv_file)
+        # the log is normalized and saved on the first load, and read from the Parquet files afterwards
+        log = load_normalized_commit_log(self.csv_file)
+        self.assertTrue(all(f.exists() for f in files.values()))
+        mtimes = {table: f.stat().st_mtime_ns for table, f in files.items()}
+        for expected, actual in zip(log, load_normalized_commit_log(self.csv_file)):
+            pd.testing.assert_frame_equal(expected, actual)
+        self.assertEqual(mtimes, {table: f.stat().st_mtime_ns for table, f in files.items()})
+
+        # the log is normalized again once the CSV file is newer than the tables
+        with open(self.csv_file, "a") as f:
+            f.write(f"org/b,h5,dev,2023-01-06 10:00:00+00:00,fix,* {SUB_MODEL},{SUB_MODEL}\n")
+        newer = max(f.stat().st_mtime for f in files.values()) + 10
+        os.utime(self.csv_file, (newer, newer))
+        log = load_normalized_commit_log(self.csv_file)
+        self.assertEqual(6, len(log.commits))
+        np.testing.assert_array_equal([True, False, True, True, False, True], touches_model_files(log))
+        np.testing.assert_array_equal([True, True, False, True, False, True], has_model_files_in_tree(log))
+        self.assertEqual(6, len(load_normalized_commit_log(self.csv_file).commits))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from selenium import webdriver
+
+    from scripts.bot.crawl_utils import count_trailing_known, crawl_new_discussions
+except ImportError:
+    webdriver = None
+
+NUM_DISCUSSIONS, PAGE_SIZE = 95, 20
+
+# a list of discussions (newest first) where "Load more" appends the next page after a delay, as on Hugging Face
+MOCK_PAGE = f"""<!DOCTYPE html><html><body>
+<a href="/org/m0/discussions/new">New discussion</a>
+<ul id="list"></ul><button id="more">Load more</button>
+<script>
+let loaded = 0;
+function loadPage() {{
+    const list = document.getElementById("list");
+    for (const end = Math.min(loaded + {PAGE_SIZE}, {NUM_DISCUSSIONS}); loaded < end; loaded++) {{
+        const item = document.createElement("li");
+        item.innerHTML = `<a href="/org/m${{{NUM_DISCUSSIONS} - loaded}}/discussions/1">Discussion</a>`;
+        list.appendChild(item);
+    }}
+    if (loaded >= {NUM_DISCUSSIONS}) document.getElementById("more").remove();
+}}
+document.getElementById("more").onclick = () => setTimeout(loadPage, 200);
+loadPage();
+</script></body></html>"""
+
+
+class MockPageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = MOCK_PAGE.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_browser():
+    """
+    Start a headless browser (Firefox or Chrome), or return None if none is available.
+    """
+    browsers = ((webdriver.Firefox, webdriver.FirefoxOptions), (webdriver.Chrome, webdriver.ChromeOptions))
+    for browser, options in browsers:
+        try:
+            browser_options = options()
+            browser_options.add_argument("--headless")
+            return browser(options=browser_options)
+        except Exception:
+            continue
+    return None
+
+
+@unittest.skipIf(webdriver is None, "selenium is not installed")
+class TestCrawlNewDiscussions(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.driver = start_browser()
+        if cls.driver is None:
+            raise unittest.SkipTest("no browser available")
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), MockPageHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.driver.quit()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def discussion_url(self, n: int) -> str:
+        return f"{self.base_url}/org/m{n}/discussions/1"
+
+    def test_full_crawl(self):
+        urls = crawl_new_discussions(self.driver, f"{self.base_url}/activity", timeout=5)
+        self.assertEqual([self.discussion_url(n) for n in range(NUM_DISCUSSIONS, 0, -1)], urls)
+
+    def test_incremental_crawl(self):
+        # a previous run stored the 60 oldest discussions
+        known_urls = [self.discussion_url(n) for n in range(1, 61)]
+        urls = crawl_new_discussions(self.driver, f"{self.base_url}/activity", known_urls, known_run=10, timeout=5)
+        self.assertEqual([self.discussion_url(n) for n in range(NUM_DISCUSSIONS, 60, -1)], urls)
+        # the crawl stopped at the first page that ends with 10 known discussions (the third one)
+        self.assertEqual(3 * PAGE_SIZE + 1, len(self.driver.find_elements("css selector", "a")))
+
+    def test_count_trailing_known(self):
+        self.assertEqual(2, count_trailing_known(["a", "b", "c", "d"], {"a", "c", "d"}))
+        self.assertEqual(0, count_trailing_known(["a", "b"], {"a"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from scripts.bot.discussions_api import discussion_url, iter_repos_discussions
+
+PAGE_SIZE = 5
+# the discussions of each repository of the stand-in (repositories that are not listed do not exist)
+REPOS = {"org/m1": [("SFconvertbot", "open")] * 12 + [("user", "closed")] * 3,
+         "org/m2": [("SFconvertbot", "merged")],
+         "org/m3": []}
+
+
+class DiscussionsApiHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for /api/models/<repo_id>/discussions?p=N (with the author and status filters), as paginated by the Hub.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        repo_id = url.path.removeprefix("/api/models/").removesuffix("/discussions")
+        with server.lock:
+            server.requests.append((repo_id, int(query["p"])))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(0.02)
+        if repo_id in REPOS:
+            discussions = [{"num": num, "title": f"Discussion {num}", "status": status, "isPullRequest": True,
+                            "author": {"name": author}}
+                           for num, (author, status) in enumerate(REPOS[repo_id], start=1)
+                           if query.get("author", author) == author]
+            start = int(query["p"]) * PAGE_SIZE
+            status, body = 200, {"discussions": discussions[start:start + PAGE_SIZE], "count": len(discussions),
+                                 "start": start}
+        else:
+            status, body = 404, {"error": "Repository not found"}
+        with server.lock:
+            server.in_flight -= 1
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRepoDiscussions(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), DiscussionsApiHandler)
+        self.server.lock, self.server.requests, self.server.in_flight, self.server.max_in_flight = \
+            threading.Lock(), [], 0, 0
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_list_discussions(self):
+        repo_ids = ["org/m1", "org/m2", "org/m3", "org/missing"]
+        results = list(iter_repos_discussions(repo_ids, author="SFconvertbot", base_url=self.base_url, concurrency=3,
+                                              rate=None))
+        urls = {discussion_url(repo_id, d["num"], base_url=self.base_url) for repo_id, d in results}
+        expected = {f"{self.base_url}/org/m1/discussions/{n}" for n in range(1, 13)} | \
+                   {f"{self.base_url}/org/m2/discussions/1"}
+        self.assertEqual(expected, urls)
+        self.assertEqual(len(expected), len(results))
+        # the pages of org/m1 (12 PRs by the bot) are 0, 1 and 2; the other repositories have a single page
+        self.assertEqual([0, 1, 2], sorted(p for repo_id, p in self.server.requests if repo_id == "org/m1"))
+        self.assertEqual(6, len(self.server.requests))
+        self.assertLessEqual(self.server.max_in_flight, 3)
+
+    def test_discussion_url(self):
+        self.assertEqual("https://huggingface.co/spaces/safetensors/convert/discussions/7",
+                         discussion_url("safetensors/convert", 7, repo_type="space"))
+
+
+if __name__ == "__main__":
+    unittest.main()
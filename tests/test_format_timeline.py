@@ -0,0 +1,58 @@
+import unittest
+
+import pandas as pd
+
+from scripts.format_timeline import EVOLUTION_COLUMNS
+from scripts.format_timeline import build_format_timeline
+from scripts.format_timeline import first_safetensors_per_repo
+from scripts.format_timeline import format_at
+from scripts.format_timeline import pickle_to_safetensors_converters
+from scripts.format_timeline import timeline_to_evolution
+from scripts.format_timeline import to_utc
+from tests.fixtures import evolution_data
+
+
+class TestFormatTimeline(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.concat([evolution_data(), evolution_data("org/other")], ignore_index=True)
+        self.timeline = build_format_timeline(self.df)
+
+    def test_to_utc(self):
+        expected = pd.Timestamp("2022-10-01 08:00:00", tz="UTC")
+        # naive dates are in UTC
+        for date in ["2022-10-01 10:00:00+02:00", "2022-10-01 08:00:00", pd.Timestamp("2022-10-01 08:00:00")]:
+            self.assertEqual(expected, to_utc(date))
+            self.assertEqual("UTC", str(to_utc(date).tz))
+
+    def test_runs(self):
+        runs = self.timeline.runs[self.timeline.runs["repo_url"] == "org/model"]
+        # model.bin is deleted in c4 and added back in c5, so it has two runs
+        self.assertEqual(4, len(runs))
+        run = runs[runs["model_file_path"] == "org/model/model.bin"].iloc[0]
+        self.assertEqual(pd.Timestamp("2022-01-01 10:00", tz="UTC"), run["start"])
+        self.assertEqual(pd.Timestamp("2023-01-01 10:00", tz="UTC"), run["end"])
+        self.assertTrue(runs[runs["model_file_path"] == "org/model/model.safetensors"]["end"].isna().all())
+
+    def test_round_trip(self):
+        df = timeline_to_evolution(self.timeline)
+        key = ["repo_url", "commit_hash", "model_file_path"]
+        pd.testing.assert_frame_equal(self.df.sort_values(key).reset_index(drop=True)[EVOLUTION_COLUMNS],
+                                      df.sort_values(key).reset_index(drop=True))
+
+    def test_format_at(self):
+        self.assertIsNone(format_at(self.timeline, "org/model/model.bin", "2021-12-31"))
+        self.assertEqual("pickle", format_at(self.timeline, "org/model/model.bin", "2022-12-31"))
+        self.assertIsNone(format_at(self.timeline, "org/model/model.bin", "2023-01-15"))
+        self.assertEqual("pickle", format_at(self.timeline, "org/model/model.bin", "2024-01-01"))
+        # c3 was committed at 08:00 UTC
+        self.assertIsNone(format_at(self.timeline, "org/model/model.safetensors", "2022-10-01 07:59"))
+        self.assertEqual("safetensors", format_at(self.timeline, "org/model/model.safetensors", "2022-10-01 08:00"))
+        self.assertIsNone(format_at(self.timeline, "org/model/missing.bin", "2022-10-01"))
+
+    def test_safetensors_adoption(self):
+        df = first_safetensors_per_repo(self.timeline)
+        self.assertEqual(["org/model", "org/other"], df["repo_url"].tolist())
+        self.assertEqual(["c3", "c3"], df["commit_hash"].tolist())
+        df = pickle_to_safetensors_converters(self.timeline)
+        self.assertEqual(["org/model", "org/other"], df["repo_url"].tolist())
+        self.assertEqual([True, True], df["kept_pickle"].tolist())
@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from scripts.github.gh_comments import CommentsClient, JsonArrayWriter, RateBudget, iter_with_comments
+
+# requests allowed per rate limit window (of one second) by the stand-in
+LIMIT = 15
+
+
+class CommentsHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for /repos/o/r/issues/<n>/comments: issue n has 3 * n comments, paginated with Link headers, under a rate
+    limit of LIMIT requests per second (with the X-RateLimit headers; exceeding it is answered with 403).
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        n, page, per_page = int(url.path.split("/")[-2]), int(query.get("page", 1)), int(query["per_page"])
+        window = int(time.time())
+        with server.lock:
+            if window != server.window:
+                server.window, server.used = window, 0
+            server.used += 1
+            remaining = LIMIT - server.used
+            server.rejected += remaining < 0
+        headers = {"X-RateLimit-Remaining": str(max(remaining, 0)), "X-RateLimit-Reset": str(window + 1),
+                   "Content-Type": "application/json"}
+        if remaining < 0:
+            status, body = 403, {"message": "API rate limit exceeded"}
+        else:
+            comments = [{"body": f"comment {i} of {n}"} for i in range(3 * n)]
+            status, body = 200, comments[(page - 1) * per_page:page * per_page]
+            if page * per_page < len(comments):
+                base_url = f"http://{self.headers['Host']}{url.path}"
+                headers["Link"] = f'<{base_url}?per_page={per_page}&page={page + 1}>; rel="next"'
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestFetchComments(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), CommentsHandler)
+        self.server.lock, self.server.window, self.server.used, self.server.rejected = threading.Lock(), 0, 0, 0
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fetch_comments(self):
+        client = CommentsClient(session=requests.Session(), per_page=4)
+        prs = [{"number": n, "comments_url": f"{self.base_url}/repos/o/r/issues/{n}/comments"} for n in range(12)]
+        results = {pr["number"]: comments for pr, comments in iter_with_comments(prs, client.fetch_comments, 4)}
+        # all pages were followed (55 requests, i.e., several rate limit windows)
+        self.assertEqual({n: [f"comment {i} of {n}" for i in range(3 * n)] for n in range(12)},
+                         {n: [c["body"] for c in comments] for n, comments in results.items()})
+        # only the requests sent before the budget was known can exceed the limit
+        self.assertLessEqual(self.server.rejected, 4)
+
+    def test_budget(self):
+        budget = RateBudget()
+        budget.acquire()  # unknown budget
+        reset = time.time() + 0.5
+        budget.update({"X-RateLimit-Remaining": "1", "X-RateLimit-Reset": str(reset)})
+        budget.update({"X-RateLimit-Remaining": "3", "X-RateLimit-Reset": str(reset)})  # out of order
+        budget.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() - 10)})  # stale
+        self.assertEqual(1, budget.remaining)
+        budget.acquire()
+        start = time.time()
+        budget.acquire()  # waits for the reset
+        self.assertGreaterEqual(time.time(), reset)
+        self.assertLess(time.time() - start, 2)
+
+    def test_json_array_writer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, "prs.json")
+            with self.assertRaises(KeyboardInterrupt):
+                with JsonArrayWriter(output_file) as writer:
+                    writer.write({"title": "a", "comments": []})
+                    writer.write({"title": "b", "comments": ["c"]})
+                    raise KeyboardInterrupt
+            with open(output_file) as f:
+                self.assertEqual([{"title": "a", "comments": []}, {"title": "b", "comments": ["c"]}], json.load(f))
+            # a resumed collection appends to the array
+            with JsonArrayWriter(output_file, append=True) as writer:
+                writer.write({"title": "d", "comments": []})
+            with open(output_file) as f:
+                self.assertEqual(["a", "b", "d"], [pr["title"] for pr in json.load(f)])
+            # with a key, the items that were already written (e.g., before an interruption) are skipped
+            with JsonArrayWriter(output_file, append=True, key="title") as writer:
+                self.assertEqual([False, True, False, True],
+                                 [writer.write({"title": title, "comments": []}) for title in ["b", "e", "e", "f"]])
+            with open(output_file) as f:
+                self.assertEqual(["a", "b", "d", "e", "f"], [pr["title"] for pr in json.load(f)])
+
+
+if __name__ == "__main__":
+    unittest.main()
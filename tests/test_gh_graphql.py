@@ -0,0 +1,129 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from scripts.github.gh_graphql import COMMENTS_PER_PAGE, GraphQLClient, SearchState, iter_prs_with_comments
+
+# PR i was created on day i + 1 of September 2024 and has 70 * i comments (some PRs need several comment pages)
+NUM_PRS = 12
+AUTHORS = [None, {"login": "dependabot", "__typename": "Bot"}] + [{"login": f"dev{i}", "__typename": "User"}
+                                                                     for i in range(2, NUM_PRS)]
+
+
+def comment_page(pr: int, after: str, first: int) -> dict:
+    start = int(after or 0)
+    bodies = [f"comment {j} of {pr}" for j in range(70 * pr)]
+    end = min(start + first, len(bodies))
+    return {"pageInfo": {"hasNextPage": end < len(bodies), "endCursor": str(end)},
+            "nodes": [{"body": body} for body in bodies[start:end]]}
+
+
+class GraphQLHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the GraphQL API: it answers the operations of gh_graphql.py (by name and variables) over PRs created
+    in September 2024, with the search results of a `created:` window paginated by index cursors. The first query is
+    rate limited, as when the budget is exhausted.
+    """
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        query, variables = request["query"], request["variables"]
+        operation = re.search(r"query (\w+)", query).group(1)
+        with server.lock:
+            server.operations.append(operation)
+            rate_limited = len(server.operations) == 1
+        if rate_limited:
+            body = {"errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}]}
+        elif operation == "MoreComments":
+            data = {}
+            for key, pr_id in variables.items():
+                if key.startswith("id"):
+                    i = key[2:]
+                    self.server.test.assertIn(f"pr{i}: node(id: $id{i})", query)
+                    data[f"pr{i}"] = {"comments": comment_page(int(pr_id), variables[f"after{i}"], COMMENTS_PER_PAGE)}
+            body = {"data": data}
+        else:
+            days = [int(d) for d in re.findall(r"created:2024-09-(\d\d)T00:00:00Z\.\.2024-09-(\d\d)T23:59:59Z",
+                                               variables["q"])[0]]
+            prs = [i for i in range(NUM_PRS) if days[0] <= i + 1 <= days[1]]
+            if operation == "CountPRs":
+                body = {"data": {"search": {"issueCount": len(prs)}}}
+            else:
+                start = int(variables["after"] or 0)
+                end = min(start + variables["first"], len(prs))
+                nodes = [{"id": str(i), "title": f"PR {i}", "url": f"https://github.com/o/r/pull/{i}",
+                          "body": "" if i == 3 else f"body {i}", "author": AUTHORS[i],
+                          "comments": comment_page(i, None, COMMENTS_PER_PAGE)} for i in prs[start:end]]
+                body = {"data": {"search": {"pageInfo": {"hasNextPage": end < len(prs), "endCursor": str(end)},
+                                            "nodes": nodes}}}
+        body = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-RateLimit-Reset", "0")  # sleeps for the minimum of one second
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestGraphQLSearch(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), GraphQLHandler)
+        self.server.lock, self.server.operations, self.server.test = threading.Lock(), [], self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = GraphQLClient(url=f"http://127.0.0.1:{self.server.server_address[1]}/graphql",
+                                    session=requests.Session())
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # two windows: September 1-6 and 7-30
+        self.queries = [f"safetensors created:2024-09-{a:02d}T00:00:00Z..2024-09-{b:02d}T23:59:59Z"
+                        for a, b in [(1, 6), (7, 30)]]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def test_count(self):
+        self.assertEqual(6, self.client.count(self.queries[0]))  # after the rate limited attempt
+
+    def test_resume(self):
+        state_file = os.path.join(self.tmp_dir.name, "state.json")
+        state = SearchState(state_file, self.queries)
+        results = iter_prs_with_comments(self.client, state)
+        # interrupt the search at the first PR of the second window
+        first = [next(results) for _ in range(7)]
+        results.close()
+
+        # the search resumes at the second window (the first one is not fetched again)
+        state = SearchState.load(state_file)
+        self.assertEqual((1, None), (state.index, state.cursor))
+        operations = len(self.server.operations)
+        rest = list(iter_prs_with_comments(self.client, state))
+        self.assertFalse(os.path.exists(state_file))
+        prs = first[:6] + rest
+        self.assertEqual(list(range(NUM_PRS)), [int(pr["html_url"].split("/")[-1]) for pr, _ in prs])
+        # the PRs are converted to the fields of the REST search results
+        self.assertEqual({"title": "PR 0", "html_url": "https://github.com/o/r/pull/0",
+                          "user": {"login": "ghost", "type": "User"}, "body": "body 0"}, prs[0][0])
+        self.assertEqual({"login": "dependabot", "type": "Bot"}, prs[1][0]["user"])
+        self.assertIsNone(prs[3][0]["body"])
+        # all comment pages were followed
+        self.assertEqual([[f"comment {j} of {i}" for j in range(70 * i)] for i in range(NUM_PRS)],
+                         [[comment["body"] for comment in comments] for _, comments in prs])
+        # one search query for the second window and a few batched comment queries (instead of one query per page)
+        new_operations = self.server.operations[operations:]
+        self.assertEqual(1, new_operations.count("SearchPRs"))
+        self.assertLessEqual(new_operations.count("MoreComments"), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import bisect
+import json
+import random
+import re
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from scripts.github.gh_search import FIRST_DATE, RESULTS_CAP, SearchClient, Window, check_coverage, merge_windows, \
+    plan_windows, search_windows
+
+END_DATE = datetime(2024, 9, 1, tzinfo=timezone.utc)
+
+
+def synthetic_dates(seed: int = 42) -> list:
+    """
+    Creation dates of the search results: a few sparse years, a dense hour and a burst within the same second.
+    """
+    rng = random.Random(seed)
+    start, burst = datetime(2019, 1, 1, tzinfo=timezone.utc), datetime(2023, 5, 1, 12, tzinfo=timezone.utc)
+    dates = [start + timedelta(seconds=rng.randrange(int((END_DATE - start).total_seconds()))) for _ in range(1500)]
+    dates += [burst + timedelta(seconds=rng.randrange(3600)) for _ in range(2200)]
+    dates += [burst + timedelta(minutes=30)] * 40
+    return sorted(dates)
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for /search/issues: the results matching the `created:` window of the query, paginated, with only the
+    first 1000 results of a query available (as in the GitHub API).
+    """
+
+    def do_GET(self):
+        server = self.server
+        query = {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+        start, end = (datetime.strptime(d, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+                      for d in re.search(r"created:(\S+)\.\.(\S+)", query["q"]).groups())
+        lo, hi = bisect.bisect_left(server.dates, start), bisect.bisect_right(server.dates, end)
+        page, per_page = int(query["page"]), int(query["per_page"])
+        with server.lock:
+            server.num_requests += 1
+        if page * per_page > RESULTS_CAP and per_page > 1:
+            status, body = 422, {"message": "Only the first 1000 search results are available"}
+        else:
+            first = lo + (page - 1) * per_page
+            items = [{"id": i, "created_at": server.dates[i].isoformat()}
+                     for i in range(first, min(first + per_page, hi))]
+            status, body = 200, {"total_count": hi - lo, "incomplete_results": False, "items": items}
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSearchWindows(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), SearchHandler)
+        self.server.lock, self.server.dates, self.server.num_requests = threading.Lock(), synthetic_dates(), 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = SearchClient(base_url=f"http://127.0.0.1:{self.server.server_address[1]}", per_minute=None,
+                                   session=requests.Session())
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_plan_and_search(self):
+        windows = plan_windows(self.client, "safetensors", end=END_DATE)
+        check_coverage(windows, FIRST_DATE, END_DATE)
+        self.assertEqual(len(self.server.dates), sum(w.count for w in windows))
+        self.assertTrue(all(w.count <= RESULTS_CAP for w in windows))
+        # the sparse years are merged into a few windows
+        self.assertLessEqual(len(windows), 8)
+
+        items = list(search_windows(self.client, "safetensors", windows))
+        self.assertEqual(list(range(len(self.server.dates))), sorted(item["id"] for item in items))
+
+    def test_merge_windows(self):
+        dates = [FIRST_DATE + timedelta(seconds=s) for s in range(0, 50, 10)]
+        windows = [Window(start, start + timedelta(seconds=9), count)
+                   for start, count in zip(dates, [1, 2, 898, 5, 6])]
+        merged = merge_windows(windows)
+        self.assertEqual([3, 898, 11], [w.count for w in merged])
+        check_coverage(merged, dates[0], dates[-1] + timedelta(seconds=9))
+        with self.assertRaises(ValueError):
+            check_coverage(merged[1:], dates[0], dates[-1] + timedelta(seconds=9))
+
+
+if __name__ == "__main__":
+    unittest.main()
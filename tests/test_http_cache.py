@@ -0,0 +1,130 @@
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from scripts.bot.bot_utils import iter_discussions_metadata, parse_discussion_page
+from scripts.http_cache import CachedSession, ResponseCache, cache_key
+from tests.fixtures import discussion_page
+
+
+class ResourcesHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for an API: /etag/<n> has an ETag (and answers matching conditional requests with 304), /plain/<n> has
+    no validators. The server counts the requests (and the 304 responses) of each path.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split("?")[0]
+        etag = f'"v{server.version}"'
+        with server.lock:
+            server.requests[path] = server.requests.get(path, 0) + 1
+        if path.startswith("/etag/") and self.headers.get("If-None-Match") == etag:
+            with server.lock:
+                server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("X-RateLimit-Remaining", "41")
+            self.end_headers()
+            return
+        body = discussion_page(int(path.split("/")[-1])).encode()
+        self.send_response(200)
+        if path.startswith("/etag/"):
+            self.send_header("ETag", etag)
+        self.send_header("X-RateLimit-Remaining", "42")
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ResourcesHandler)
+        self.server.lock, self.server.requests, self.server.not_modified, self.server.version = \
+            threading.Lock(), {}, 0, 1
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = Path(self.tmp_dir.name) / "http_cache.sqlite3"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def session(self, ttl_policies: dict, max_size: int = 10 ** 9) -> CachedSession:
+        session = CachedSession(ResponseCache(self.cache_file, ttl_policies, max_size))
+        self.addCleanup(session.cache.close)
+        return session
+
+    def test_fresh_responses_are_served_locally(self):
+        session = self.session({r"/plain/": 3600})
+        first = session.get(f"{self.base_url}/plain/1", params={"a": 1, "b": 2})
+        second = session.get(f"{self.base_url}/plain/1", params={"b": 2, "a": 1})
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(first.text, second.text)
+        self.assertEqual("42", second.headers["X-RateLimit-Remaining"])
+        self.assertEqual(1, self.server.requests["/plain/1"])
+        # the cache is persistent (and shared by other sessions)
+        self.assertTrue(self.session({r"/plain/": 3600}).get(f"{self.base_url}/plain/1?b=2&a=1").from_cache)
+        self.assertEqual(cache_key(f"{self.base_url}/plain/1?a=1&b=2"), cache_key(f"{self.base_url}/plain/1?b=2&a=1"))
+
+    def test_stale_responses_are_revalidated(self):
+        session = self.session({r"/etag/": 0, r"/plain/": 0})
+        first = session.get(f"{self.base_url}/etag/1")
+        second = session.get(f"{self.base_url}/etag/1")
+        self.assertEqual(2, self.server.requests["/etag/1"])
+        self.assertEqual(1, self.server.not_modified)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(200, second.status_code)
+        self.assertEqual(first.text, second.text)
+        self.assertEqual("41", second.headers["X-RateLimit-Remaining"])  # headers of the 304 response
+        # a changed resource is fetched again
+        self.server.version = 2
+        self.assertFalse(session.get(f"{self.base_url}/etag/1").from_cache)
+        self.assertEqual(1, self.server.not_modified)
+        # responses without validators are fetched again
+        session.get(f"{self.base_url}/plain/1")
+        self.assertFalse(session.get(f"{self.base_url}/plain/1").from_cache)
+        self.assertEqual(2, self.server.requests["/plain/1"])
+
+    def test_urls_without_policy_are_not_cached(self):
+        session = self.session({r"/etag/": 3600})
+        session.get(f"{self.base_url}/plain/1")
+        self.assertFalse(session.get(f"{self.base_url}/plain/1").from_cache)
+        self.assertFalse(self.cache_file.exists())
+
+    def test_eviction(self):
+        size = len(discussion_page(1).encode())
+        session = self.session({r"/plain/": 3600}, max_size=3 * size)
+        for n in (1, 2, 3):
+            session.get(f"{self.base_url}/plain/{n}")
+        session.get(f"{self.base_url}/plain/1")  # /plain/2 is now the least recently used
+        session.get(f"{self.base_url}/plain/4")
+        self.assertLessEqual(session.cache.size, 3 * size)
+        self.assertIsNone(session.cache.get(cache_key(f"{self.base_url}/plain/2")))
+        self.assertIsNotNone(session.cache.get(cache_key(f"{self.base_url}/plain/1")))
+        self.assertIsNotNone(session.cache.get(cache_key(f"{self.base_url}/plain/4")))
+
+    def test_discussions_fetcher(self):
+        cache = ResponseCache(self.cache_file, {r"/etag/": 0})
+        self.addCleanup(cache.close)
+        urls = [f"{self.base_url}/etag/{n}" for n in range(5)]
+        for _ in range(2):
+            results = {url: (events, header) for url, events, header in
+                       iter_discussions_metadata(urls, concurrency=2, rate=None, cache=cache)}
+            for n in range(5):
+                self.assertEqual(parse_discussion_page(discussion_page(n)), results[f"{self.base_url}/etag/{n}"])
+        self.assertEqual(5, self.server.not_modified)
+
+
+if __name__ == "__main__":
+    unittest.main()
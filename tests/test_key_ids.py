@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scripts.key_ids import anti_join
+from scripts.key_ids import count_unique
+from scripts.key_ids import decode
+from scripts.key_ids import dictionary_file
+from scripts.key_ids import encode
+from scripts.key_ids import is_member
+
+
+class TestKeyIds(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_encode(self):
+        ids = encode(pd.Series(["org/b", "org/a", "org/b"]), "repo_url", self.data_dir)
+        self.assertEqual([0, 1, 0], ids.tolist())
+        self.assertTrue(dictionary_file("repo_url", self.data_dir).exists())
+        # ids are stable across calls and new keys are appended
+        ids = encode(pd.Series(["org/c", "org/a"], dtype="category"), "repo_url", self.data_dir)
+        self.assertEqual([2, 1], ids.tolist())
+        self.assertEqual([-1, 0], encode(["org/d", "org/b"], "repo_url", self.data_dir, add=False).tolist())
+        self.assertEqual(["org/b", "org/a", "org/c"], decode(np.arange(3), "repo_url", self.data_dir).tolist())
+        with self.assertRaises(ValueError):
+            encode(["x"], "author", self.data_dir)
+
+    def test_set_operations(self):
+        ids, other_ids = np.array([3, 1, -1, 4, 1]), np.array([1, 5, -1])
+        self.assertEqual([False, True, False, False, True], is_member(ids, other_ids).tolist())
+        self.assertEqual([-1, 3, 4], anti_join(ids, other_ids).tolist())
+        self.assertEqual(3, count_unique(np.array([0, 1, 0, 2])))
+        self.assertEqual(3, count_unique(np.array([0, 0, 1, 0]), np.array([0, 1, 0, 0])))
+        # pairs with unknown (-1) ids do not collide with other pairs
+        self.assertEqual(2, count_unique(np.array([1, 0]), np.array([-1, 2])))
+
+    def test_concurrent_encode(self):
+        # processes adding keys at the same time get distinct ids (and the dictionary stays readable)
+        keys = [[f"org/{p}-{i}" for i in range(50)] for p in range(4)]
+        with ProcessPoolExecutor(4) as executor:
+            ids = list(executor.map(encode, keys, ["repo_url"] * 4, [self.data_dir] * 4))
+        self.assertEqual(200, len(np.unique(np.concatenate(ids))))
+        for p in range(4):
+            self.assertEqual(keys[p], decode(ids[p], "repo_url", self.data_dir).tolist())
+
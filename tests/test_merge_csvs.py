@@ -0,0 +1,57 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.hotfixes.merge_csvs import mark_first_rows, merge_csv_files
+
+KEY = ["repo_url", "commit_hash", "model_file_path"]
+
+
+class TestMergeCsvs(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_dir = Path(self.tmp_dir.name)
+        pd.DataFrame({"repo_url": ["org/a", "org/a", "org/b"], "commit_hash": ["h1", "h1", "h2"],
+                      "model_file_path": ["org/a/m.bin", "org/a/m.bin", "org/b/m.bin"],
+                      "message": ["None", "dup", ""]}).to_csv(self.input_dir / "shard_0.csv", index=False)
+        # same columns in another order
+        pd.DataFrame({"message": ["x", "y"], "model_file_path": ["org/b/m.bin", "org/c/m.h5"],
+                      "commit_hash": ["h2", "h3"], "repo_url": ["org/b", "org/c"]}).to_csv(
+            self.input_dir / "shard_1.csv", index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_merge(self):
+        output_file = self.input_dir / "merged.csv"
+        self.assertEqual(5, merge_csv_files(self.input_dir, output_file, "shard_*.csv", chunk_size=2))
+        df = pd.read_csv(output_file, keep_default_na=False)
+        self.assertEqual(KEY + ["message"], df.columns.tolist())
+        self.assertEqual(["None", "dup", "", "x", "y"], df["message"].tolist())
+
+    def test_dedupe(self):
+        output_file = self.input_dir / "merged.parquet"
+        self.assertEqual(3, merge_csv_files(self.input_dir, output_file, "shard_*.csv", dedupe_on=KEY,
+                                            output_format="parquet", chunk_size=2))
+        df = pd.read_parquet(output_file)
+        self.assertEqual(["h1", "h2", "h3"], df["commit_hash"].tolist())
+        self.assertEqual(["None", None, "y"], df["message"].tolist())
+
+    def test_mark_first_rows(self):
+        rng = np.random.default_rng(42)
+        shards = [pd.DataFrame({"repo_url": rng.integers(0, 50, 300).astype(str),
+                                "commit_hash": rng.integers(0, 3, 300)}) for _ in range(3)]
+        for i, shard in enumerate(shards):
+            shard.to_csv(self.input_dir / f"keys_{i}.csv", index=False)
+        files = [self.input_dir / f"keys_{i}.csv" for i in range(3)]
+        is_first = mark_first_rows(files, ["repo_url", "commit_hash"], self.tmp_dir.name, chunk_size=70, partitions=5)
+        expected = ~pd.concat(shards).astype(str).duplicated().to_numpy()
+        self.assertEqual(expected.tolist(), np.asarray(is_first).tolist())
+
+    def test_incompatible_headers(self):
+        pd.DataFrame({"repo_url": ["org/d"], "error": ["failed"]}).to_csv(self.input_dir / "shard_2.csv", index=False)
+        with self.assertRaises(ValueError):
+            merge_csv_files(self.input_dir, self.input_dir / "merged.csv", "shard_*.csv")
@@ -0,0 +1,63 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.model_evolution_db import count_rows
+from scripts.model_evolution_db import ingest
+from scripts.model_evolution_db import query
+from scripts.model_evolution_db import read_table
+
+EVOLUTION_COLUMNS = "repo_url,commit_hash,model_file_path,serialization_format,message,author,date,is_in_commit\n"
+
+
+class TestModelEvolutionDB(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp_dir.name)
+        self.db_file = self.data_dir / "db.sqlite3"
+        self.write_evolution("recent", [
+            "org/a,h1,org/a/model.bin,pickle,m,x,2023-02-01 10:00:00+02:00,True",
+            "org/a,h2,org/a/model.safetensors,safetensors,m,x,2023-03-05 10:00:00+00:00,True",
+            "org/b,h3,org/b/model.safetensors,safetensors,m,y,2023-03-06 10:00:00+00:00,True",
+        ])
+        self.write_evolution("legacy", ["org/c,h4,org/c/model.h5,keras,m,z,2021-01-01 00:00:00+00:00,True"])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_evolution(self, group, rows):
+        with open(self.data_dir / f"repositories_evolution_{group}_commits_processed.csv", "w") as f:
+            f.write(EVOLUTION_COLUMNS + "\n".join(rows) + "\n")
+
+    def ingest(self):
+        return ingest(["evolution"], db_file=self.db_file, data_dir=self.data_dir)
+
+    def test_incremental_ingestion(self):
+        self.assertEqual({"repositories_evolution_recent_commits_processed.csv": True,
+                          "repositories_evolution_legacy_commits_processed.csv": True}, self.ingest())
+        self.assertEqual({False}, set(self.ingest().values()))
+        # only the file that changed is reloaded (and its old rows are replaced)
+        self.write_evolution("legacy", ["org/c,h5,org/c/model.safetensors,safetensors,m,z,2022-01-01 00:00:00,True"])
+        self.assertEqual({"repositories_evolution_recent_commits_processed.csv": False,
+                          "repositories_evolution_legacy_commits_processed.csv": True}, self.ingest())
+        df = read_table("evolution", where={"group_type": "legacy"}, db_file=self.db_file)
+        self.assertEqual(["h5"], df["commit_hash"].tolist())
+        self.assertEqual(EVOLUTION_COLUMNS.strip().split(","), df.columns.tolist())
+        indexes = query("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'evolution'",
+                        db_file=self.db_file)["name"].tolist()
+        for column in ["repo_url", "commit_hash", "date", "serialization_format"]:
+            self.assertIn(f"idx_evolution_{column}", indexes)
+
+    def test_count_rows(self):
+        self.ingest()
+        # dates are stored in UTC
+        self.assertEqual("2023-02-01 08:00:00", read_table("evolution", db_file=self.db_file)["date"].iloc[0])
+        df = count_rows("evolution", by=["serialization_format"], freq="month", where={"group_type": "recent"},
+                        distinct="repo_url", db_file=self.db_file)
+        expected = pd.DataFrame({"month": ["2023-02", "2023-03"], "serialization_format": ["pickle", "safetensors"],
+                                 "count": [1, 2]})
+        pd.testing.assert_frame_equal(expected, df)
+        with self.assertRaises(ValueError):
+            count_rows("evolution", by=["date; DROP TABLE evolution"], db_file=self.db_file)
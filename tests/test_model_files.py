@@ -0,0 +1,46 @@
+import unittest
+from pathlib import Path
+
+import pandas as pd
+from analyticaml import MODEL_FILE_EXTENSIONS
+
+from scripts.model_files import contains_model_file
+from scripts.model_files import explode_model_files
+from scripts.model_files import filter_by_extension
+from scripts.model_files import is_model_file
+from scripts.model_files import match_model_files
+
+# tricky paths for the suffix semantics of Path (hidden files, trailing dots, dots in folders, etc.)
+EXTENSION = sorted(MODEL_FILE_EXTENSIONS)[0]
+PATHS = [f"model.{EXTENSION}", f"folder/model.{EXTENSION}", f".{EXTENSION}", f"folder/.{EXTENSION}",
+         f"model..{EXTENSION}", f"model.{EXTENSION}.", f"model.{EXTENSION.upper()}", f"folder.{EXTENSION}/model",
+         f"+ folder/model.{EXTENSION}", f"* .{EXTENSION}", f"model.{EXTENSION} ", f"model .{EXTENSION}",
+         f"model.{EXTENSION}/", "model", "model.", "", "README.md", "config.json", ".gitattributes"]
+
+
+def path_based_is_model_file(file_path: str) -> bool:
+    return Path(file_path).suffix[1:] in MODEL_FILE_EXTENSIONS
+
+
+class TestModelFiles(unittest.TestCase):
+
+    def test_is_model_file(self):
+        for file_path in PATHS:
+            self.assertEqual(path_based_is_model_file(file_path), is_model_file(file_path), file_path)
+
+    def test_joined_paths(self):
+        joined = [";".join(PATHS[i:i + size]) for size in (1, 2, 3) for i in range(len(PATHS))]
+        expected = [any(path_based_is_model_file(f) for f in x.split(";")) for x in joined]
+        self.assertEqual(expected, [filter_by_extension(x) for x in joined])
+        self.assertEqual(expected, contains_model_file(pd.Series(joined)).tolist())
+
+    def test_vectorized_api(self):
+        paths = pd.Series(PATHS + [None])
+        self.assertEqual([path_based_is_model_file(f) for f in PATHS] + [False], match_model_files(paths).tolist())
+
+        joined = pd.Series([";".join(PATHS), "", ";".join(reversed(PATHS))], index=[10, 20, 30])
+        exploded = explode_model_files(joined)
+        expected = [f for f in PATHS if path_based_is_model_file(f)]
+        self.assertEqual(expected, exploded.loc[10].tolist())
+        self.assertEqual(list(reversed(expected)), exploded.loc[30].tolist())
+        self.assertNotIn(20, exploded.index)
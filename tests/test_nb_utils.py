@@ -1,8 +1,25 @@
+import random
+import tempfile
 import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
 
+import numpy as np
 import pandas as pd
+from analyticaml import MODEL_FILE_EXTENSIONS
 
+from scripts.commit_logs import COMMITS_COLUMNS
+from scripts.key_ids import KEY_NAMES
+from scripts.key_ids import dictionary_file
+from scripts.notebooks import nb_utils
+from scripts.notebooks.nb_utils import build_calendar_heatmaps
+from scripts.notebooks.nb_utils import compute_calendar_mask
 from scripts.notebooks.nb_utils import compute_calendar_week
+from scripts.notebooks.nb_utils import compute_calendar_weeks
+from scripts.notebooks.nb_utils import get_commit_log_stats
+from scripts.notebooks.nb_utils import get_commit_time_series
+from scripts.notebooks.nb_utils import read_repositories_evolution
 from scripts.notebooks.nb_utils import SAFETENSORS_RELEASE_DATE
 
 class TestSafetensorsReleaseDate(unittest.TestCase):
@@ -55,4 +72,221 @@ class TestCalendarWeek(unittest.TestCase):
         for day in range(15, 22):
             self.vibe_check(2024, 1, day, 2)
         for day in range(30, 32):
-            self.vibe_check(2024, 12, day, 52)
\ No newline at end of file
+            self.vibe_check(2024, 12, day, 52)
+
+
+class TestCalendarHeatmaps(unittest.TestCase):
+    def test_weeks_match_compute_calendar_week(self):
+        dates = pd.Series(pd.date_range("2010-01-01", "2030-12-31"))
+        expected = [compute_calendar_week(d) for d in dates]
+        self.assertEqual(expected, compute_calendar_weeks(dates).tolist())
+
+    def test_heatmaps_match_year_matrices(self):
+        dates = pd.Series(pd.to_datetime(["2022-09-22 10:00", "2022-09-22 18:30", "2023-01-01 00:00", "2024-12-31 23:59"]))
+        heatmaps = build_calendar_heatmaps(dates, by=["safetensors", "pickle", "safetensors", "safetensors"])
+        self.assertEqual([2022, 2023, 2024], heatmaps.years.tolist())
+        self.assertEqual(["pickle", "safetensors"], heatmaps.groups.tolist())
+        self.assertEqual((2, 3, 7, 53), heatmaps.counts.shape)
+        for i, year in enumerate(heatmaps.years):
+            self.assertTrue((compute_calendar_mask(np.zeros((7, 53)), year) == heatmaps.masks[i]).all())
+        for d in dates.unique():
+            year_index = heatmaps.years.tolist().index(d.year)
+            self.assertGreater(heatmaps.counts[:, year_index, d.weekday(), compute_calendar_week(d)].sum(), 0)
+        self.assertEqual(1, heatmaps.counts[0, 0, 3, 38])  # Thursday, 2022-09-22 (pickle)
+        self.assertEqual(len(dates), heatmaps.counts.sum())
+
+
+class TestCommitTimeSeries(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'date': pd.to_datetime(["2022-09-22 10:00", "2022-09-22 18:30", "2022-09-26 08:00", "2022-10-03 12:00"]),
+            'serialization_format': ["safetensors", "pickle", "safetensors", "safetensors"],
+        })
+
+    def test_daily_series_has_no_gaps(self):
+        counts, log_counts, vmax, vmax_log = get_commit_time_series(self.df)
+        self.assertEqual(SAFETENSORS_RELEASE_DATE, counts.index[0])
+        self.assertTrue((counts.index.to_series().diff().dropna() == pd.Timedelta(days=1)).all())
+        self.assertEqual(len(self.df), counts.sum())
+        self.assertEqual([2, 0, 0, 0, 1], counts.iloc[:5].tolist())
+        self.assertEqual(2, vmax)
+        self.assertAlmostEqual(np.log1p(2), vmax_log)
+        self.assertAlmostEqual(np.log1p(2), log_counts.iloc[0])
+
+    def test_weekly_series_per_group(self):
+        counts, _, vmax, _ = get_commit_time_series(self.df, freq='W', by='serialization_format')
+        self.assertEqual(["pickle", "safetensors"], counts.columns.tolist())
+        # weeks start on Monday (2022-09-22 was a Thursday)
+        self.assertEqual(pd.Timestamp("2022-09-19"), counts.index[0])
+        self.assertEqual([1, 1], counts.iloc[0].tolist())
+        self.assertEqual([0, 1], counts.loc["2022-09-26"].tolist())
+        self.assertEqual({"pickle": 1, "safetensors": 1}, vmax.to_dict())
+
+
+EXTENSION = sorted(MODEL_FILE_EXTENSIONS)[0]
+MODEL_FILES = [f"model.{EXTENSION}", f"sub/model.{EXTENSION}", f"model-2.{EXTENSION}", f"weights/a b.{EXTENSION}"]
+
+
+def write_synthetic_group(data_dir: Path, group: str, seed: int) -> None:
+    """
+    Write a commit log (selected_<group>_commits.csv) and the matching evolution data
+    (repositories_evolution_<group>_commits_processed.csv) for a few random repositories. Every change status occurs,
+    a fork shares the first commit of its parent, a repository of the log is not in the evolution data and some
+    commits remove the last model file of the tree.
+    """
+    rng = random.Random(seed)
+    log_rows, evolution_rows = [], []
+    repos = [f"{group}/repo{i}" for i in range(8)]
+    for r, repo_url in enumerate(repos):
+        tree, start = {"README.md"}, datetime(2022, 1, 1) + timedelta(days=rng.randint(0, 700))
+        num_commits = rng.randint(2, 12)
+        for i in range(num_commits):
+            commit_hash = f"{group}-c0" if r in (0, 1) and i == 0 else f"{group}-{r}-{i}"  # repo1 forks repo0
+            date = (start + timedelta(hours=7 * i)).strftime("%Y-%m-%d %H:%M:%S")
+            changes = {}
+            if r == 2 and i == num_commits - 1:  # the last commit of repo2 removes all model files
+                changes = {path: "-" for path in tree if path.endswith(EXTENSION)} or {MODEL_FILES[0]: "-"}
+            for _ in range(0 if changes else rng.randint(0, 3)):
+                path = rng.choice(MODEL_FILES + ["config.json"])
+                if path in tree and path not in changes:
+                    changes[path] = rng.choice(["*", "-", ">", "<"])
+                elif path not in changes:
+                    changes[path] = rng.choice(["+", "="])
+            if rng.random() < .3:
+                changes["README.md"] = "*"
+            tree = (tree | set(changes)) - {path for path, status in changes.items() if status == "-"}
+            changed_files = ";".join(f"{status} {path}" for path, status in changes.items())
+            log_rows.append((repo_url, commit_hash, "dev", date, f"commit {i}", changed_files or None,
+                             ";".join(sorted(tree))))
+            if r == len(repos) - 1:  # not in the evolution data
+                continue
+            model_files = {path: path in changes for path in tree if path.endswith(EXTENSION)}
+            model_files.update({path: True for path, status in changes.items()
+                                if status == "-" and path.endswith(EXTENSION)})
+            if not any(model_files.values()):
+                continue
+            for path, is_in_commit in sorted(model_files.items()):
+                evolution_rows.append({"repo_url": repo_url, "commit_hash": commit_hash,
+                                       "model_file_path": f"{repo_url}/{path}", "serialization_format": "pickle",
+                                       "message": f"commit {i}", "author": "dev", "date": date,
+                                       "is_in_commit": is_in_commit})
+    pd.DataFrame(log_rows, columns=COMMITS_COLUMNS).to_csv(data_dir / f"selected_{group}_commits.csv", index=False)
+    pd.DataFrame(evolution_rows).to_csv(data_dir / f"repositories_evolution_{group}_commits_processed.csv",
+                                        index=False)
+
+
+def reference_repositories_evolution(data_dir: Path, group: str) -> pd.DataFrame:
+    """
+    The row-by-row implementation of read_repositories_evolution (before the integer joins).
+    """
+    if group == "both":
+        return pd.concat([reference_repositories_evolution(data_dir, "recent"),
+                          reference_repositories_evolution(data_dir, "legacy")], ignore_index=True)
+    df = pd.read_csv(data_dir / f"repositories_evolution_{group}_commits_processed.csv")
+    df["date"] = pd.to_datetime(df["date"])
+    df["elapsed_days"] = (df["date"] - SAFETENSORS_RELEASE_DATE).dt.days
+    df_commits = pd.read_csv(data_dir / f"selected_{group}_commits.csv").fillna("")
+    changed_files = {}
+    for _, row in df_commits.iterrows():
+        if row["changed_files"]:
+            for x in row["changed_files"].split(";"):
+                status, file_path = x.split(maxsplit=1)
+                changed_files[f"{row['repo_url']}/{file_path}&&{row['commit_hash']}"] = status
+    df["change_status"] = ""
+    for index, row in df.iterrows():
+        if row["is_in_commit"]:
+            df.at[index, "change_status"] = changed_files[f"{row['model_file_path']}&&{row['commit_hash']}"]
+    return df
+
+
+def reference_commit_log_stats(df_repository_evolution: pd.DataFrame, data_dir: Path, group: str) -> pd.Series:
+    """
+    The row-by-row implementation of get_commit_log_stats for a single group (before the normalized commit logs).
+    """
+    def has_model_file(paths: str) -> bool:
+        return any(Path(f).suffix[1:] in MODEL_FILE_EXTENSIONS for f in paths.split(";"))
+
+    df = pd.read_csv(data_dir / f"selected_{group}_commits.csv").fillna("")
+    df = df[df["repo_url"].isin(df_repository_evolution["repo_url"].unique())]
+    total_commits = len(df)
+    df = df[df["changed_files"].apply(has_model_file)]
+    df_added_model_files = df_repository_evolution[df_repository_evolution["change_status"] == "+"]
+    num_empty = sum(not has_model_file(tree) for tree in df["all_files_in_tree"])
+    return pd.Series({
+        "# commits in all logs (total)": total_commits,
+        "# commits modifying/adding/deleting at least one serialized model": len(df),
+        "# repos associated with commits modifying/adding/deleting at least one serialized model":
+            df["repo_url"].nunique(),
+        "# commits adding at least one serialized model":
+            len(df_added_model_files[["repo_url", "commit_hash"]].drop_duplicates()),
+        "# repos associated with commits adding at least one serialized model":
+            df_added_model_files["repo_url"].nunique(),
+        "# commits containing at least one model file in its tree": len(df) - num_empty,
+        "# commits not containing at least one model file": num_empty,
+        "# repos": df["repo_url"].nunique(),
+        "last commit date": df["date"].max(),
+    }, dtype=object)
+
+
+class TestSyntheticEvolutionData(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.data_dir = Path(tmp_dir.name)
+        write_synthetic_group(self.data_dir, "recent", seed=1)
+        write_synthetic_group(self.data_dir, "legacy", seed=2)
+        for patch in [mock.patch.object(nb_utils, "DATA_DIR", self.data_dir),
+                      mock.patch.dict(nb_utils._REPOSITORIES_EVOLUTION, clear=True),
+                      mock.patch.dict(nb_utils._COMMIT_LOGS, clear=True)]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_repositories_evolution(self):
+        for group in ["recent", "legacy", "both"]:
+            expected = reference_repositories_evolution(self.data_dir, group)
+            pd.testing.assert_frame_equal(expected, read_repositories_evolution(group), obj=group)
+        # the data covers every change status (and files that are not in the commit)
+        statuses = set(read_repositories_evolution("both")["change_status"])
+        self.assertEqual({"", "+", "-", "*", "=", ">", "<"}, statuses)
+
+    def test_missing_change(self):
+        df = pd.read_csv(self.data_dir / "repositories_evolution_recent_commits_processed.csv")
+        df.loc[df["is_in_commit"].idxmax(), "model_file_path"] = f"recent/repo0/missing.{EXTENSION}"
+        df.to_csv(self.data_dir / "repositories_evolution_recent_commits_processed.csv", index=False)
+        with self.assertRaises(KeyError):
+            read_repositories_evolution("recent")
+
+    def test_commit_log_stats(self):
+        # the stats do not read or extend the id dictionaries of the data directory (see key_ids.py)
+        dictionaries = {name: dictionary_file(name) for name in KEY_NAMES}
+        before = {name: f.exists() and f.stat().st_mtime_ns for name, f in dictionaries.items()}
+        for group in ["recent", "legacy"]:
+            df_evolution = read_repositories_evolution(group)
+            expected = reference_commit_log_stats(df_evolution, self.data_dir, group)
+            stats, total_touching, total_adding = get_commit_log_stats(df_evolution, group)
+            self.assertEqual(expected.to_dict(), stats.to_dict(), group)
+            self.assertEqual((expected.iloc[1], expected.iloc[3]), (total_touching, total_adding))
+            self.assertGreater(expected["# commits not containing at least one model file"], 0)
+        self.assertEqual(before, {name: f.exists() and f.stat().st_mtime_ns for name, f in dictionaries.items()})
+
+    def test_commit_log_stats_both(self):
+        df_evolution = read_repositories_evolution("both")
+        stats, total_touching, total_adding = get_commit_log_stats(df_evolution, "both")
+        recent = reference_commit_log_stats(df_evolution, self.data_dir, "recent")
+        legacy = reference_commit_log_stats(df_evolution, self.data_dir, "legacy")
+        adding_keys = ["# commits adding at least one serialized model",
+                       "# repos associated with commits adding at least one serialized model"]
+        for key in stats.index.difference(adding_keys + ["last commit date"]):
+            self.assertEqual(recent[key] + legacy[key], stats[key], key)
+
+        # the previous version counted the additions of both groups in each group (so twice), and concatenated the
+        # last commit dates of the groups; the additions are now counted once and the date is the latest one
+        df_added = df_evolution[df_evolution["change_status"] == "+"]
+        expected_adding = [len(df_added[["repo_url", "commit_hash"]].drop_duplicates()), df_added["repo_url"].nunique()]
+        self.assertEqual(expected_adding, stats[adding_keys].tolist())
+        self.assertEqual([2 * n for n in expected_adding], (recent[adding_keys] + legacy[adding_keys]).tolist())
+        self.assertEqual(expected_adding[0], total_adding)
+        self.assertEqual(max(recent["last commit date"], legacy["last commit date"]), stats["last commit date"])
+        self.assertEqual(recent["last commit date"] + legacy["last commit date"],
+                         (recent + legacy)["last commit date"])
+        self.assertEqual(stats["# commits modifying/adding/deleting at least one serialized model"], total_touching)
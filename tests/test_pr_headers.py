@@ -0,0 +1,43 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.bot.pr_headers import extract_header_fields
+from scripts.bot.pr_headers import format_created_at
+from scripts.bot.pr_headers import headers_file
+from scripts.bot.pr_headers import load_pr_table
+
+
+def header(status, created_at, repo_name, title="Adding `safetensors` variant of this model"):
+    return json.dumps({"discussion": {"status": status, "createdAt": created_at, "repo": {"name": repo_name},
+                                      "title": title}})
+
+
+class TestPrHeaders(unittest.TestCase):
+    def setUp(self):
+        self.headers = pd.Series([header("merged", "2023-05-01T12:00:00.000Z", "org/a"),
+                                  "HTTP Error (status code: 404)", None,
+                                  header("open", "2023-06-02T08:30:15.250Z", "org/b")])
+
+    def test_extract_header_fields(self):
+        df = extract_header_fields(self.headers)
+        self.assertEqual(["merged", "open"], df["header_status"].dropna().tolist())
+        self.assertEqual(["org/a", None, None, "org/b"], df["header_repo_name"].tolist())
+        self.assertEqual(pd.Timestamp("2023-06-02 08:30:15.250", tz="UTC"), df["header_created_at"].iat[3])
+        self.assertEqual("2023-05-01T12:00:00.000Z", format_created_at(df["header_created_at"]).iat[0])
+        # parallel chunks give the same result
+        pd.testing.assert_frame_equal(df, extract_header_fields(self.headers, n_jobs=2, chunk_size=1))
+
+    def test_load_pr_table(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = Path(tmp_dir) / "sfconvertbot_pr_metadata.csv"
+            pd.DataFrame({"model_id": ["org/a", "x", "", "org/b"], "header_metadata": self.headers}).to_csv(
+                input_file, index=False)
+            df = load_pr_table(input_file, columns=["model_id", "header_status"])
+            self.assertTrue(headers_file(input_file).exists())
+            self.assertEqual(["org/a"], df.loc[df["header_status"] == "merged", "model_id"].tolist())
+            df = load_pr_table(input_file, columns=["header_title"])
+            self.assertEqual(2, df["header_title"].notna().sum())
@@ -0,0 +1,39 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.repo_metadata import load_repos_metadata
+from scripts.repo_metadata import metadata_file
+
+REPOS = [{"id": "org/model-a", "created_at": "2022-03-02T23:29:04.000Z", "last_modified": 1700000000000,
+          "siblings": [{"rfilename": "pytorch_model.bin"}], "likes": 3, "gated": False},
+         {"id": "org/model-b", "created_at": "2023-01-02T00:00:00.000Z", "last_modified": 1710000000000,
+          "siblings": [], "likes": 1, "gated": "auto"}]
+
+
+class TestRepoMetadata(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_file = Path(self.tmp_dir.name) / "selected_recent_repos.json"
+        with open(self.input_file, "w") as f:
+            json.dump(REPOS, f)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_column_projection(self):
+        df = load_repos_metadata(self.input_file, ["created_at"])
+        self.assertTrue(metadata_file(self.input_file).exists())
+        self.assertEqual(["created_at"], df.columns.tolist())
+        self.assertEqual(["org/model-a", "org/model-b"], df.index.tolist())
+        self.assertEqual(pd.Timestamp("2022-03-02 23:29:04", tz="UTC"), df.loc["org/model-a", "created_at"])
+
+    def test_all_columns(self):
+        df = load_repos_metadata(self.input_file)
+        self.assertEqual(pd.Timestamp("2023-11-14 22:13:20", tz="UTC"), df.loc["org/model-a", "last_modified"])
+        self.assertEqual(REPOS[0]["siblings"], json.loads(df.loc["org/model-a", "siblings"]))
+        self.assertEqual("auto", json.loads(df.loc["org/model-b", "gated"]))
+        self.assertEqual(3, df.loc["org/model-a", "likes"])
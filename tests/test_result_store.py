@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.bot.bot_utils import is_fetch_error
+from scripts.bot.result_store import RESULT_COLUMNS, ResultStore
+
+PR_URL = "https://huggingface.co/org/m{}/discussions/1"
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_file = Path(self.tmp_dir.name) / "results.sqlite3"
+        self.store = ResultStore(self.store_file)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_resume(self):
+        self.store.put(PR_URL.format(1), ("events", "header", "org/m1", "2023-05-01T12:00:00.000Z"))
+        self.store.close()
+        # a new run sees the results of the previous one
+        self.store = ResultStore(self.store_file)
+        self.assertEqual({PR_URL.format(1)}, self.store.keys())
+        self.assertEqual(["events", "header", "org/m1", "2023-05-01T12:00:00.000Z"],
+                         self.store.read([PR_URL.format(1), PR_URL.format(2)]).loc[PR_URL.format(1)].tolist())
+
+    def test_failed_fetches(self):
+        error = "HTTP Error (status code: 503)"
+        # only the temporary failures are fetched again (deleted PRs are not found every time)
+        for status in [429, 500, 502, 503, 504]:
+            self.assertTrue(is_fetch_error(f"HTTP Error (status code: {status})"), status)
+        for status in [400, 401, 403, 404, 410]:
+            self.assertFalse(is_fetch_error(f"HTTP Error (status code: {status})"), status)
+        self.assertTrue(is_fetch_error("Connection Error (ClientConnectorError: Cannot connect to host)"))
+        self.assertFalse(is_fetch_error('{"events": []}'))
+        self.assertFalse(is_fetch_error(None))
+        self.store.put(PR_URL.format(1), ("e1", "h1", "org/m1", "t1"))
+        self.store.put(PR_URL.format(2), (error, error, None, None), failed=True)
+        self.store.close()
+        # the failed PR is fetched again by the next run, but it is still exported until then
+        self.store = ResultStore(self.store_file)
+        self.assertEqual({PR_URL.format(1)}, self.store.keys())
+        self.assertEqual(error, self.store.read([PR_URL.format(2)]).loc[PR_URL.format(2), "discussion_metadata"])
+        self.store.put(PR_URL.format(2), ("e2", "h2", "org/m2", "t2"))
+        self.assertEqual({PR_URL.format(1), PR_URL.format(2)}, self.store.keys())
+
+    def test_export(self):
+        self.store.put(PR_URL.format(1), ("e1", "h1", "org/m1", "t1"))
+        cache = pd.DataFrame({"pr_url": [PR_URL.format(2), PR_URL.format(3)], "model_id": ["org/m2", "org/m3"],
+                              "discussion_metadata": ["e2", "e3"], "header_metadata": ["h2", "h3"],
+                              "time": ["t2", "t3"], "status": ["merged", "open"]})
+        cache.index = cache["pr_url"].rename(None)
+        self.store.merge(cache.loc[[PR_URL.format(2)]])
+        df = pd.DataFrame({"pr_url": [PR_URL.format(1), PR_URL.format(2) + "#comment", PR_URL.format(4)]})
+        out_file = Path(self.tmp_dir.name) / "out.csv"
+        self.assertEqual(4, self.store.export_csv(df, out_file, extra=cache.loc[[PR_URL.format(3)]], chunk_size=2))
+
+        expected = pd.DataFrame({"pr_url": [PR_URL.format(1), PR_URL.format(2) + "#comment", PR_URL.format(4),
+                                            PR_URL.format(3)],
+                                 "discussion_metadata": ["e1", "e2", None, "e3"],
+                                 "header_metadata": ["h1", "h2", None, "h3"],
+                                 "model_id": ["org/m1", "org/m2", None, "org/m3"],
+                                 "time": ["t1", "t2", None, "t3"], "status": [None, None, None, "open"]})
+        pd.testing.assert_frame_equal(expected, pd.read_csv(out_file).astype(object).where(lambda x: x.notna(), None))
+        self.assertEqual(["pr_url"] + RESULT_COLUMNS + ["status"], pd.read_csv(out_file, nrows=0).columns.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.rq_aggregates import BOT_MESSAGE
+from scripts.rq_aggregates import read_aggregate
+from scripts.rq_aggregates import refresh_aggregates
+
+
+def evolution_row(repo_url, commit_hash, serialization_format, change_status, date, message="update"):
+    date = pd.Timestamp(date)
+    return {"repo_url": repo_url, "commit_hash": commit_hash, "model_file_path": f"{repo_url}/model",
+            "serialization_format": serialization_format, "message": message, "author": "dev", "date": date,
+            "elapsed_days": (date - pd.Timestamp("2022-09-22")).days, "change_status": change_status,
+            "created_at": pd.Timestamp("2022-01-15", tz="UTC")}
+
+
+class TestRQAggregates(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = Path(self.tmp_dir.name) / "db.sqlite3"
+        self.df = pd.DataFrame([
+            evolution_row("org/a", "h1", "pickle", "+", "2022-02-01"),
+            evolution_row("org/a", "h2", "safetensors", "+", "2023-01-10", BOT_MESSAGE),
+            evolution_row("org/b", "h3", "safetensors", "+", "2022-10-01"),
+            evolution_row("org/b", "h4", "undetermined", "+", "2022-10-02"),
+        ])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_aggregates(self):
+        self.assertEqual(["org/a", "org/b"], refresh_aggregates(self.df, "recent", self.db_file))
+        df = read_aggregate("formats_per_creation_month", "recent", self.db_file)
+        self.assertEqual({"pickle": 1, "safetensors": 1}, df.loc[pd.Period("2022-01", "M")].to_dict())
+        df = read_aggregate("formats_per_month", "both", self.db_file)
+        self.assertEqual(["2022-02", "2022-10", "2023-01"], df.index.astype(str).tolist())
+        df = read_aggregate("commits_by_tool", "recent", self.db_file)
+        self.assertEqual([False, True], df["by_tool"].tolist())
+        self.assertEqual([1, 1], df["num_commits"].tolist())
+        df = read_aggregate("first_safetensors_adoption", "recent", self.db_file)
+        self.assertEqual(["org/b", "org/a"], df["repo_url"].tolist())
+        self.assertEqual([9, 110], df["elapsed_days"].tolist())
+
+    def test_incremental_refresh(self):
+        refresh_aggregates(self.df, "recent", self.db_file)
+        self.assertEqual([], refresh_aggregates(self.df, "recent", self.db_file))
+        # only the repository that changed is recomputed
+        df = pd.concat([self.df, pd.DataFrame([evolution_row("org/b", "h5", "safetensors", "+", "2022-09-30")])])
+        self.assertEqual(["org/b"], refresh_aggregates(df, "recent", self.db_file))
+        df_first = read_aggregate("first_safetensors_adoption", "recent", self.db_file)
+        self.assertEqual([8, 110], df_first["elapsed_days"].tolist())
+        # repositories that are no longer in the data are removed
+        self.assertEqual(["org/a"], refresh_aggregates(df[df["repo_url"] == "org/b"], "recent", self.db_file))
+        df_first = read_aggregate("first_safetensors_adoption", "recent", self.db_file)
+        self.assertEqual(["org/b"], df_first["repo_url"].tolist())
@@ -0,0 +1,51 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.snapshot_index import count_at
+from scripts.snapshot_index import index_file
+from scripts.snapshot_index import load_snapshot_index
+from scripts.snapshot_index import snapshot_at
+from scripts.snapshot_index import snapshot_between
+from tests.fixtures import evolution_data
+
+
+class TestSnapshotIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp_dir.name)
+        self.evolution_file = tmp_path / "repositories_evolution_recent_commits_processed.csv"
+        pd.concat([evolution_data(), evolution_data("org/other")]).to_csv(self.evolution_file, index=False)
+        # the last commit of org/model deletes all its model files, so it is not in the evolution data
+        self.commits_file = tmp_path / "selected_recent_commits.csv"
+        pd.DataFrame([
+            {"repo_url": "org/model", "commit_hash": "c5", "author": "dev", "date": "2023-02-01 10:00:00+00:00",
+             "message": "update", "changed_files": "+ model.bin", "all_files_in_tree": "model.bin;model.safetensors"},
+            {"repo_url": "org/model", "commit_hash": "c6", "author": "dev", "date": "2023-03-01 10:00:00+00:00",
+             "message": "cleanup", "changed_files": "- model.bin;- model.safetensors;* README.md",
+             "all_files_in_tree": "README.md"},
+        ]).to_csv(self.commits_file, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_snapshots(self):
+        index = load_snapshot_index(self.evolution_file, self.commits_file)
+        self.assertTrue(index_file(self.evolution_file).exists())
+        df = snapshot_at(index, "2023-02-15")
+        self.assertEqual({"pickle": 2, "safetensors": 2}, df["serialization_format"].value_counts().to_dict())
+        df = snapshot_at(index, "2023-03-15")
+        self.assertEqual(["org/other"], df["repo_url"].unique().tolist())
+        self.assertTrue(snapshot_at(index, "2023-03-15", ["org/model"]).empty)
+        df = snapshot_between(index, "2022-05-01", "2022-06-15", ["org/model", "org/missing"])
+        self.assertEqual(["org/model/model.bin", "org/model/tf_model.h5"], sorted(df["model_file_path"]))
+
+        # the index is read back from the Parquet file
+        index = load_snapshot_index(self.evolution_file, self.commits_file)
+        df = count_at(index, ["2022-07-01", "2023-02-15", "2023-04-01"], unique="repo_url")
+        self.assertEqual([2, 0, 0], df["h5/hdf5"].tolist())
+        self.assertEqual([0, 2, 1], df["safetensors"].tolist())
+        df = count_at(index, ["2022-07-01"])
+        self.assertEqual({"h5/hdf5": 2, "pickle": 2, "safetensors": 0}, df.iloc[0].to_dict())
@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from scripts.stackoverflow.so_collector import NdjsonWriter, StackExchangeClient, is_ndjson, iter_items, \
+    iter_search, rewrite_items, unique_items
+
+# the questions matching each query (the queries overlap)
+RESULTS = {"safetensor": list(range(0, 250)), "safe tensor": list(range(200, 260)), "safetensors": list(range(0, 300))}
+BACKOFF = 1
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for /search/excerpts: the questions of a query, paginated, with a backoff in the first response and a
+    daily quota of server.quota requests. A request during the backoff is a throttle violation.
+    """
+
+    def do_GET(self):
+        server = self.server
+        params = {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+        page, page_size = int(params["page"]), int(params["pagesize"])
+        with server.lock:
+            now = time.time()
+            if now < server.backoff_until:
+                server.violations += 1
+                status, body = 400, {"error_id": 502, "error_name": "throttle_violation",
+                                     "error_message": "too many requests from this IP, more requests available in "
+                                                      f"{server.backoff_until - now + 1:.0f} seconds"}
+            else:
+                server.quota -= 1
+                ids = RESULTS[params["q"]]
+                body = {"items": [{"item_type": "question", "question_id": i, "title": f"question {i}"}
+                                  for i in ids[(page - 1) * page_size:page * page_size]],
+                        "has_more": page * page_size < len(ids), "quota_max": 300, "quota_remaining": server.quota}
+                status = 200
+                if server.requests == 0:
+                    body["backoff"] = BACKOFF
+                    server.backoff_until = now + BACKOFF
+                server.requests += 1
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestCollectQuestions(unittest.TestCase):
+    def start_server(self, quota: int) -> StackExchangeClient:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), SearchHandler)
+        self.server.lock, self.server.quota, self.server.backoff_until = threading.Lock(), quota, 0.0
+        self.server.requests, self.server.violations = 0, 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        return StackExchangeClient(url=f"http://127.0.0.1:{self.server.server_address[1]}/search/excerpts",
+                                   session=requests.Session())
+
+    def test_collect(self):
+        client = self.start_server(quota=300)
+        start = time.time()
+        items = list(unique_items(iter_search(client, RESULTS, page_size=100)))
+        self.assertEqual(list(range(300)), sorted(item["question_id"] for item in items))
+        # the backoff held back the other queries (only the requests sent before it was known can violate it)
+        self.assertGreaterEqual(time.time() - start, BACKOFF)
+        self.assertLessEqual(self.server.violations, len(RESULTS) - 1)
+        # 3 + 1 + 3 pages
+        self.assertEqual(300 - 7, client.quota_remaining)
+
+    def test_quota(self):
+        client = self.start_server(quota=2)
+        items = list(iter_search(client, ["safetensors"], page_size=100))
+        # the collection stops when the quota is exhausted
+        self.assertEqual(list(range(200)), [item["question_id"] for item in items])
+        self.assertTrue(client.exhausted)
+
+    def test_throttle_violation(self):
+        client = self.start_server(quota=300)
+        self.server.backoff_until = time.time() + 1
+        self.assertEqual(100, len(client.search("safetensors", page_size=100)["items"]))
+        self.assertEqual(1, self.server.violations)
+
+
+class TestItemFiles(unittest.TestCase):
+    def test_ndjson_and_legacy(self):
+        items = [{"question_id": 1, "title": "safetensors ü"}, {"answer_id": 2, "title": "b"},
+                 {"question_id": 1, "title": "again"}]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ndjson_file, legacy_file = os.path.join(tmp_dir, "items.ndjson"), os.path.join(tmp_dir, "items.json")
+            with NdjsonWriter(ndjson_file) as writer:
+                for item in items:
+                    writer.write(item)
+            with open(legacy_file, "w", encoding="utf-8") as f:
+                json.dump({"items": items}, f, ensure_ascii=False, indent=4)
+
+            for filename, ndjson in [(ndjson_file, True), (legacy_file, False)]:
+                self.assertEqual(ndjson, is_ndjson(filename))
+                self.assertEqual(items, list(iter_items(filename)))
+                # the items are rewritten in the same format
+                rewrite_items(filename, unique_items(iter_items(filename)))
+                self.assertEqual(ndjson, is_ndjson(filename))
+                self.assertEqual(items[:2], list(iter_items(filename)))
+
+
+if __name__ == "__main__":
+    unittest.main()